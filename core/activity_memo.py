@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Cross-request memo of activity classifications.
+
+Weekly reports repeat the same activities with small differences in spacing
+and capitalisation, so classifiers consult this memo before calling the model.
+Entries are keyed by the whitespace- and case-normalized activity text plus a
+prompt version (a hash of the prompt template, model name and output schema
+the classifier uses). Editing the rubric or the few-shot block, switching
+models or changing the schema therefore changes the version and every older
+entry stops matching; :py:meth:`ActivityMemo.prune` removes them.
+
+The memo lives in a SQLite file next to the LLM response cache so it is shared
+by every worker process and survives restarts.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import dotenv
+
+from core.cassette import LLM_CASSETTE
+from core.data_table import LLM_HCD_Label
+from core.llm_cache import CACHE_DIR
+
+dotenv.load_dotenv()
+
+ACTIVITY_MEMO_ENABLED = os.getenv("ACTIVITY_MEMO_ENABLED", "true").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+ACTIVITY_MEMO_PATH = os.getenv(
+    "ACTIVITY_MEMO_PATH", os.path.join(CACHE_DIR, "activity_memo.sqlite3")
+)
+
+
+def normalize_activity_text(activity: str) -> str:
+    """Collapse whitespace and lowercase an activity for memo lookups."""
+    return " ".join((activity or "").split()).lower()
+
+
+def prompt_version(*prompt_parts: str) -> str:
+    """Return a short, stable version id for the prompt text a classifier uses."""
+    digest = hashlib.sha256()
+    for part in prompt_parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class ActivityMemo:
+    """SQLite-backed map from (prompt version, activity) to HCD labels."""
+
+    def __init__(self, path: str = ACTIVITY_MEMO_PATH) -> None:
+        """
+        Open (or create) the memo database.
+
+        Args:
+            path (str): SQLite file location; parent directories are created.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS activity_memo (
+                    version TEXT NOT NULL,
+                    activity TEXT NOT NULL,
+                    spaces TEXT NOT NULL,
+                    subspaces TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (version, activity)
+                )
+                """
+            )
+
+    def get(self, version: str, activity: str) -> Optional[LLM_HCD_Label]:
+        """Return the memoized label for `activity`, or None on a miss.
+
+        Args:
+            version (str): Prompt version of the calling classifier.
+            activity (str): Activity text as it appears in the report.
+
+        Returns:
+            Optional[LLM_HCD_Label]: A label carrying the caller's original `activity` text.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT spaces, subspaces FROM activity_memo "
+                "WHERE version = ? AND activity = ?",
+                (version, normalize_activity_text(activity)),
+            ).fetchone()
+        if row is None:
+            return None
+        return LLM_HCD_Label(
+            activity=activity,
+            HCD_Spaces=json.loads(row[0]),
+            HCD_Subspaces=json.loads(row[1]),
+        )
+
+    def put(self, version: str, label: LLM_HCD_Label) -> None:
+        """Store a normalized label; empty labels are not memoized."""
+        if not label.HCD_Spaces or not label.HCD_Subspaces:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO activity_memo "
+                "(version, activity, spaces, subspaces, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (
+                    version,
+                    normalize_activity_text(label.activity),
+                    json.dumps(label.HCD_Spaces),
+                    json.dumps(label.HCD_Subspaces),
+                    time.time(),
+                ),
+            )
+
+    def prune(self, keep_versions: set[str]) -> int:
+        """Delete entries written under any prompt version not in `keep_versions`.
+
+        Returns:
+            int: Number of rows removed.
+        """
+        placeholders = ", ".join("?" for _ in keep_versions) or "''"
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"DELETE FROM activity_memo WHERE version NOT IN ({placeholders})",
+                tuple(keep_versions),
+            )
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM activity_memo")
+
+
+# a recording or replaying cassette must see every call, so it bypasses the memo too
+ACTIVITY_MEMO: Optional[ActivityMemo] = (
+    ActivityMemo() if ACTIVITY_MEMO_ENABLED and LLM_CASSETTE is None else None
+)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""Multi-report classification with cross-report deduplication.
+
+A section's weekly reports repeat many activities verbatim ("Team meeting",
+"Literature review", ...). `BatchClassifier` collects the rows of every
+report, classifies each distinct activity once, evaluates each distinct
+(activity, student labels) pair once, and fans the results back out to the
+rows of every report they came from.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.activity_memo import normalize_activity_text
+from core.data_table import (
+    List_Output_Label,
+    List_Student_HCD_Label,
+    LLM_HCD_Label,
+    Output_Label,
+    Student_HCD_Label,
+)
+from core.fused_processing import FusedProcessing
+from core.pipeline import PipelineMode
+from core.postprocessing import FinalProcessing
+from core.processing import Processing
+
+# a fixed LLM concurrency for batches; unset leaves it to the process-wide LLM governor
+DEFAULT_BATCH_CONCURRENCY: Optional[int] = (
+    int(os.environ["CLASSIFY_BATCH_CONCURRENCY"])
+    if os.getenv("CLASSIFY_BATCH_CONCURRENCY")
+    else None
+)
+
+# an evaluation depends on the activity and on the student's labels in order
+EvalKey = tuple[str, tuple[str, ...], tuple[str, ...]]
+
+
+@dataclass
+class ReportResult:
+    """Classification results for one report of a batch, in table order."""
+
+    name: str
+    student_labels: List_Student_HCD_Label
+    llm_labels: list[LLM_HCD_Label]
+    final_labels: List_Output_Label
+
+
+@dataclass
+class BatchStats:
+    """How much work deduplication saved across a batch.
+
+    Attributes:
+        reports: Reports in the batch.
+        activities: Activity rows across all reports.
+        unique_activities: Distinct activities sent for classification.
+        unique_evaluations: Distinct (activity, student labels) pairs sent for evaluation.
+    """
+
+    reports: int
+    activities: int
+    unique_activities: int
+    unique_evaluations: int
+
+
+def _eval_key(entry: Student_HCD_Label) -> EvalKey:
+    return (
+        normalize_activity_text(entry.activity),
+        tuple(entry.HCD_Spaces),
+        tuple(entry.HCD_Subspaces),
+    )
+
+
+class BatchClassifier:
+    """Classifies many reports as one deduplicated workload."""
+
+    def __init__(
+        self,
+        processor: Processing,
+        final_processor: FinalProcessing,
+        fused_processor: Optional[FusedProcessing] = None,
+    ) -> None:
+        """
+        Initialize the batch classifier with the stage helpers it drives.
+
+        Args:
+            processor (Processing): Classification stage.
+            final_processor (FinalProcessing): Final evaluation stage.
+            fused_processor (Optional[FusedProcessing]): Single-call stage used when mode is "fused".
+        """
+        self.processor = processor
+        self.final_processor = final_processor
+        self.fused_processor = fused_processor or FusedProcessing()
+
+    async def aclassify_reports(
+        self,
+        reports: list[tuple[str, List_Student_HCD_Label]],
+        mode: PipelineMode = "standard",
+        max_concurrency: Optional[int] = DEFAULT_BATCH_CONCURRENCY,
+    ) -> tuple[list[ReportResult], BatchStats]:
+        """
+        Classify and evaluate every row of every report, calling the model once per distinct input.
+
+        Args:
+            reports (list[tuple[str, List_Student_HCD_Label]]): Report names and their extracted tables.
+            mode (PipelineMode): "standard" for separate classification and evaluation, "fused" for one call.
+            max_concurrency (Optional[int]): Maximum LLM calls in flight at once for the whole
+                batch; None leaves concurrency to the process-wide LLM governor.
+
+        Returns:
+            tuple[list[ReportResult], BatchStats]: Per-report results in input order and dedupe statistics.
+        """
+        unique_entries: dict[EvalKey, Student_HCD_Label] = {}
+        for _, table in reports:
+            for entry in table.tables:
+                unique_entries.setdefault(_eval_key(entry), entry)
+        eval_keys = list(unique_entries)
+        eval_table = List_Student_HCD_Label(tables=list(unique_entries.values()))
+
+        if mode == "fused":
+            llm_list, output_list = await self.fused_processor.aclassify_and_eval(
+                eval_table, max_concurrency=max_concurrency
+            )
+            llm_by_key = dict(zip(eval_keys, llm_list))
+            unique_activities = len(eval_keys)
+        else:
+            activity_entries: dict[str, Student_HCD_Label] = {}
+            for key, entry in unique_entries.items():
+                activity_entries.setdefault(key[0], entry)
+            llm_list = await self.processor.aclassify_table(
+                List_Student_HCD_Label(tables=list(activity_entries.values())),
+                max_concurrency=max_concurrency,
+            )
+            llm_by_activity = dict(zip(activity_entries, llm_list))
+            llm_by_key = {key: llm_by_activity[key[0]] for key in eval_keys}
+            output_list = await self.final_processor.afinal_eval(
+                eval_table,
+                [llm_by_key[key] for key in eval_keys],
+                max_concurrency=max_concurrency,
+            )
+            unique_activities = len(activity_entries)
+        output_by_key = dict(zip(eval_keys, output_list.labels))
+
+        results = []
+        for name, table in reports:
+            llm_labels: list[LLM_HCD_Label] = []
+            final_labels: list[Output_Label] = []
+            for entry in table.tables:
+                key = _eval_key(entry)
+                # hand each row back its own activity text, not the representative's
+                llm_labels.append(
+                    llm_by_key[key].model_copy(update={"activity": entry.activity})
+                )
+                final_labels.append(
+                    output_by_key[key].model_copy(update={"activity": entry.activity})
+                )
+            results.append(
+                ReportResult(
+                    name=name,
+                    student_labels=table,
+                    llm_labels=llm_labels,
+                    final_labels=List_Output_Label(labels=final_labels),
+                )
+            )
+
+        stats = BatchStats(
+            reports=len(reports),
+            activities=sum(len(table.tables) for _, table in reports),
+            unique_activities=unique_activities,
+            unique_evaluations=len(eval_keys),
+        )
+        return results, stats
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""Record/replay cassettes for upstream LLM traffic.
+
+With ``LLM_CASSETTE_MODE=record`` every chat API call made by
+`IllinoisChatLLM` (and so by every model in :mod:`core.model_config`) is
+appended to a cassette file: one JSON line holding a canonical hash of the
+request payload, the reply text and the call's latency. With
+``LLM_CASSETTE_MODE=replay`` the same calls are answered from the cassette
+without touching the network, either after the recorded latency
+(``LLM_CASSETTE_LATENCY=original``) or immediately (``zero``), so a
+``pipeline_test.py`` or ``/classify`` run can be repeated deterministically and
+our own overhead profiled apart from upstream latency.
+
+The hash ignores the API key, so cassettes can be shared. A request that is
+not on the cassette raises `CassetteMissError` in replay mode. The LLM response
+cache and the activity memo are both bypassed while a cassette is active so
+every call reaches it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import dotenv
+
+from core.llm_cache import CACHE_DIR
+
+dotenv.load_dotenv()
+
+CASSETTE_MODES = {"off", "record", "replay"}
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+LLM_CASSETTE_PATH = os.getenv(
+    "LLM_CASSETTE_PATH", os.path.join(CACHE_DIR, "cassettes", "llm.jsonl")
+)
+LLM_CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "original").lower()
+
+# payload fields that do not change the reply
+_UNKEYED_FIELDS = {"api_key"}
+
+
+class CassetteMissError(RuntimeError):
+    """A replayed request has no recording on the cassette."""
+
+
+@dataclass
+class CassetteEntry:
+    """One recorded call: the reply text and how long the upstream took."""
+
+    message: str
+    latency: float
+
+
+def request_key(payload: dict) -> str:
+    """Canonical SHA-256 of a chat payload, ignoring credentials."""
+    canonical = json.dumps(
+        {k: v for k, v in payload.items() if k not in _UNKEYED_FIELDS},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """An append-only file of recorded chat API calls."""
+
+    def __init__(
+        self, path: str = LLM_CASSETTE_PATH, mode: str = "replay", latency: str = "original"
+    ) -> None:
+        """
+        Open a cassette, loading any calls already recorded on it.
+
+        Args:
+            path (str): JSON-lines cassette file; parent directories are created.
+            mode (str): "record" to call the upstream and append each call, "replay" to
+                answer from the file.
+            latency (str): On replay, "original" waits the recorded latency, "zero" answers at once.
+        """
+        if mode not in CASSETTE_MODES - {"off"}:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if latency not in {"original", "zero"}:
+            raise ValueError(f"Unknown cassette latency: {latency}")
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._entries: dict[str, CassetteEntry] = {}
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        # the latest recording of a request wins
+                        self._entries[row["key"]] = CassetteEntry(
+                            message=row["message"], latency=row["latency"]
+                        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _record(self, key: str, response: dict, latency: float) -> None:
+        entry = CassetteEntry(message=response.get("message", ""), latency=latency)
+        line = json.dumps(
+            {"key": key, "message": entry.message, "latency": round(latency, 4)},
+            ensure_ascii=False,
+        )
+        with self._lock:
+            self._entries[key] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.recorded += 1
+
+    def _lookup(self, key: str) -> CassetteEntry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                raise CassetteMissError(
+                    f"Request {key[:12]} is not on cassette {self.path}"
+                )
+            self.hits += 1
+            return entry
+
+    def call(self, payload: dict, upstream: Callable[[], dict]) -> dict:
+        """Replay `payload` from the cassette, or call `upstream` and record it."""
+        key = request_key(payload)
+        if self.mode == "replay":
+            entry = self._lookup(key)
+            if self.latency == "original":
+                time.sleep(entry.latency)
+            return {"message": entry.message}
+        started = time.monotonic()
+        response = upstream()
+        self._record(key, response, time.monotonic() - started)
+        return response
+
+    async def acall(self, payload: dict, upstream: Callable[[], Awaitable[dict]]) -> dict:
+        """Async variant of :py:meth:`call`."""
+        key = request_key(payload)
+        if self.mode == "replay":
+            entry = self._lookup(key)
+            if self.latency == "original":
+                await asyncio.sleep(entry.latency)
+            return {"message": entry.message}
+        started = time.monotonic()
+        response = await upstream()
+        # the append takes a lock and touches disk, so keep it off the event loop
+        await asyncio.to_thread(self._record, key, response, time.monotonic() - started)
+        return response
+
+    def snapshot(self) -> dict:
+        """Cassette counters, for metrics."""
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "recorded": self.recorded,
+        }
+
+
+def build_cassette() -> Optional[Cassette]:
+    """Return the cassette configured by env, or None when ``LLM_CASSETTE_MODE`` is "off"."""
+    if LLM_CASSETTE_MODE not in CASSETTE_MODES:
+        print(f"Warning: unknown LLM_CASSETTE_MODE={LLM_CASSETTE_MODE!r}; cassette disabled")
+        return None
+    if LLM_CASSETTE_MODE == "off":
+        return None
+    return Cassette(LLM_CASSETTE_PATH, mode=LLM_CASSETTE_MODE, latency=LLM_CASSETTE_LATENCY)
+
+
+LLM_CASSETTE = build_cassette()
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""Adaptive concurrency limit for upstream LLM calls.
+
+`AdaptiveLimiter` replaces the fixed ``asyncio.Semaphore(4)`` the stages used
+to create per call. The process-wide LLM governor (:mod:`core.governor`) keeps
+one per model, shared by every stage and request, and it tunes its limit with
+AIMD driven by latency:
+
+- after each window of completed calls, if the window's p90 latency has risen
+  well above the baseline (the lowest window p90 seen recently), the limit is
+  cut multiplicatively;
+- otherwise, if callers were actually queueing on the limit, it grows by one;
+- a retryable error response (429, 5xx, ...) or a timeout recorded by the
+  transport cuts the limit immediately (at most once per cooldown).
+
+Waiters are queued per flow (e.g. one per API request) and slots are handed
+out round-robin across flows, so one large report cannot starve the others.
+Async callers and sync callers on worker threads (`acquire_blocking`) share
+the same limit and queue; a sync call made on an event-loop thread never
+queues, since blocking there would stall the tasks holding the slots.
+The current limit and latency estimates are exposed through `snapshot` for
+the API's ``/metrics`` endpoint.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncContextManager, AsyncIterator, Callable, Hashable, Optional
+
+import dotenv
+
+from core.transport import RETRYABLE_STATUS_CODES, AttemptRecord
+
+dotenv.load_dotenv()
+
+INITIAL_LIMIT = int(os.getenv("LLM_CONCURRENCY_INITIAL", "4"))
+MIN_LIMIT = int(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+MAX_LIMIT = int(os.getenv("LLM_CONCURRENCY_MAX", "32"))
+
+# upstream responses that mean "slow down" rather than "this request is bad": every status
+# the transport retries, so an overloaded upstream answering 500/502/504 is backed off from too
+THROTTLE_STATUS_CODES = RETRYABLE_STATUS_CODES
+THROTTLE_ERRORS = {"ConnectTimeout", "ReadTimeout", "PoolTimeout", "WriteTimeout"}
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class _Waiter:
+    """A queued caller: an asyncio future for async callers, a threading event for sync ones."""
+
+    __slots__ = ("future", "event", "granted")
+
+    def __init__(
+        self,
+        future: Optional[asyncio.Future] = None,
+        event: Optional[threading.Event] = None,
+    ) -> None:
+        self.future = future
+        self.event = event
+        self.granted = False
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+            return
+        loop = self.future.get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is running:
+            _resolve(self.future)
+        else:
+            loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _loop_running() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveLimiter:
+    """An asyncio concurrency limit that follows upstream capacity (AIMD on latency)."""
+
+    def __init__(
+        self,
+        initial_limit: int = INITIAL_LIMIT,
+        min_limit: int = MIN_LIMIT,
+        max_limit: int = MAX_LIMIT,
+        window: int = 20,
+        tolerance: float = 1.5,
+        decrease_factor: float = 0.7,
+        baseline_windows: int = 50,
+        cooldown: float = 1.0,
+    ) -> None:
+        """
+        Initialize the limiter.
+
+        Args:
+            initial_limit (int): Concurrency before any latency has been observed.
+            min_limit (int): Lower bound for the limit.
+            max_limit (int): Upper bound for the limit.
+            window (int): Completed calls per adjustment.
+            tolerance (float): p90 / baseline ratio above which the limit is cut.
+            decrease_factor (float): Multiplier applied to the limit when backing off.
+            baseline_windows (int): Windows the baseline (lowest window p90) is taken over,
+                so a permanently slower upstream is eventually accepted as normal.
+            cooldown (float): Minimum seconds between throttling-triggered cuts.
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.window = max(1, window)
+        self.tolerance = tolerance
+        self.decrease_factor = decrease_factor
+        self._window_p90s: deque[float] = deque(maxlen=max(1, baseline_windows))
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        # guards the slot count, the queue and the samples; sync callers come from other threads
+        self._lock = threading.Lock()
+        # flow -> its waiters; flows are served round-robin in insertion order
+        self._waiters: OrderedDict[Hashable, deque[_Waiter]] = OrderedDict()
+        self._samples: list[float] = []
+        self._saturated = False
+        self._last_p90: Optional[float] = None
+        self._last_backoff = 0.0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def baseline(self) -> Optional[float]:
+        """Lowest window p90 latency seen over the recent windows."""
+        return min(self._window_p90s) if self._window_p90s else None
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def _try_acquire(self, flow: Hashable, waiter: _Waiter) -> bool:
+        # caller holds the lock; queues `waiter` when no slot is free
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return True
+        self._saturated = True
+        self._waiters.setdefault(flow, deque()).append(waiter)
+        return False
+
+    async def acquire(self, flow: Hashable = None) -> None:
+        """Wait for a slot; waiters of different flows are served in turn."""
+        waiter = _Waiter(future=asyncio.get_running_loop().create_future())
+        with self._lock:
+            if self._try_acquire(flow, waiter):
+                return
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._discard(flow, waiter)
+            if granted:
+                # the slot was handed over just as we were cancelled; pass it on
+                self.release()
+            raise
+
+    def acquire_blocking(self, flow: Hashable = None) -> None:
+        """Sync variant of :py:meth:`acquire` for calls made from worker threads.
+
+        On a thread that is running an event loop the slot is taken at once, even
+        over the limit: waiting would block the loop whose tasks hold the slots.
+        """
+        waiter = _Waiter(event=threading.Event())
+        on_loop = _loop_running()
+        with self._lock:
+            if on_loop:
+                self.in_flight += 1
+                return
+            if self._try_acquire(flow, waiter):
+                return
+        waiter.event.wait()
+
+    def _discard(self, flow: Hashable, waiter: _Waiter) -> None:
+        waiters = self._waiters.get(flow)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            pass
+        if not waiters:
+            del self._waiters[flow]
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    def _wake(self) -> None:
+        # caller holds the lock
+        while self._waiters and self.in_flight < self.limit:
+            flow, waiters = self._waiters.popitem(last=False)
+            waiter = waiters.popleft()
+            if waiters:
+                # the flow goes to the back of the line for its next waiter
+                self._waiters[flow] = waiters
+            if waiter.future is not None and waiter.future.done():
+                continue
+            self.in_flight += 1
+            waiter.grant()
+
+    @asynccontextmanager
+    async def slot(self, flow: Hashable = None) -> AsyncIterator[None]:
+        """Hold one unit of concurrency; the call's latency feeds the limit if it succeeds."""
+        await self.acquire(flow)
+        started = time.monotonic()
+        try:
+            yield
+            # failures are judged from transport records (`observe_attempt`), not here
+            self.record_latency(time.monotonic() - started)
+        finally:
+            self.release()
+
+    def record_latency(self, latency: float) -> None:
+        """Feed the latency of a successful call held under this limiter."""
+        with self._lock:
+            self._samples.append(latency)
+            if self._waiters:
+                self._saturated = True
+            if len(self._samples) >= self.window:
+                self._adjust()
+
+    def _adjust(self) -> None:
+        # caller holds the lock
+        p90 = _percentile(sorted(self._samples), 0.9)
+        self._samples.clear()
+        self._last_p90 = p90
+        self._window_p90s.append(p90)
+
+        if p90 > self.tolerance * self.baseline:
+            self._decrease()
+        elif self._saturated:
+            self._limit = min(self.max_limit, self._limit + 1)
+            self._wake()
+        self._saturated = False
+
+    def _decrease(self) -> None:
+        self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+
+    def observe_attempt(self, record: AttemptRecord) -> None:
+        """Transport listener: back off when the upstream throttles, fails retryably or times out."""
+        if (
+            record.status_code not in THROTTLE_STATUS_CODES
+            and record.error not in THROTTLE_ERRORS
+        ):
+            return
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_backoff < self.cooldown:
+                return
+            self._last_backoff = now
+            self._decrease()
+
+    def snapshot(self) -> dict:
+        """Current limit, load and latency estimates, for metrics."""
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "queued_flows": len(self._waiters),
+                "baseline_latency": self.baseline,
+                "p90_latency": self._last_p90,
+            }
+
+
+def limiter_for(max_concurrency: Optional[int]) -> Callable[[], AsyncContextManager]:
+    """Return a factory of concurrency slots for one stage call.
+
+    Args:
+        max_concurrency (Optional[int]): A fixed limit for this call only, or None to
+            leave concurrency entirely to the process-wide LLM governor.
+
+    Returns:
+        Callable[[], AsyncContextManager]: Call it and ``async with`` the result around each LLM call.
+    """
+    if max_concurrency is None:
+        return nullcontext
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return lambda: semaphore
@@ -55,6 +55,59 @@ class LLM_HCD_Label(BaseModel):
     )
 
 
+class Compact_LLM_HCD_Label(BaseModel):
+    """Model response for a single-activity classification call.
+
+    The model does not echo the activity; the caller rebuilds an `LLM_HCD_Label`
+    from the activity it sent and these labels.
+
+    Attributes:
+        HCD_Spaces: Ordered list of HCD spaces linked to the activity.
+        HCD_Subspaces: Ordered list of HCD subspaces linked to the activity.
+    """
+
+    HCD_Spaces: list[str] = Field(
+        ...,
+        description="MUST be exactly ONE of: ['understand', 'synthesize', 'ideate', 'prototype', 'implement']",
+    )
+    HCD_Subspaces: list[str] = Field(
+        ...,
+        description="MUST be exactly ONE of: ['explore', 'observe', 'empathize', 'reflect', 'debrief', 'organize', 'interpret', 'define', 'brainstorm', 'propose', 'plan', 'narrow concepts', 'create', 'engage', 'evaluate', 'iterate', 'support', 'sustain', 'evolve', 'execute']",
+    )
+
+
+class Indexed_LLM_HCD_Label(BaseModel):
+    """Model-assigned HCD labels for one row of a batched classification call.
+
+    Attributes:
+        index: Row index of the activity as numbered in the batch prompt.
+        HCD_Spaces: Ordered list of HCD spaces linked to the activity.
+        HCD_Subspaces: Ordered list of HCD subspaces linked to the activity.
+    """
+
+    index: int = Field(..., description="The number shown in brackets before the activity")
+    HCD_Spaces: list[str] = Field(
+        ...,
+        description="MUST be exactly ONE of: ['understand', 'synthesize', 'ideate', 'prototype', 'implement']",
+    )
+    HCD_Subspaces: list[str] = Field(
+        ...,
+        description="MUST be exactly ONE of: ['explore', 'observe', 'empathize', 'reflect', 'debrief', 'organize', 'interpret', 'define', 'brainstorm', 'propose', 'plan', 'narrow concepts', 'create', 'engage', 'evaluate', 'iterate', 'support', 'sustain', 'evolve', 'execute']",
+    )
+
+
+class List_Indexed_LLM_HCD_Label(BaseModel):
+    """Container for the rows returned by a batched classification call.
+
+    Attributes:
+        labels: One `Indexed_LLM_HCD_Label` per activity in the batch.
+    """
+
+    labels: list[Indexed_LLM_HCD_Label] = Field(
+        ..., description="One entry per activity in the batch, in any order"
+    )
+
+
 class Output_Label(BaseModel):
     """Final evaluation result for a student activity label.
 
@@ -86,6 +139,58 @@ class Output_Label(BaseModel):
     )
 
 
+class Compact_Output_Label(BaseModel):
+    """Model response for a final evaluation call: only the verdicts and their reason.
+
+    The caller rebuilds an `Output_Label` from the student entry it sent.
+
+    Attributes:
+        result: Verdict per student subspace; 1 correct, 0 not enough evidence, -1 incorrect.
+        Reason: Short justification for the verdicts.
+    """
+
+    result: list[int] = Field(
+        ...,
+        description=(
+            "Per-subspace evaluation results aligned to the student's subspaces. "
+            "Each item: 1=correct, 0=not enough evidence, -1=incorrect."
+        ),
+    )
+    Reason: str = Field(
+        ..., description="The reason for marking the result as 1, 0 or -1"
+    )
+
+
+class Fused_HCD_Label(BaseModel):
+    """Classification and per-subspace verdict produced by a single LLM call.
+
+    Attributes:
+        HCD_Spaces: Model-assigned HCD spaces for the activity.
+        HCD_Subspaces: Model-assigned HCD subspaces for the activity.
+        result: Verdict per student subspace; 1 correct, 0 not enough evidence, -1 incorrect.
+        Reason: Short justification for the verdicts.
+    """
+
+    HCD_Spaces: list[str] = Field(
+        ...,
+        description="Your own classification. MUST be exactly ONE of: ['understand', 'synthesize', 'ideate', 'prototype', 'implement']",
+    )
+    HCD_Subspaces: list[str] = Field(
+        ...,
+        description="Your own classification. MUST be exactly ONE of: ['explore', 'observe', 'empathize', 'reflect', 'debrief', 'organize', 'interpret', 'define', 'brainstorm', 'propose', 'plan', 'narrow concepts', 'create', 'engage', 'evaluate', 'iterate', 'support', 'sustain', 'evolve', 'execute']",
+    )
+    result: list[int] = Field(
+        ...,
+        description=(
+            "Per-subspace evaluation results aligned to the student's subspaces. "
+            "Each item: 1=correct, 0=not enough evidence, -1=incorrect."
+        ),
+    )
+    Reason: str = Field(
+        ..., description="The reason for marking the result as 1, 0 or -1"
+    )
+
+
 class List_Output_Label(BaseModel):
     """Container for multiple output label entries.
 
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""In-memory BM25 index of labelled activities for few-shot prompting.
+
+Instead of pasting one fixed example per subspace into every prompt,
+`ProcessingFewShot` asks `FewShotIndex` for the labelled activities most
+similar to the one being classified, up to ``FEW_SHOT_K`` examples and an
+approximate ``FEW_SHOT_TOKEN_BUDGET``. The index is built once per process
+from ``all_annotated_data.csv`` and can be rebuilt in place with
+:py:meth:`FewShotIndex.refresh` (from the CSV or from D1 ``labels`` rows).
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import dotenv
+
+dotenv.load_dotenv()
+
+FEW_SHOT_CSV_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "all_annotated_data.csv"
+)
+FEW_SHOT_K = int(os.getenv("FEW_SHOT_K", "4"))
+FEW_SHOT_TOKEN_BUDGET = int(os.getenv("FEW_SHOT_TOKEN_BUDGET", "400"))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# words every activity shares; they only dilute BM25 scores
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into",
+    "is", "it", "of", "on", "or", "our", "the", "their", "to", "was", "we", "were", "with",
+}
+
+
+def _tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def _activity_key(text: str) -> str:
+    return " ".join((text or "").split()).lower()
+
+
+def _split_labels(value: str) -> list[str]:
+    value = (value or "").replace(" and ", ",").replace(" & ", ",")
+    return [x.strip() for x in value.split(",") if x.strip()]
+
+
+@dataclass(frozen=True)
+class FewShotExample:
+    """A labelled activity usable as a few-shot example."""
+
+    activity: str
+    space: str
+    subspace: str
+    reason: str = ""
+
+    def render(self) -> str:
+        text = (
+            f'**Activity**: "{self.activity}"\n'
+            f'**Classification**:\n- HCD_Spaces: ["{self.space}"]\n'
+            f'- HCD_Subspaces: ["{self.subspace}"]\n'
+        )
+        if self.reason:
+            text += f"**Reasoning**: {self.reason}\n"
+        return text + "---\n"
+
+
+def examples_from_rows(rows: Iterable[dict]) -> list[FewShotExample]:
+    """
+    Keep the unambiguous, labelled rows of the ``labels`` table as examples.
+
+    Args:
+        rows (Iterable[dict]): Rows with Activity, HCD_Space, HCD_Subspace and Reason keys.
+
+    Returns:
+        list[FewShotExample]: One example per row with exactly one space and subspace, neither "unknown".
+    """
+    examples = []
+    for row in rows:
+        spaces = _split_labels(row.get("HCD_Space", ""))
+        subspaces = _split_labels(row.get("HCD_Subspace", ""))
+        if len(spaces) != 1 or len(subspaces) != 1:
+            continue
+        space, subspace = spaces[0].lower(), subspaces[0].lower()
+        activity = " ".join((row.get("Activity") or "").split())
+        if activity and space != "unknown" and subspace != "unknown":
+            examples.append(
+                FewShotExample(
+                    activity=activity,
+                    space=space,
+                    subspace=subspace,
+                    reason=(row.get("Reason") or "").strip(),
+                )
+            )
+    return examples
+
+
+def load_labeled_rows(csv_path: str = FEW_SHOT_CSV_PATH) -> list[dict]:
+    """Read the exported ``labels`` table, or return nothing (with a warning) if it is missing."""
+    if not os.path.exists(csv_path):
+        print(f"Warning: Few-shot CSV not found at {csv_path}")
+        return []
+    with open(csv_path, "r", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def format_examples(examples: list[FewShotExample]) -> str:
+    """Render examples as the prompt's few-shot block ("" when there are none)."""
+    if not examples:
+        return ""
+    return (
+        "## Few-Shot Examples\n"
+        "Here are some high-quality examples of correct classifications to guide your labeling:\n\n"
+        + "".join(example.render() for example in examples)
+    )
+
+
+class _BM25:
+    """Okapi BM25 over a fixed list of documents."""
+
+    def __init__(self, documents: list[list[str]], k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.lengths = [len(doc) for doc in documents]
+        self.avg_length = (sum(self.lengths) / len(documents)) if documents else 0.0
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        for doc_id, doc in enumerate(documents):
+            for term, tf in Counter(doc).items():
+                self.postings.setdefault(term, []).append((doc_id, tf))
+        n = len(documents)
+        self.idf = {
+            term: math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+
+    def scores(self, query: list[str]) -> dict[int, float]:
+        scores: dict[int, float] = {}
+        for term in set(query):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+
+class FewShotIndex:
+    """Retrieves the labelled activities most similar to a query activity."""
+
+    def __init__(self, examples: Optional[list[FewShotExample]] = None) -> None:
+        """
+        Build the index.
+
+        Args:
+            examples (Optional[list[FewShotExample]]): Examples to index; None loads the exported CSV.
+        """
+        self._lock = threading.Lock()
+        self.refresh(examples)
+
+    def refresh(self, examples: Optional[list[FewShotExample]] = None) -> None:
+        """Rebuild the index, by default from the exported CSV, and swap it in atomically."""
+        if examples is None:
+            examples = examples_from_rows(load_labeled_rows())
+        # identical activities would crowd out other examples
+        examples = list({_activity_key(example.activity): example for example in examples}.values())
+        bm25 = _BM25([_tokenize(example.activity) for example in examples])
+        digest = hashlib.sha256()
+        for example in examples:
+            digest.update(repr(example).encode("utf-8"))
+        with self._lock:
+            self._examples = examples
+            self._bm25 = bm25
+            self.version = digest.hexdigest()[:16]
+
+    def refresh_from_rows(self, rows: Iterable[dict]) -> None:
+        """Rebuild the index from rows of the D1 ``labels`` table."""
+        self.refresh(examples_from_rows(rows))
+
+    def __len__(self) -> int:
+        return len(self._examples)
+
+    def search(
+        self,
+        activity: str,
+        k: int = FEW_SHOT_K,
+        token_budget: int = FEW_SHOT_TOKEN_BUDGET,
+        exclude: Optional[str] = None,
+    ) -> list[FewShotExample]:
+        """
+        Return the examples most similar to `activity`, best first.
+
+        Args:
+            activity (str): Activity to find examples for.
+            k (int): Maximum number of examples.
+            token_budget (int): Approximate token cap (4 characters per token) for the rendered
+                examples; the best match is always included.
+            exclude (Optional[str]): Activity whose own example must not be returned, e.g. the
+                query itself when evaluating on the indexed rows; compared ignoring case and spacing.
+
+        Returns:
+            list[FewShotExample]: Up to `k` examples sharing terms with `activity`.
+        """
+        with self._lock:
+            examples, bm25 = self._examples, self._bm25
+        scores = bm25.scores(_tokenize(activity))
+        ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+
+        excluded = _activity_key(exclude) if exclude is not None else None
+        selected: list[FewShotExample] = []
+        used = 0
+        for doc_id in ranked:
+            if len(selected) == k:
+                break
+            if _activity_key(examples[doc_id].activity) == excluded:
+                continue
+            cost = len(examples[doc_id].render()) // 4
+            if selected and used + cost > token_budget:
+                break
+            selected.append(examples[doc_id])
+            used += cost
+        return selected
+
+
+_DEFAULT_INDEX: Optional[FewShotIndex] = None
+_DEFAULT_INDEX_LOCK = threading.Lock()
+
+
+def default_few_shot_index() -> FewShotIndex:
+    """Return the process-wide index, building it from the exported CSV on first use."""
+    global _DEFAULT_INDEX
+    with _DEFAULT_INDEX_LOCK:
+        if _DEFAULT_INDEX is None:
+            _DEFAULT_INDEX = FewShotIndex()
+        return _DEFAULT_INDEX
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Single-call classification and final evaluation (fused pipeline mode)."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.concurrency import limiter_for
+from core.data_table import (
+    Fused_HCD_Label,
+    List_Output_Label,
+    List_Student_HCD_Label,
+    LLM_HCD_Label,
+    Output_Label,
+    Student_HCD_Label,
+)
+from core.model_config import DEFAULT_MODEL
+from core.postprocessing import EVALUATION_FAILED_REASON, FinalProcessing
+from core.prompt import ACTIVITY_EVAL_SYS_PROMPT, FUSED_EVAL_INSTRUCTIONS
+from core.transport import recover_row, run_with_client
+from core.utils import KNOWN_SPACES, KNOWN_SUBSPACES, normalize_list
+
+
+class FusedProcessing:
+    """Classify an activity and judge the student's labels in one LLM round trip.
+
+    Produces the same `LLM_HCD_Label` and `Output_Label` objects as running
+    `Processing` followed by `FinalProcessing`, so callers can switch modes
+    without changing their response shape.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the FusedProcessing helper.
+
+        Binds the default chat model to the `Fused_HCD_Label` schema, which carries both the
+        model's classification and its per-subspace verdict on the student's labels.
+        """
+        self._model = DEFAULT_MODEL
+        self.bound_model = self._model.with_structured_output(Fused_HCD_Label)
+
+    @staticmethod
+    def _build_fused_prompt(student_entry: Student_HCD_Label) -> list[dict[str, str]]:
+        return [
+            {
+                "role": "system",
+                "content": ACTIVITY_EVAL_SYS_PROMPT + FUSED_EVAL_INSTRUCTIONS,
+            },
+            {
+                "role": "user",
+                "content": (
+                    "Classify the following activity according to the HCD rubric and "
+                    "evaluate the student's labels:\n\n"
+                    f"Activity: {student_entry.activity}\n"
+                    f"Student HCD Spaces: {', '.join(student_entry.HCD_Spaces)}\n"
+                    f"Student HCD Subspaces: {', '.join(student_entry.HCD_Subspaces)}\n"
+                ),
+            },
+        ]
+
+    @staticmethod
+    def _split_response(
+        student_entry: Student_HCD_Label, resp: Fused_HCD_Label
+    ) -> tuple[LLM_HCD_Label, Output_Label]:
+        llm_label = LLM_HCD_Label(
+            activity=student_entry.activity,
+            HCD_Spaces=normalize_list(resp.HCD_Spaces, KNOWN_SPACES),
+            HCD_Subspaces=normalize_list(resp.HCD_Subspaces, KNOWN_SUBSPACES),
+        )
+        output_label = FinalProcessing.output_label(
+            student_entry, resp.result, resp.Reason
+        )
+        return llm_label, output_label
+
+    def evaluate_entry(
+        self, student_entry: Student_HCD_Label
+    ) -> tuple[LLM_HCD_Label, Output_Label]:
+        """Classify one activity and judge its student labels with a single LLM call."""
+        resp = self.bound_model.invoke(self._build_fused_prompt(student_entry))
+        return self._split_response(student_entry, resp)
+
+    async def aevaluate_entry(
+        self, student_entry: Student_HCD_Label
+    ) -> tuple[LLM_HCD_Label, Output_Label]:
+        """Async variant of :py:meth:`evaluate_entry`."""
+        resp = await self.bound_model.ainvoke(self._build_fused_prompt(student_entry))
+        return self._split_response(student_entry, resp)
+
+    async def aevaluate_entry_or_skip(
+        self, student_entry: Student_HCD_Label
+    ) -> tuple[LLM_HCD_Label, Output_Label]:
+        """Variant of :py:meth:`aevaluate_entry` that never fails the report.
+
+        A call that still fails after the transport's retries, or whose reply does not parse,
+        leaves the row unlabelled and unevaluated.
+        """
+        return await recover_row(
+            self.aevaluate_entry(student_entry),
+            lambda: (
+                LLM_HCD_Label(activity=student_entry.activity, HCD_Spaces=[], HCD_Subspaces=[]),
+                FinalProcessing.not_evaluated(student_entry, EVALUATION_FAILED_REASON),
+            ),
+            "fused evaluation failed, leaving activity unlabelled",
+        )
+
+    def classify_and_eval(
+        self, table_data: List_Student_HCD_Label
+    ) -> tuple[list[LLM_HCD_Label], List_Output_Label]:
+        """
+        Classify and evaluate every activity entry produced by the preprocessing stage.
+
+        Args:
+            table_data (List_Student_HCD_Label): The structured table data containing student activities.
+
+        Returns:
+            tuple[list[LLM_HCD_Label], List_Output_Label]: Model labels and final verdicts, in table order.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return run_with_client(self.aclassify_and_eval(table_data))
+
+        # Fallback to sequential evaluation if already inside an event loop.
+        pairs = [self.evaluate_entry(entry) for entry in table_data.tables]
+        return [p[0] for p in pairs], List_Output_Label(labels=[p[1] for p in pairs])
+
+    async def aclassify_and_eval(
+        self, table_data: List_Student_HCD_Label, max_concurrency: int | None = None
+    ) -> tuple[list[LLM_HCD_Label], List_Output_Label]:
+        slot = limiter_for(max_concurrency)
+
+        async def evaluate(student_entry: Student_HCD_Label):
+            async with slot():
+                return await self.aevaluate_entry_or_skip(student_entry)
+
+        pairs = await asyncio.gather(*(evaluate(e) for e in table_data.tables))
+        return [p[0] for p in pairs], List_Output_Label(labels=[p[1] for p in pairs])
+
+
+if __name__ == "__main__":
+    from core.postprocessing import FinalProcessing
+    from core.preprocessing import PreProcessor
+
+    fused_processor = FusedProcessing()
+    preprocessor = PreProcessor()
+    pdf_path = os.path.join(
+        os.path.dirname(__file__),
+        "..",
+        "data",
+        "progress_report_1.pdf",
+    )
+
+    student_table_data = preprocessor.invoke(pdf_path)
+    _, final_output = fused_processor.classify_and_eval(student_table_data)
+    print("\nFused Evaluation Results:")
+    FinalProcessing().display_output_labels(final_output)
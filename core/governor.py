@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""Process-wide governor for upstream LLM calls.
+
+Every `IllinoisChatLLM` call in the process (preprocessing, classification,
+final evaluation, fused mode, `data_extract_llm.py`) passes through
+`LLM_GOVERNOR`, so 20 concurrent API requests share one budget instead of
+each opening its own burst of calls. Each model gets:
+
+- a token bucket capping the request rate (requests per minute plus a burst);
+- an `AdaptiveLimiter` capping concurrency, whose waiters are queued per
+  flow and served round-robin.
+
+A flow is whatever unit of work should be treated fairly against the others,
+typically one API request or one background job; callers tag their work with
+`llm_flow`. Untagged calls share a single default flow.
+
+Budgets come from env: ``LLM_RATE_PER_MINUTE`` / ``LLM_RATE_BURST`` set the
+default, and ``LLM_MODEL_BUDGETS`` (JSON) overrides them per model, e.g.
+``{"Qwen/Qwen2.5-VL-72B-Instruct": {"rpm": 120, "burst": 10, "max_concurrency": 16}}``.
+
+The budget is taken per HTTP attempt (the wrapper passes `acall` / `call` to
+the transport as its attempt guard), so every retry spends a rate token and no
+slot is held while a retry backs off. Sync calls share the same limit as
+async ones, except that a sync call on a thread running an event loop (the
+stages' in-loop sync fallbacks) takes its slot without waiting rather than
+deadlock the loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncIterator, Hashable, Iterator, Optional
+
+import dotenv
+
+from core.concurrency import MAX_LIMIT, AdaptiveLimiter
+from core.transport import ATTEMPT_LISTENERS, AttemptRecord
+
+dotenv.load_dotenv()
+
+# 0 disables rate limiting for models without an explicit budget
+DEFAULT_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "0"))
+DEFAULT_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+MODEL_BUDGETS: dict[str, dict] = json.loads(os.getenv("LLM_MODEL_BUDGETS", "{}") or "{}")
+
+DEFAULT_FLOW = "default"
+current_flow: ContextVar[Hashable] = ContextVar("llm_flow", default=DEFAULT_FLOW)
+
+
+@contextmanager
+def llm_flow(flow: Hashable) -> Iterator[None]:
+    """Tag every LLM call made inside the block (and tasks it spawns) with `flow`."""
+    token = current_flow.set(flow)
+    try:
+        yield
+    finally:
+        current_flow.reset(token)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; callers reserve a token and sleep for the returned delay."""
+
+    def __init__(self, rate_per_minute: float, burst: int) -> None:
+        """
+        Initialize the bucket full.
+
+        Args:
+            rate_per_minute (float): Sustained requests per minute; 0 or less disables the bucket.
+            burst (int): Bucket capacity, i.e. requests allowed back to back.
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def reserve(self) -> float:
+        """Take a token, possibly from the future, and return seconds to wait before using it."""
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self) -> None:
+        """Return a reserved token that was never used (e.g. the caller was cancelled)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "rate_per_minute": self.rate * 60.0,
+                "burst": self.capacity,
+                "tokens": round(self._tokens, 2),
+            }
+
+
+@dataclass
+class ModelBudget:
+    """Rate and concurrency budget for one upstream model."""
+
+    bucket: TokenBucket
+    limiter: AdaptiveLimiter
+
+
+class LLMGovernor:
+    """Hands out per-model rate and concurrency budget to every LLM call in the process."""
+
+    def __init__(self, budgets: Optional[dict[str, dict]] = None) -> None:
+        """
+        Initialize the governor.
+
+        Args:
+            budgets (Optional[dict[str, dict]]): Per-model overrides with optional
+                "rpm", "burst" and "max_concurrency" keys.
+        """
+        self._overrides = budgets if budgets is not None else MODEL_BUDGETS
+        self._budgets: dict[str, ModelBudget] = {}
+        self._lock = threading.Lock()
+
+    def budget(self, model: str) -> ModelBudget:
+        with self._lock:
+            budget = self._budgets.get(model)
+            if budget is None:
+                override = self._overrides.get(model, {})
+                budget = ModelBudget(
+                    bucket=TokenBucket(
+                        override.get("rpm", DEFAULT_RATE_PER_MINUTE),
+                        override.get("burst", DEFAULT_RATE_BURST),
+                    ),
+                    limiter=AdaptiveLimiter(
+                        max_limit=override.get("max_concurrency", MAX_LIMIT)
+                    ),
+                )
+                self._budgets[model] = budget
+            return budget
+
+    @asynccontextmanager
+    async def acall(self, model: str) -> AsyncIterator[None]:
+        """Hold a concurrency slot and a rate token for one async attempt at `model`.
+
+        The attempt's latency feeds the limiter only if the block exits cleanly.
+        """
+        budget = self.budget(model)
+        await budget.limiter.acquire(current_flow.get())
+        try:
+            delay = budget.bucket.reserve()
+            if delay > 0:
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    budget.bucket.refund()
+                    raise
+            # time only the call itself so rate-limit waits do not read as congestion
+            started = time.monotonic()
+            yield
+            budget.limiter.record_latency(time.monotonic() - started)
+        finally:
+            budget.limiter.release()
+
+    @contextmanager
+    def call(self, model: str) -> Iterator[None]:
+        """Sync variant of :py:meth:`acall`, blocking the calling thread while it waits."""
+        budget = self.budget(model)
+        budget.limiter.acquire_blocking(current_flow.get())
+        try:
+            delay = budget.bucket.reserve()
+            if delay > 0:
+                time.sleep(delay)
+            started = time.monotonic()
+            yield
+            budget.limiter.record_latency(time.monotonic() - started)
+        finally:
+            budget.limiter.release()
+
+    def observe_attempt(self, record: AttemptRecord) -> None:
+        # every model is served by the same upstream, so throttling applies to all
+        with self._lock:
+            budgets = list(self._budgets.values())
+        for budget in budgets:
+            budget.limiter.observe_attempt(record)
+
+    def snapshot(self) -> dict:
+        """Per-model concurrency and rate state, for metrics."""
+        with self._lock:
+            budgets = dict(self._budgets)
+        return {
+            model: {
+                "concurrency": budget.limiter.snapshot(),
+                "rate": budget.bucket.snapshot() if budget.bucket.enabled else None,
+            }
+            for model, budget in budgets.items()
+        }
+
+
+LLM_GOVERNOR = LLMGovernor()
+ATTEMPT_LISTENERS.append(LLM_GOVERNOR.observe_attempt)
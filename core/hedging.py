@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""Hedged requests for upstream LLM calls.
+
+A few slow upstream calls dominate per-report latency because the pipeline
+waits for its slowest row. With hedging enabled, a call that has not returned
+after the rolling p90 latency (by default) gets a duplicate; whichever
+response arrives first is used and the other call is cancelled. A budget caps
+hedges to a fraction of all calls so hedging cannot multiply upstream load
+when everything is slow.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from collections import Counter, deque
+from fractions import Fraction
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def _consume_outcome(task: asyncio.Task) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+class HedgePolicy:
+    """Issues a duplicate call when the first is slower than a rolling latency quantile."""
+
+    def __init__(
+        self,
+        quantile: float = 0.9,
+        budget: float = 0.1,
+        min_samples: int = 20,
+        window: int = 200,
+        min_delay: float = 0.5,
+    ) -> None:
+        """
+        Initialize the policy.
+
+        Args:
+            quantile (float): Latency quantile of recent calls after which a hedge is sent.
+            budget (float): Maximum hedges as a fraction of calls (0.1 = at most 1 in 10).
+            min_samples (int): Calls observed before hedging starts.
+            window (int): Recent call latencies the quantile is computed over.
+            min_delay (float): Lower bound in seconds for the hedge delay.
+        """
+        self.quantile = quantile
+        self.budget = budget
+        # exact arithmetic, so ten calls at budget 0.1 earn exactly one hedge
+        self._budget = Fraction(budget).limit_denominator(10_000)
+        self.min_samples = max(1, min_samples)
+        self.min_delay = min_delay
+        self._latencies: deque[float] = deque(maxlen=max(self.min_samples, window))
+        # hedges accrue `budget` credit per call and cost 1; capped so idle time does not bank a burst
+        self._credit = Fraction(0)
+        self._max_credit = max(Fraction(1), self._budget * 10)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while too few calls have been observed."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = max(0, math.ceil(self.quantile * len(ordered)) - 1)
+        return max(self.min_delay, ordered[index])
+
+    def _record(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _start_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+            self._credit = min(self._max_credit, self._credit + self._budget)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._credit < 1:
+                return False
+            self._credit -= 1
+            self.hedges += 1
+            return True
+
+    async def run(self, make_call: Callable[[], Awaitable[T]]) -> T:
+        """Run `make_call()`, hedging it with a second `make_call()` if it is slow.
+
+        Args:
+            make_call (Callable[[], Awaitable[T]]): Starts one independent attempt of the call.
+
+        Returns:
+            T: The first successful result. If every attempt fails, the primary's error is raised.
+        """
+        self._start_call()
+        started = time.monotonic()
+        primary = asyncio.ensure_future(make_call())
+        delay = self.delay()
+
+        try:
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            if primary.done() or delay is None or not self._spend():
+                result = await primary
+                self._record(time.monotonic() - started)
+                return result
+        except BaseException:
+            if not primary.done():
+                primary.cancel()
+            raise
+
+        hedge = asyncio.ensure_future(make_call())
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        self._record(time.monotonic() - started)
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+            # both attempts failed
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(_consume_outcome)
+            for task in (primary, hedge):
+                if task.done():
+                    _consume_outcome(task)
+
+    def snapshot(self) -> dict:
+        """Hedging counters and the current hedge delay, for metrics."""
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "delay": self.delay(),
+            "quantile": self.quantile,
+            "budget": self.budget,
+        }
+
+
+# (model, quantile, budget) -> policy; callers with different settings never share one
+_POLICIES: dict[tuple[str, float, float], HedgePolicy] = {}
+_POLICIES_LOCK = threading.Lock()
+
+
+def hedge_policy_for(model: str, quantile: float, budget: float) -> HedgePolicy:
+    """Return the process-wide hedge policy for `model` and these settings, creating it on first use."""
+    key = (model, quantile, budget)
+    with _POLICIES_LOCK:
+        policy = _POLICIES.get(key)
+        if policy is None:
+            policy = _POLICIES[key] = HedgePolicy(quantile=quantile, budget=budget)
+        return policy
+
+
+def hedging_snapshot() -> dict:
+    """Hedging counters per model; a model hedged with several settings gets one entry per setting."""
+    with _POLICIES_LOCK:
+        policies = dict(_POLICIES)
+    per_model = Counter(model for model, _, _ in policies)
+    return {
+        model if per_model[model] == 1 else f"{model} (quantile={quantile}, budget={budget})": (
+            policy.snapshot()
+        )
+        for (model, quantile, budget), policy in policies.items()
+    }
@@ -0,0 +1,538 @@
+# -*- coding: utf-8 -*-
+"""Durable background jobs for long classification runs.
+
+Submitting a report stores its PDF and a job row in a local SQLite database
+and returns immediately; `JobRunner` workers claim queued jobs, run them, and
+append each partial result as an event so clients can poll or follow along.
+Because the queue lives on disk, jobs interrupted by a restart are put back
+in the queue on the next start instead of being lost.
+
+Jobs are idempotent on (content hash, mode): submitting the same PDF again
+returns the existing job rather than classifying it twice.
+
+Events are tagged with the attempt that recorded them. When a job is retried,
+the partial results of the failed attempt are dropped and only its ``retry``
+event is kept, so the event log never shows the same row twice. A retried
+job waits an exponentially growing delay before it can be claimed again, so
+a short upstream outage does not use up all of its attempts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import dotenv
+
+from core.llm_cache import CACHE_DIR
+from core.pdf_parsing import PDFParseError
+
+dotenv.load_dotenv()
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(CACHE_DIR, "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# a retried job waits base * 2^(attempt - 1) seconds, capped, so an upstream outage
+# does not use up every attempt within seconds
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "5"))
+JOB_RETRY_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_MAX_SECONDS", "300"))
+# finished jobs (and their PDFs) older than this are purged at startup; 0 keeps them
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+
+@dataclass
+class Job:
+    """A classification job as stored in the queue.
+
+    Attributes:
+        id: Job id returned to the client.
+        sha256: Hex digest of the PDF content.
+        mode: Pipeline mode the job runs with.
+        filename: Name of the uploaded file.
+        status: One of "queued", "running", "succeeded" or "failed".
+        attempts: Times a worker has claimed the job.
+        error: Failure detail, when the job failed.
+        result: Final result payload, when the job succeeded.
+        created_at: Submission time (epoch seconds).
+        updated_at: Time of the last status change (epoch seconds).
+        available_at: Earliest time a queued job may be claimed (epoch seconds).
+    """
+
+    id: str
+    sha256: str
+    mode: str
+    filename: str
+    status: str
+    attempts: int
+    error: Optional[str]
+    result: Optional[dict]
+    created_at: float
+    updated_at: float
+    available_at: float
+
+    @property
+    def finished(self) -> bool:
+        return self.status in {"succeeded", "failed"}
+
+
+_JOB_COLUMNS = (
+    "id, sha256, mode, filename, status, attempts, error, result, created_at, updated_at, "
+    "available_at"
+)
+
+
+def _row_to_job(row: tuple) -> Job:
+    return Job(
+        id=row[0],
+        sha256=row[1],
+        mode=row[2],
+        filename=row[3],
+        status=row[4],
+        attempts=row[5],
+        error=row[6],
+        result=json.loads(row[7]) if row[7] else None,
+        created_at=row[8],
+        updated_at=row[9],
+        available_at=row[10],
+    )
+
+
+class JobStore:
+    """SQLite-backed job queue holding job rows, their PDFs, and their events."""
+
+    def __init__(self, path: str = JOBS_DB_PATH) -> None:
+        """
+        Open (or create) the job database.
+
+        Args:
+            path (str): SQLite file location; parent directories are created.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    available_at REAL NOT NULL DEFAULT 0,
+                    UNIQUE (sha256, mode)
+                );
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+                CREATE TABLE IF NOT EXISTS job_blobs (
+                    sha256 TEXT PRIMARY KEY,
+                    data BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS job_events (
+                    job_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (job_id, seq)
+                );
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "available_at" not in columns:
+                # databases created before retries were delayed
+                self._conn.execute(
+                    "ALTER TABLE jobs ADD COLUMN available_at REAL NOT NULL DEFAULT 0"
+                )
+
+    def submit(self, data: bytes, sha256: str, filename: str, mode: str) -> tuple[Job, bool]:
+        """Queue a job for a PDF, or return the existing job for the same content and mode.
+
+        A previously failed job for the same content is reset and queued again.
+
+        Args:
+            data (bytes): The PDF content.
+            sha256 (str): Hex digest of `data`.
+            filename (str): Name of the uploaded file.
+            mode (str): Pipeline mode.
+
+        Returns:
+            tuple[Job, bool]: The job and whether it was (re)queued by this call.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs WHERE sha256 = ? AND mode = ?",
+                (sha256, mode),
+            ).fetchone()
+            if row is not None and row[4] != "failed":
+                return _row_to_job(row), False
+
+            self._conn.execute(
+                "INSERT OR IGNORE INTO job_blobs (sha256, data) VALUES (?, ?)",
+                (sha256, data),
+            )
+            if row is None:
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO jobs (id, sha256, mode, filename, status, created_at, updated_at, "
+                    "available_at) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, sha256, mode, filename, now, now, now),
+                )
+            else:
+                job_id = row[0]
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', attempts = 0, error = NULL, "
+                    "result = NULL, filename = ?, updated_at = ?, available_at = ? WHERE id = ?",
+                    (filename, now, now, job_id),
+                )
+                self._conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+            row = self._conn.execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return _row_to_job(row), True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return _row_to_job(row) if row is not None else None
+
+    def blob(self, sha256: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM job_blobs WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def claim(self) -> Optional[Job]:
+        """Atomically move the oldest queued job that is due to "running" and return it."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? "
+                f"WHERE id = (SELECT id FROM jobs WHERE status = 'queued' AND available_at <= ? "
+                f"ORDER BY created_at LIMIT 1) RETURNING {_JOB_COLUMNS}",
+                (now, now),
+            ).fetchone()
+        return _row_to_job(row) if row is not None else None
+
+    def _set_status(self, job_id: str, status: str, **fields) -> None:
+        assignments = "".join(f", {name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET status = ?, updated_at = ?{assignments} WHERE id = ?",
+                (status, time.time(), *fields.values(), job_id),
+            )
+
+    def succeed(self, job_id: str, result: dict) -> None:
+        self._set_status(job_id, "succeeded", result=json.dumps(result, ensure_ascii=False))
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._set_status(job_id, "failed", error=error)
+
+    def requeue(self, job_id: str, attempt: int, detail: str, delay: float = 0.0) -> None:
+        """Put a running job back in the queue, recording a ``retry`` event for the attempt that stopped.
+
+        Args:
+            job_id (str): Job to requeue; nothing happens unless it is still running.
+            attempt (int): The attempt that failed or was interrupted.
+            detail (str): Why it stopped.
+            delay (float): Seconds before the job may be claimed again.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ?, available_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                (now, now + delay, job_id),
+            )
+            if cursor.rowcount:
+                self._append_event(
+                    job_id, {"event": "retry", "attempt": attempt, "detail": detail}
+                )
+
+    def recover(self, max_attempts: int = JOB_MAX_ATTEMPTS) -> int:
+        """Requeue jobs left "running" by a previous process.
+
+        Jobs that have already used `max_attempts` are failed instead, so a PDF
+        that crashes the worker cannot loop forever.
+
+        Returns:
+            int: Number of jobs put back in the queue.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted too many times.', "
+                "updated_at = ? WHERE status = 'running' AND attempts >= ?",
+                (now, max_attempts),
+            )
+            interrupted = self._conn.execute(
+                "SELECT id, attempts FROM jobs WHERE status = 'running'"
+            ).fetchall()
+            for job_id, attempt in interrupted:
+                self._append_event(
+                    job_id,
+                    {"event": "retry", "attempt": attempt, "detail": "Interrupted by a restart."},
+                )
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ?, available_at = ? "
+                "WHERE status = 'running'",
+                (now, now),
+            )
+        return len(interrupted)
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs last updated before `older_than`, with their events and PDFs.
+
+        Returns:
+            int: Number of jobs removed.
+        """
+        with self._lock, self._conn:
+            ids = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT id FROM jobs WHERE status IN ('succeeded', 'failed') "
+                    "AND updated_at < ?",
+                    (older_than,),
+                )
+            ]
+            self._conn.executemany(
+                "DELETE FROM job_events WHERE job_id = ?", [(i,) for i in ids]
+            )
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in ids])
+            self._conn.execute(
+                "DELETE FROM job_blobs WHERE sha256 NOT IN (SELECT sha256 FROM jobs)"
+            )
+        return len(ids)
+
+    def _append_event(self, job_id: str, payload: dict) -> int:
+        # caller holds the lock and the transaction
+        seq = self._conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()[0]
+        self._conn.execute(
+            "INSERT INTO job_events (job_id, seq, payload) VALUES (?, ?, ?)",
+            (job_id, seq, json.dumps(payload, ensure_ascii=False)),
+        )
+        return seq
+
+    def append_event(self, job_id: str, payload: dict) -> int:
+        """Record a partial result for a job and return its sequence number."""
+        with self._lock, self._conn:
+            return self._append_event(job_id, payload)
+
+    def discard_events(self, job_id: str, before_attempt: int) -> None:
+        """Delete the partial results of attempts before `before_attempt`, keeping their retry events.
+
+        Every requeue records a ``retry`` event last, so the highest sequence number
+        survives and new events keep numbering after the ones clients have seen.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM job_events WHERE job_id = ? "
+                "AND COALESCE(json_extract(payload, '$.attempt'), 0) < ? "
+                "AND json_extract(payload, '$.event') IS NOT 'retry'",
+                (job_id, before_attempt),
+            )
+
+    def count_events(self, job_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM job_events WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+
+    def events(self, job_id: str, after: int = 0) -> list[tuple[int, dict]]:
+        """Return a job's events with sequence number greater than `after`, in order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, payload FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after),
+            ).fetchall()
+        return [(seq, json.loads(payload)) for seq, payload in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# (job, pdf bytes, emit) -> result payload; awaiting `emit` records a partial-result event
+JobHandler = Callable[[Job, bytes, Callable[[dict], Awaitable[None]]], Awaitable[dict]]
+
+
+class JobRunner:
+    """Runs queued jobs on a fixed number of asyncio workers."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        handler: JobHandler,
+        workers: int = JOB_WORKERS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        poll_interval: float = 5.0,
+        retry_backoff: float = JOB_RETRY_BACKOFF_SECONDS,
+        retry_backoff_max: float = JOB_RETRY_BACKOFF_MAX_SECONDS,
+    ) -> None:
+        """
+        Initialize the runner. Workers are not started until `start`.
+
+        Args:
+            store (JobStore): Queue to claim jobs from.
+            handler (JobHandler): Coroutine that runs one job and returns its result payload.
+            workers (int): Jobs processed concurrently.
+            max_attempts (int): Attempts before a job that keeps failing transiently is failed.
+            poll_interval (float): Seconds an idle worker waits before checking the queue again.
+            retry_backoff (float): Delay before the first retry; doubled for each later attempt.
+            retry_backoff_max (float): Longest delay before a retry.
+        """
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self._tasks: list[asyncio.Task] = []
+        # running job id -> attempt
+        self._running: dict[str, int] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._changed: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        """Requeue interrupted jobs, purge expired ones, and start the workers."""
+        self._wakeup = asyncio.Event()
+        self._changed = asyncio.Event()
+        recovered = self.store.recover(self.max_attempts)
+        if recovered:
+            print(f"Requeued {recovered} interrupted job(s).")
+        if JOB_RETENTION_SECONDS > 0:
+            self.store.purge(time.time() - JOB_RETENTION_SECONDS)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stop the workers; jobs they were running go back to the queue."""
+        # workers forget their job as they unwind, so take the list first
+        running = dict(self._running)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job_id, attempt in running.items():
+            self.store.requeue(job_id, attempt, "Interrupted by shutdown.")
+        self._running.clear()
+
+    def retry_delay(self, attempt: int) -> float:
+        """Seconds a job waits in the queue after its `attempt`-th attempt failed."""
+        return min(self.retry_backoff_max, self.retry_backoff * 2 ** (attempt - 1))
+
+    def notify(self) -> None:
+        """Wake idle workers, e.g. right after a job is submitted."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _publish(self) -> None:
+        # swap in a fresh event so every current subscriber wakes exactly once
+        changed, self._changed = self._changed, asyncio.Event()
+        if changed is not None:
+            changed.set()
+
+    async def wait_for_change(self, timeout: float) -> None:
+        """Wait until any job records an event or changes status, or `timeout` passes."""
+        if self._changed is None:
+            await asyncio.sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _work(self) -> None:
+        while True:
+            job = None
+            try:
+                job = await asyncio.to_thread(self.store.claim)
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                self._running[job.id] = job.attempts
+                try:
+                    await self._run(job)
+                finally:
+                    self._running.pop(job.id, None)
+            except Exception as exc:
+                # e.g. "database is locked"; a dead worker would leave jobs queued forever
+                print(f"Warning: job worker error, retrying in {self.poll_interval}s: {exc!r}")
+                await asyncio.sleep(self.poll_interval)
+                if job is not None:
+                    await self._release(job, f"Worker error: {exc}")
+
+    async def _release(self, job: Job, detail: str) -> None:
+        # best effort; if the store is still failing, the next restart requeues the job
+        try:
+            await asyncio.to_thread(
+                self.store.requeue, job.id, job.attempts, detail, self.retry_delay(job.attempts)
+            )
+        except Exception as exc:
+            print(f"Warning: could not requeue job {job.id}: {exc!r}")
+        self._publish()
+
+    async def _run(self, job: Job) -> None:
+        async def emit(payload: dict) -> None:
+            # SQLite writes stay off the event loop
+            await asyncio.to_thread(
+                self.store.append_event, job.id, {**payload, "attempt": job.attempts}
+            )
+            self._publish()
+
+        if job.attempts > 1:
+            await asyncio.to_thread(self.store.discard_events, job.id, job.attempts)
+            self._publish()
+
+        data = await asyncio.to_thread(self.store.blob, job.sha256)
+        if data is None:
+            await asyncio.to_thread(self.store.fail, job.id, "Job PDF is missing.")
+            self._publish()
+            return
+
+        try:
+            result = await self.handler(job, data, emit)
+        except asyncio.CancelledError:
+            raise
+        except PDFParseError as exc:
+            # the PDF itself is bad; retrying will not help
+            await emit({"event": "error", "detail": str(exc)})
+            await asyncio.to_thread(self.store.fail, job.id, str(exc))
+        except Exception as exc:
+            if job.attempts < self.max_attempts:
+                await asyncio.to_thread(
+                    self.store.requeue,
+                    job.id,
+                    job.attempts,
+                    str(exc),
+                    self.retry_delay(job.attempts),
+                )
+            else:
+                await emit({"event": "error", "detail": str(exc)})
+                await asyncio.to_thread(self.store.fail, job.id, str(exc))
+        else:
+            await asyncio.to_thread(self.store.succeed, job.id, result)
+        self._publish()
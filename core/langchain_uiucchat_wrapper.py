@@ -1,14 +1,22 @@
 from typing import Any, List, Optional, Type, Union, Dict
 import os
-import copy
-import requests
 import dotenv
 
+from langchain_core.caches import BaseCache
+from langchain_core.exceptions import OutputParserException
 from langchain_core.language_models.chat_models import SimpleChatModel
-from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
 from langchain_core.runnables import Runnable, RunnableLambda
 from pydantic import BaseModel
 
+from core.cassette import Cassette
+from core.governor import LLM_GOVERNOR
+from core.hedging import hedge_policy_for
+from core.structured_output import build_messages, format_instructions, parse_structured
+from core.transport import RetryPolicy, apost_json, post_json
+
 dotenv.load_dotenv()
 
 
@@ -19,22 +27,30 @@ class IllinoisChatLLM(SimpleChatModel):
     course_name: str
     model: str = "Qwen/Qwen2.5-VL-72B-Instruct"
     temperature: float = 0.1
-    base_url: str = "https://chat.illinois.edu/api/chat-api/chat"
+    # point at `fake_chat_server.py` for offline benchmarks
+    base_url: str = os.getenv(
+        "UIUC_CHAT_BASE_URL", "https://chat.illinois.edu/api/chat-api/chat"
+    )
     system_prompt: str = (
         "You are a helpful AI assistant. Follow instructions carefully."
     )
+    connect_timeout: float = float(os.getenv("UIUC_CHAT_CONNECT_TIMEOUT", "10"))
+    read_timeout: float = float(os.getenv("UIUC_CHAT_READ_TIMEOUT", "120"))
+    max_retries: int = int(os.getenv("UIUC_CHAT_MAX_RETRIES", "3"))
+    backoff_base: float = float(os.getenv("UIUC_CHAT_BACKOFF_BASE", "0.5"))
+    backoff_max: float = float(os.getenv("UIUC_CHAT_BACKOFF_MAX", "30"))
+    # opt-in: duplicate async calls slower than the rolling `hedge_quantile` latency
+    hedge: bool = os.getenv("UIUC_CHAT_HEDGE", "false").lower() in {"1", "true", "yes"}
+    hedge_quantile: float = float(os.getenv("UIUC_CHAT_HEDGE_QUANTILE", "0.9"))
+    hedge_budget: float = float(os.getenv("UIUC_CHAT_HEDGE_BUDGET", "0.1"))
+    # record calls to, or replay them from, a cassette (see core.cassette)
+    cassette: Optional[Cassette] = None
 
     @property
     def _llm_type(self) -> str:
         return "illinois_chat"
 
-    def _call(
-        self,
-        messages: List[BaseMessage],
-        stop: Optional[List[str]] = None,
-        run_manager: Optional[Any] = None,
-        **kwargs: Any,
-    ) -> str:
+    def _build_payload(self, messages: List[BaseMessage]) -> dict:
         api_messages = []
         has_system_prompt = False
 
@@ -52,7 +68,7 @@ class IllinoisChatLLM(SimpleChatModel):
         if not has_system_prompt and self.system_prompt:
             api_messages.insert(0, {"role": "system", "content": self.system_prompt})
 
-        data = {
+        return {
             "model": self.model,
             "messages": api_messages,
             "api_key": self.api_key,
@@ -62,15 +78,102 @@ class IllinoisChatLLM(SimpleChatModel):
             "retrieval_only": False,
         }
 
-        response = requests.post(
-            self.base_url, headers={"Content-Type": "application/json"}, json=data
+    def _retry_policy(self) -> RetryPolicy:
+        return RetryPolicy(
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            max_retries=self.max_retries,
+            backoff_base=self.backoff_base,
+            backoff_max=self.backoff_max,
+        )
+
+    def _call(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> str:
+        payload = self._build_payload(messages)
+
+        def upstream() -> dict:
+            return post_json(
+                self.base_url,
+                payload,
+                self._retry_policy(),
+                guard=lambda: LLM_GOVERNOR.call(self.model),
+            )
+
+        if self.cassette is not None:
+            response = self.cassette.call(payload, upstream)
+        else:
+            response = upstream()
+        return response.get("message", "")
+
+    async def _acall(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Async variant of :py:meth:`_call` using the shared keep-alive pool.
+
+        When `hedge` is set, a call slower than the rolling latency quantile is
+        duplicated and the first response wins (see :py:mod:`core.hedging`).
+        """
+        payload, policy = self._build_payload(messages), self._retry_policy()
+
+        async def attempt() -> dict:
+            return await apost_json(
+                self.base_url, payload, policy, guard=lambda: LLM_GOVERNOR.acall(self.model)
+            )
+
+        async def upstream() -> dict:
+            if not self.hedge:
+                return await attempt()
+            hedge_policy = hedge_policy_for(
+                self.model, self.hedge_quantile, self.hedge_budget
+            )
+            return await hedge_policy.run(attempt)
+
+        if self.cassette is not None:
+            response = await self.cassette.acall(payload, upstream)
+        else:
+            response = await upstream()
+        return response.get("message", "")
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        output_str = await self._acall(
+            messages, stop=stop, run_manager=run_manager, **kwargs
         )
-        response.raise_for_status()
-        return response.json().get("message", "")
+        message = AIMessage(content=output_str)
+        return ChatResult(generations=[ChatGeneration(message=message)])
 
     @property
     def _identifying_params(self) -> dict:
-        return {"model": self.model, "course_name": self.course_name}
+        return {
+            "model": self.model,
+            "course_name": self.course_name,
+            "temperature": self.temperature,
+        }
+
+    def _structured_cache(self) -> Optional[BaseCache]:
+        return self.cache if isinstance(self.cache, BaseCache) else None
+
+    def _uncached(self) -> "IllinoisChatLLM":
+        # the structured-output runnable does its own caching, after the reply parses
+        return self.model_copy(update={"cache": False})
+
+    def _cache_key(self, messages: List[BaseMessage]) -> tuple[str, str]:
+        # same key LangChain's generate path uses, so entries are shared with plain invokes
+        return dumps(messages), self._get_llm_string()
 
     def with_structured_output(
         self,
@@ -79,56 +182,64 @@ class IllinoisChatLLM(SimpleChatModel):
         include_raw: bool = False,
         **kwargs: Any,
     ) -> Runnable:
-        """Adds structured output capability to the model."""
-        from langchain_core.output_parsers import PydanticOutputParser
+        """Adds structured output capability to the model.
 
+        Format instructions are rendered once per schema and replies are parsed
+        with a tolerant JSON extraction (see :py:mod:`core.structured_output`).
+        A reply is written to the response cache only once it parses, so a
+        malformed or truncated reply is retried rather than replayed.
+        """
         if not (isinstance(schema, type) and issubclass(schema, BaseModel)):
             raise ValueError(
                 "Currently only Pydantic BaseModel is supported as schema."
             )
 
-        parser = PydanticOutputParser(pydantic_object=schema)
+        instructions = format_instructions(schema)
 
         def _inject_instructions(messages: Any) -> List[BaseMessage]:
-            # Normalize input to List[BaseMessage]
-            if isinstance(messages, str):
-                new_messages = [HumanMessage(content=messages)]
-            elif isinstance(messages, list):
-                new_messages = []
-                for m in messages:
-                    if isinstance(m, BaseMessage):
-                        new_messages.append(copy.deepcopy(m))
-                    elif isinstance(m, dict):
-                        role = m.get("role", "user")
-                        content = m.get("content", "")
-                        if role == "system":
-                            new_messages.append(SystemMessage(content=content))
-                        else:
-                            new_messages.append(HumanMessage(content=content))
-                    else:
-                        new_messages.append(HumanMessage(content=str(m)))
-            else:
-                new_messages = [HumanMessage(content=str(messages))]
-
-            instructions = parser.get_format_instructions()
-
-            # Find the last human message to append instructions
-            for i in range(len(new_messages) - 1, -1, -1):
-                if isinstance(new_messages[i], HumanMessage):
-                    new_messages[i].content = (
-                        str(new_messages[i].content)
-                        + "\n\nCRITICAL: You MUST strictly output ONLY valid JSON following the schema below. DO NOT output markdown tables or text.\n"
-                        + instructions
-                    )
-                    return new_messages
-
-            # Fallback: append as system message if no human message exists
-            new_messages.append(
-                SystemMessage(
-                    content="CRITICAL: You MUST strictly output ONLY valid JSON following the schema below. DO NOT output markdown tables or text.\n"
-                    + instructions
-                )
+            return build_messages(messages, instructions)
+
+        async def _ainject_instructions(messages: Any) -> List[BaseMessage]:
+            return build_messages(messages, instructions)
+
+        def _cached(hit: Optional[list]) -> Optional[BaseModel]:
+            if not hit:
+                return None
+            try:
+                return parse_structured(hit[0].text, schema)
+            except OutputParserException:
+                # written before replies were validated; fetch a fresh one
+                return None
+
+        def _generate(messages: List[BaseMessage]) -> BaseModel:
+            cache = self._structured_cache()
+            if cache is None:
+                return parse_structured(str(self.invoke(messages).content), schema)
+            prompt, llm_string = self._cache_key(messages)
+            result = _cached(cache.lookup(prompt, llm_string))
+            if result is not None:
+                return result
+            text = str(self._uncached().invoke(messages).content)
+            result = parse_structured(text, schema)
+            cache.update(prompt, llm_string, [ChatGeneration(message=AIMessage(content=text))])
+            return result
+
+        async def _agenerate(messages: List[BaseMessage]) -> BaseModel:
+            cache = self._structured_cache()
+            if cache is None:
+                return parse_structured(str((await self.ainvoke(messages)).content), schema)
+            prompt, llm_string = self._cache_key(messages)
+            result = _cached(await cache.alookup(prompt, llm_string))
+            if result is not None:
+                return result
+            text = str((await self._uncached().ainvoke(messages)).content)
+            result = parse_structured(text, schema)
+            await cache.aupdate(
+                prompt, llm_string, [ChatGeneration(message=AIMessage(content=text))]
             )
-            return new_messages
+            return result
 
-        return RunnableLambda(_inject_instructions) | self | parser
+        # async twins keep `ainvoke` from hopping to a thread pool for the cheap step
+        return RunnableLambda(_inject_instructions, afunc=_ainject_instructions) | RunnableLambda(
+            _generate, afunc=_agenerate
+        )
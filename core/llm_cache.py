@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Persistent, content-addressed response cache for the LangChain chat models.
+
+Entries are keyed by a SHA-256 of the model configuration string LangChain
+passes to the cache (model name, temperature, ...) and of the exact serialized
+message list, so any change to a prompt, schema instruction or model setting
+is a cache miss. Only the generated message text is stored, which is all the
+UIUC chat wrapper produces.
+
+Structured-output calls (``with_structured_output``) write to the cache only
+after the reply parses into the schema, so a malformed reply is retried on the
+next identical prompt instead of being replayed.
+
+The cache is a single SQLite file in WAL mode, so it is shared by the API
+server, ``pipeline_test.py`` and ``data_extract_llm.py`` runs on the same
+machine. It is size-bounded with least-recently-used eviction and supports an
+optional time-to-live.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import dotenv
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+dotenv.load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"
+)
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm_cache.sqlite3")
+)
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "0"))
+
+
+class SQLiteLLMCache(BaseCache):
+    """LangChain ``BaseCache`` backed by a size-bounded SQLite LRU table."""
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: Optional[float] = LLM_CACHE_TTL_SECONDS or None,
+    ) -> None:
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path (str): SQLite file location; parent directories are created.
+            max_entries (int): Entries kept before least-recently-used eviction.
+            ttl_seconds (Optional[float]): Entry lifetime; None keeps entries until evicted.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)"
+            )
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        llm_hash = hashlib.sha256(llm_string.encode("utf-8")).hexdigest()
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{llm_hash}:{prompt_hash}"
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return [
+            ChatGeneration(message=AIMessage(content=text)) for text in json.loads(value)
+        ]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        value = json.dumps([generation.text for generation in return_val])
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache")
+
+
+def build_llm_cache() -> Optional[SQLiteLLMCache]:
+    """Return the configured response cache, or None when disabled."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    return SQLiteLLMCache()
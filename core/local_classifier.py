@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""Local fast-tier activity classifier.
+
+A similarity-weighted k-nearest-neighbour model over hashed TF-IDF features
+(word unigrams, word bigrams and character trigrams), trained offline from
+human-labelled activities: ``all_annotated_data.csv`` or rows of the D1
+``labels`` table. It predicts one HCD space and subspace per activity with a
+confidence in [0, 1], and needs nothing beyond NumPy.
+
+`Processing` uses it as the first tier of a cascade: when
+``LOCAL_CLASSIFIER_THRESHOLD`` is set, activities the local model is at least
+that confident about are answered locally and only the rest go to the LLM.
+Train and save a model with::
+
+    python core/local_classifier.py all_annotated_data.csv .cache/local_classifier.npz
+"""
+
+from __future__ import annotations
+
+import csv
+import math
+import os
+import re
+import sys
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import dotenv
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.utils import SPACE_NORMALIZER, SUBSPACE_NORMALIZER
+
+dotenv.load_dotenv()
+
+DEFAULT_TRAINING_DATA = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "all_annotated_data.csv"
+)
+# a labelled CSV to train from at startup, or a model saved with `LocalClassifier.save`
+LOCAL_CLASSIFIER_PATH = os.getenv("LOCAL_CLASSIFIER_PATH", DEFAULT_TRAINING_DATA)
+# unset disables the cascade: every activity goes to the LLM
+LOCAL_CLASSIFIER_THRESHOLD: Optional[float] = (
+    float(os.environ["LOCAL_CLASSIFIER_THRESHOLD"])
+    if os.getenv("LOCAL_CLASSIFIER_THRESHOLD")
+    else None
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _features(text: str) -> Counter:
+    tokens = _TOKEN.findall((text or "").lower())
+    features = Counter(f"w:{token}" for token in tokens)
+    features.update(f"b:{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    for token in tokens:
+        padded = f" {token} "
+        features.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+def _hash(feature: str, n_features: int) -> int:
+    # crc32 rather than hash() so saved models stay valid across processes
+    return zlib.crc32(feature.encode("utf-8")) % n_features
+
+
+@dataclass
+class LocalPrediction:
+    """One local classification: the most likely (space, subspace) pair and its vote share."""
+
+    space: str
+    subspace: str
+    confidence: float
+
+
+class LocalClassifier:
+    """k-nearest-neighbour HCD classifier over hashed TF-IDF vectors."""
+
+    def __init__(self, k: int = 5, n_features: int = 2**16, prior: float = 0.5) -> None:
+        """
+        Initialize an untrained classifier.
+
+        Args:
+            k (int): Neighbours that vote on each prediction.
+            n_features (int): Hashed feature dimensions.
+            prior (float): Pseudo-weight added to the vote total, so predictions backed
+                only by weakly similar neighbours get a low confidence.
+        """
+        self.k = k
+        self.n_features = n_features
+        self.prior = prior
+        self._idf = np.ones(n_features, dtype=np.float32)
+        # row-normalized training vectors in CSR form
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._data = np.zeros(0, dtype=np.float32)
+        self._labels: list[tuple[str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def _hashed(self, text: str) -> dict[int, float]:
+        counts: dict[int, float] = {}
+        for feature, count in _features(text).items():
+            index = _hash(feature, self.n_features)
+            counts[index] = counts.get(index, 0.0) + count
+        return counts
+
+    def _vectorize(self, counts: dict[int, float]) -> tuple[np.ndarray, np.ndarray]:
+        indices = np.fromiter(counts, dtype=np.int32, count=len(counts))
+        values = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        values *= self._idf[indices]
+        norm = float(np.linalg.norm(values))
+        return indices, values / norm if norm else values
+
+    def fit(self, examples: Iterable[tuple[str, str, str]]) -> "LocalClassifier":
+        """
+        Train on labelled activities, replacing any previous training.
+
+        Labels are normalized like model outputs; examples whose labels do not
+        normalize to a known space and subspace are skipped.
+
+        Args:
+            examples (Iterable[tuple[str, str, str]]): (activity, space, subspace) triples.
+
+        Returns:
+            LocalClassifier: self, for chaining.
+        """
+        hashed: list[dict[int, float]] = []
+        labels: list[tuple[str, str]] = []
+        for activity, space, subspace in examples:
+            space = SPACE_NORMALIZER.normalize(space)
+            subspace = SUBSPACE_NORMALIZER.normalize(subspace)
+            counts = self._hashed(activity)
+            if space and subspace and counts:
+                hashed.append(counts)
+                labels.append((space, subspace))
+
+        df = np.zeros(self.n_features, dtype=np.float32)
+        for counts in hashed:
+            df[list(counts)] += 1
+        self._idf = (np.log((1 + len(hashed)) / (1 + df)) + 1).astype(np.float32)
+
+        indptr, indices, data = [0], [], []
+        for counts in hashed:
+            row_indices, row_values = self._vectorize(counts)
+            indices.append(row_indices)
+            data.append(row_values)
+            indptr.append(indptr[-1] + len(row_indices))
+        self._indptr = np.asarray(indptr, dtype=np.int64)
+        self._indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32)
+        self._data = np.concatenate(data) if data else np.zeros(0, dtype=np.float32)
+        self._labels = labels
+        return self
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict], **kwargs) -> "LocalClassifier":
+        """Train on rows shaped like the D1 ``labels`` table (Activity, HCD_Space, HCD_Subspace)."""
+        return cls(**kwargs).fit(
+            (row.get("Activity", ""), row.get("HCD_Space", ""), row.get("HCD_Subspace", ""))
+            for row in rows
+        )
+
+    @classmethod
+    def from_csv(cls, path: str, **kwargs) -> "LocalClassifier":
+        """Train on a CSV export of the ``labels`` table, e.g. ``all_annotated_data.csv``."""
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls.from_rows(list(csv.DictReader(f)), **kwargs)
+
+    def save(self, path: str) -> None:
+        """Write the trained model to a ``.npz`` file."""
+        np.savez_compressed(
+            path,
+            params=np.array([self.k, self.n_features, self.prior], dtype=np.float64),
+            idf=self._idf,
+            indptr=self._indptr,
+            indices=self._indices,
+            data=self._data,
+            labels=np.array(self._labels, dtype=str).reshape(-1, 2),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LocalClassifier":
+        """Read a model written by :py:meth:`save`."""
+        with np.load(path) as saved:
+            k, n_features, prior = saved["params"]
+            model = cls(k=int(k), n_features=int(n_features), prior=float(prior))
+            model._idf = saved["idf"]
+            model._indptr = saved["indptr"]
+            model._indices = saved["indices"]
+            model._data = saved["data"]
+            model._labels = [(str(space), str(sub)) for space, sub in saved["labels"]]
+        return model
+
+    def similarities(self, activity: str) -> np.ndarray:
+        """Cosine similarity of `activity` to every training example."""
+        if not self._labels:
+            return np.zeros(0, dtype=np.float32)
+        indices, values = self._vectorize(self._hashed(activity))
+        query = np.zeros(self.n_features, dtype=np.float32)
+        query[indices] = values
+        return np.add.reduceat(self._data * query[self._indices], self._indptr[:-1])
+
+    def predict(self, activity: str) -> Optional[LocalPrediction]:
+        """
+        Predict the space and subspace of one activity.
+
+        The k most similar training examples vote for their (space, subspace)
+        pair with their similarity; the confidence is the winning pair's share
+        of the votes plus `prior`.
+
+        Args:
+            activity (str): Activity description.
+
+        Returns:
+            Optional[LocalPrediction]: The prediction, or None if the model is untrained
+                or the activity shares no features with the training data.
+        """
+        sims = self.similarities(activity)
+        if not len(sims):
+            return None
+        k = min(self.k, len(sims))
+        nearest = np.argpartition(-sims, k - 1)[:k]
+        votes: dict[tuple[str, str], float] = {}
+        for row in nearest:
+            if sims[row] > 0:
+                label = self._labels[row]
+                votes[label] = votes.get(label, 0.0) + float(sims[row])
+        if not votes:
+            return None
+        (space, subspace), weight = max(votes.items(), key=lambda item: item[1])
+        confidence = weight / (sum(votes.values()) + self.prior)
+        return LocalPrediction(space=space, subspace=subspace, confidence=confidence)
+
+
+@lru_cache(maxsize=1)
+def default_local_classifier() -> Optional[LocalClassifier]:
+    """Load or train the classifier named by ``LOCAL_CLASSIFIER_PATH`` once per process."""
+    path = LOCAL_CLASSIFIER_PATH
+    try:
+        if path.endswith(".npz"):
+            return LocalClassifier.load(path)
+        return LocalClassifier.from_csv(path)
+    except (OSError, ValueError, KeyError) as exc:
+        print(f"Warning: local classifier unavailable ({path}): {exc}")
+        return None
+
+
+def cross_validate(
+    rows: list[dict], folds: int = 5, **kwargs
+) -> list[tuple[dict, Optional[LocalPrediction]]]:
+    """
+    Predict every row with a model trained on the other folds.
+
+    Args:
+        rows (list[dict]): Labelled rows shaped like the D1 ``labels`` table.
+        folds (int): Number of folds; rows are assigned round-robin.
+        **kwargs: Passed to :py:class:`LocalClassifier`.
+
+    Returns:
+        list[tuple[dict, Optional[LocalPrediction]]]: Each row with its held-out prediction, in order.
+    """
+    predictions: list[Optional[LocalPrediction]] = [None] * len(rows)
+    folds = max(2, min(folds, len(rows)))
+    for fold in range(folds):
+        model = LocalClassifier.from_rows(
+            (row for i, row in enumerate(rows) if i % folds != fold), **kwargs
+        )
+        for i in range(fold, len(rows), folds):
+            predictions[i] = model.predict(rows[i].get("Activity", ""))
+    return list(zip(rows, predictions))
+
+
+def coverage_report(
+    results: list[tuple[dict, Optional[LocalPrediction]]],
+    thresholds: Iterable[float] = (0.5, 0.6, 0.7, 0.8, 0.9),
+) -> list[dict]:
+    """
+    Coverage and accuracy of local predictions at each confidence threshold.
+
+    Args:
+        results (list[tuple[dict, Optional[LocalPrediction]]]): Rows and their predictions,
+            e.g. from :py:func:`cross_validate`.
+        thresholds (Iterable[float]): Confidence thresholds to report.
+
+    Returns:
+        list[dict]: Per threshold, the fraction of rows answered locally ("coverage")
+            and the space and subspace accuracy on those rows.
+    """
+    graded = []
+    for row, prediction in results:
+        space = SPACE_NORMALIZER.normalize_list(row.get("HCD_Space", "").split(","))
+        subspace = SUBSPACE_NORMALIZER.normalize_list(row.get("HCD_Subspace", "").split(","))
+        if not space or not subspace:
+            continue
+        confidence = prediction.confidence if prediction else 0.0
+        graded.append(
+            (
+                confidence,
+                bool(prediction and prediction.space in space),
+                bool(prediction and prediction.subspace in subspace),
+            )
+        )
+
+    report = []
+    for threshold in thresholds:
+        covered = [g for g in graded if g[0] >= threshold]
+        report.append(
+            {
+                "threshold": threshold,
+                "rows": len(graded),
+                "covered": len(covered),
+                "coverage": len(covered) / len(graded) if graded else 0.0,
+                "space_accuracy": (
+                    sum(g[1] for g in covered) / len(covered) if covered else math.nan
+                ),
+                "subspace_accuracy": (
+                    sum(g[2] for g in covered) / len(covered) if covered else math.nan
+                ),
+            }
+        )
+    return report
+
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TRAINING_DATA
+    with open(source, newline="", encoding="utf-8") as f:
+        labelled = list(csv.DictReader(f))
+
+    print(f"5-fold cross-validation on {len(labelled)} rows from {source}:")
+    for line in coverage_report(cross_validate(labelled)):
+        print(
+            f"  threshold {line['threshold']:.2f}: coverage {line['coverage']:.1%}, "
+            f"space accuracy {line['space_accuracy']:.1%}, "
+            f"subspace accuracy {line['subspace_accuracy']:.1%}"
+        )
+
+    if len(sys.argv) > 2:
+        LocalClassifier.from_rows(labelled).save(sys.argv[2])
+        print(f"Saved model trained on all rows to {sys.argv[2]}")
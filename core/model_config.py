@@ -1,8 +1,17 @@
 from langchain.chat_models import init_chat_model
 from core.langchain_uiucchat_wrapper import IllinoisChatLLM
+from core.cassette import LLM_CASSETTE
+from core.llm_cache import build_llm_cache
 
+LLM_CACHE = build_llm_cache()
+
+# a recording or replaying cassette must see every call, so it bypasses the response cache
+# (core.activity_memo disables the memo for the same reason)
 UIUC_CHAT_MODEL = IllinoisChatLLM(
-    course_name="matse", model="Qwen/Qwen2.5-VL-72B-Instruct"
+    course_name="matse",
+    model="Qwen/Qwen2.5-VL-72B-Instruct",
+    cache=LLM_CACHE if LLM_CASSETTE is None else None,
+    cassette=LLM_CASSETTE,
 )
 
 # DEFAULT_MODEL = init_chat_model("openai:gpt-4.1")
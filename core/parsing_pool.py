@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Process pool for CPU-bound PDF parsing shared across API requests.
+
+PyMuPDF's table finder and markdown conversion hold the GIL for long
+stretches, so running them on threads serializes concurrent uploads and
+stalls the event loop. `ParsingPool` runs them in a bounded set of worker
+processes instead, splits large documents into page ranges parsed in
+parallel, and applies backpressure when too many documents are waiting.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import pdf_parsing
+from core.pdf_parsing import PDFParseError, PdfSource
+from core.table_extraction import TableExtraction
+
+DEFAULT_WORKERS = int(
+    os.getenv("PARSE_POOL_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+# documents allowed to wait for or run on the pool before new ones are turned away
+DEFAULT_MAX_PENDING = int(os.getenv("PARSE_POOL_MAX_PENDING", str(4 * DEFAULT_WORKERS)))
+DEFAULT_ACQUIRE_TIMEOUT = float(os.getenv("PARSE_POOL_ACQUIRE_TIMEOUT", "30"))
+# documents longer than this are converted in page ranges on several workers
+DEFAULT_PAGES_PER_TASK = int(os.getenv("PARSE_POOL_PAGES_PER_TASK", "8"))
+
+
+class ParsingPoolBusy(RuntimeError):
+    """Raised when the pool stays saturated for longer than the acquire timeout."""
+
+
+def _warm_worker() -> int:
+    # importing PyMuPDF and the parsing helpers is the slow part of a cold worker
+    return os.getpid()
+
+
+class ParsingPool:
+    """A bounded, pre-warmed process pool for PDF table detection and markdown conversion."""
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        acquire_timeout: float = DEFAULT_ACQUIRE_TIMEOUT,
+        pages_per_task: int = DEFAULT_PAGES_PER_TASK,
+    ) -> None:
+        """
+        Initialize the ParsingPool. Worker processes are not started until `start`.
+
+        Args:
+            workers (int): Number of worker processes.
+            max_pending (int): Documents that may be queued or parsing at once.
+            acquire_timeout (float): Seconds to wait for a slot before raising `ParsingPoolBusy`.
+            pages_per_task (int): Page range size when splitting a long document across workers.
+        """
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.acquire_timeout = acquire_timeout
+        self.pages_per_task = max(1, pages_per_task)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the API process already runs HTTP client and SQLite threads
+        return ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    async def start(self) -> None:
+        """Start the worker processes and wait until each one has imported PyMuPDF."""
+        if self._executor is None:
+            self._executor = self._new_executor()
+        self._slots = asyncio.Semaphore(self.max_pending)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(self._executor, _warm_worker)
+                for _ in range(self.workers)
+            )
+        )
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, cancelling parses that have not started."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    @property
+    def pending(self) -> int:
+        """Number of documents currently holding a pool slot."""
+        return self._in_flight
+
+    async def _acquire(self) -> None:
+        if self._executor is None or self._slots is None:
+            raise RuntimeError("ParsingPool has not been started.")
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError as exc:
+            raise ParsingPoolBusy(
+                f"PDF parsing is saturated ({self.max_pending} documents pending); retry later."
+            ) from exc
+        self._in_flight += 1
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._slots.release()
+
+    async def _submit(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool as exc:
+            # a worker died mid-parse (e.g. MuPDF crashed on a malformed file); replace the pool
+            if self._executor is executor:
+                self._executor = self._new_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise PDFParseError("Failed to parse PDF: a parsing worker crashed.") from exc
+
+    @staticmethod
+    def prepare_source(source: PdfSource) -> bytes | str:
+        """Reduce a source to a path or bytes that can be sent to workers more than once."""
+        if isinstance(source, (str, os.PathLike)):
+            return os.fspath(source)
+        if isinstance(source, bytes):
+            return source
+        return source.read() if hasattr(source, "read") else bytes(source)
+
+    async def adetect_table(
+        self, source: PdfSource
+    ) -> tuple[Optional[TableExtraction], int]:
+        """
+        Run deterministic table detection on a worker.
+
+        Args:
+            source (PdfSource): file path, PDF bytes, or binary buffer of the document
+
+        Returns:
+            tuple[Optional[TableExtraction], int]: The detection result and the page count.
+        """
+        await self._acquire()
+        try:
+            return await self._submit(pdf_parsing.detect_table, self.prepare_source(source))
+        finally:
+            self._release()
+
+    async def aparse_markdown(self, source: PdfSource, page_count: int) -> str:
+        """
+        Convert a document to markdown, splitting long documents across workers.
+
+        Args:
+            source (PdfSource): file path, PDF bytes, or binary buffer of the document
+            page_count (int): Number of pages, as returned by `adetect_table`.
+
+        Returns:
+            str: The markdown of each page, separated by blank lines
+        """
+        data = self.prepare_source(source)
+        ranges = [
+            (start, start + self.pages_per_task)
+            for start in range(0, max(page_count, 1), self.pages_per_task)
+        ]
+        await self._acquire()
+        try:
+            parts = await asyncio.gather(
+                *(
+                    self._submit(pdf_parsing.parse_markdown, data, start, stop)
+                    for start, stop in ranges
+                )
+            )
+        finally:
+            self._release()
+        return "\n\n".join(parts)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""PDF opening and text conversion shared by PreProcessor and the parsing pool.
+
+Kept free of model and prompt imports so parsing worker processes start fast.
+"""
+
+import os
+import sys
+from typing import BinaryIO, Optional, Union
+
+import fitz
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.table_extraction import TableExtraction, extract_student_table
+
+# A PDF given as a file path, its raw bytes, or a readable binary buffer.
+PdfSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+# MuPDF reports unreadable content with its own exception hierarchy
+_PDF_OPEN_ERRORS = (AssertionError, RuntimeError, ValueError, fitz.mupdf.FzErrorBase)
+
+
+class PDFParseError(ValueError):
+    """The PDF itself cannot be opened or read; retrying the same content will not help."""
+
+
+def open_pdf(source: PdfSource) -> fitz.Document:
+    """Open a PDF from a path, raw bytes, or a binary buffer without touching disk for the latter two.
+
+    Args:
+        source (PdfSource): file path, PDF bytes, or a readable binary buffer
+
+    Returns:
+        fitz.Document: The opened document
+
+    Raises:
+        FileNotFoundError: If a path is given and does not exist
+        PDFParseError: If the content cannot be opened as a PDF
+    """
+    if isinstance(source, (str, os.PathLike)):
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"File not found: {source}")
+        try:
+            return fitz.open(source)
+        except _PDF_OPEN_ERRORS as exc:
+            raise PDFParseError(f"Failed to open PDF: {source}") from exc
+
+    data = source.read() if hasattr(source, "read") else bytes(source)
+    if not data:
+        raise PDFParseError("PDF content is empty.")
+    try:
+        return fitz.open(stream=data, filetype="pdf")
+    except _PDF_OPEN_ERRORS as exc:
+        raise PDFParseError("Failed to open PDF from memory") from exc
+
+
+def document_to_markdown(
+    document: fitz.Document, start: int = 0, stop: Optional[int] = None
+) -> str:
+    """Convert pages ``[start, stop)`` of a document to markdown text
+
+    Args:
+        document (fitz.Document): the opened document
+        start (int): first page index to convert
+        stop (Optional[int]): page index to stop before; None converts to the end
+
+    Returns:
+        str: The markdown of each page, separated by blank lines
+    """
+    stop = len(document) if stop is None else min(stop, len(document))
+    pages_markdown = []
+    try:
+        for page_index in range(start, stop):
+            page = document[page_index]
+            try:
+                markdown_text = page.get_text("markdown").strip()
+            except (AssertionError, RuntimeError, ValueError):
+                markdown_text = ""
+
+            if not markdown_text:
+                markdown_text = page.get_text().strip()
+
+            pages_markdown.append(markdown_text)
+    except (AssertionError, RuntimeError, ValueError) as exc:
+        raise PDFParseError(f"Failed to parse PDF: {document.name or '<memory>'}") from exc
+
+    return "\n\n".join(pages_markdown)
+
+
+def detect_table(source: PdfSource) -> tuple[Optional[TableExtraction], int]:
+    """Run deterministic table detection on a PDF
+
+    Args:
+        source (PdfSource): file path, PDF bytes, or binary buffer of the document
+
+    Returns:
+        tuple[Optional[TableExtraction], int]: The detection result (None if no table
+            header was found or detection failed) and the document's page count
+    """
+    with open_pdf(source) as document:
+        try:
+            return extract_student_table(document), len(document)
+        except (AssertionError, RuntimeError, ValueError):
+            return None, len(document)
+
+
+def parse_markdown(source: PdfSource, start: int = 0, stop: Optional[int] = None) -> str:
+    """Open a PDF and convert pages ``[start, stop)`` to markdown text"""
+    with open_pdf(source) as document:
+        return document_to_markdown(document, start, stop)
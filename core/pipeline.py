@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Stage-pipelined execution of classification and final evaluation.
+
+Instead of classifying every row before evaluating any of them, each row (or
+each classification batch) runs as its own chain: as soon as its
+`LLM_HCD_Label` arrives, its `FinalProcessing` call starts. Each stage keeps
+its own concurrency limit, so a report finishes in roughly the time of its
+slowest row chain rather than slowest classification plus slowest evaluation.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+from typing import AsyncIterator, Literal, Optional, Union
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.concurrency import limiter_for
+from core.data_table import (
+    List_Output_Label,
+    List_Student_HCD_Label,
+    LLM_HCD_Label,
+    Output_Label,
+)
+from core.fused_processing import FusedProcessing
+from core.postprocessing import FinalProcessing
+from core.processing import Processing
+
+PipelineMode = Literal["standard", "fused"]
+RowEvent = tuple[str, int, Union[LLM_HCD_Label, Output_Label]]
+
+
+class ClassificationPipeline:
+    """Runs per-row classify → evaluate chains with per-stage concurrency limits."""
+
+    def __init__(
+        self,
+        processor: Processing,
+        final_processor: FinalProcessing,
+        fused_processor: Optional[FusedProcessing] = None,
+    ) -> None:
+        """
+        Initialize the pipeline with the stage helpers it drives.
+
+        Args:
+            processor (Processing): Classification stage.
+            final_processor (FinalProcessing): Final evaluation stage.
+            fused_processor (Optional[FusedProcessing]): Single-call stage used when mode is "fused".
+        """
+        self.processor = processor
+        self.final_processor = final_processor
+        self.fused_processor = fused_processor or FusedProcessing()
+
+    async def aiter_rows(
+        self,
+        table_data: List_Student_HCD_Label,
+        mode: PipelineMode = "standard",
+        classify_concurrency: int | None = None,
+        eval_concurrency: int | None = None,
+    ) -> AsyncIterator[RowEvent]:
+        """
+        Yield ``("llm_label" | "final_label", row_index, label)`` events as rows finish.
+
+        Args:
+            table_data (List_Student_HCD_Label): Student rows to classify and evaluate.
+            mode (PipelineMode): "standard" for two calls per row, "fused" for one.
+            classify_concurrency (int | None): Maximum classification (or fused) calls in
+                flight; None leaves concurrency to the process-wide LLM governor.
+            eval_concurrency (int | None): Maximum final evaluation calls in flight; None
+                leaves concurrency to the process-wide LLM governor.
+        """
+        rows = table_data.tables
+        classify_slot = limiter_for(classify_concurrency)
+        eval_slot = limiter_for(eval_concurrency)
+        events: asyncio.Queue[RowEvent] = asyncio.Queue()
+
+        async def fused_chain(idx: int) -> None:
+            async with classify_slot():
+                llm_label, final_label = await self.fused_processor.aevaluate_entry_or_skip(
+                    rows[idx]
+                )
+            events.put_nowait(("llm_label", idx, llm_label))
+            events.put_nowait(("final_label", idx, final_label))
+
+        async def evaluate(idx: int, llm_label: LLM_HCD_Label) -> None:
+            async with eval_slot():
+                # unlabelled rows get a neutral verdict without a call; failed calls are absorbed too
+                final_label = await self.final_processor.aevaluate_entry_or_skip(
+                    rows[idx], llm_label
+                )
+            events.put_nowait(("final_label", idx, final_label))
+
+        async def standard_chain(chunk: list[int]) -> None:
+            async with classify_slot():
+                # aclassify_table leaves a row that keeps failing unlabelled instead of raising
+                labels = await self.processor.aclassify_table(
+                    List_Student_HCD_Label(tables=[rows[i] for i in chunk]),
+                    max_concurrency=1,
+                    batch_size=len(chunk),
+                )
+            for idx, llm_label in zip(chunk, labels):
+                events.put_nowait(("llm_label", idx, llm_label))
+            await asyncio.gather(
+                *(evaluate(idx, llm_label) for idx, llm_label in zip(chunk, labels))
+            )
+
+        if mode == "fused":
+            chains = [fused_chain(idx) for idx in range(len(rows))]
+        else:
+            batch_size = max(1, self.processor.batch_size)
+            chains = [
+                standard_chain(list(range(start, min(start + batch_size, len(rows)))))
+                for start in range(0, len(rows), batch_size)
+            ]
+
+        runner = asyncio.ensure_future(asyncio.gather(*chains))
+        getter: Optional[asyncio.Future] = None
+        expected = 2 * len(rows)
+        try:
+            while expected:
+                getter = asyncio.ensure_future(events.get())
+                await asyncio.wait({getter, runner}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    expected -= 1
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                if runner.exception() is not None:
+                    raise runner.exception()
+                # every chain finished; drain whatever is still queued
+                while not events.empty():
+                    expected -= 1
+                    yield events.get_nowait()
+                break
+        finally:
+            if getter is not None:
+                getter.cancel()
+            if not runner.done():
+                # the consumer stopped early; cancel the chains and mark the outcome seen
+                runner.add_done_callback(lambda f: f.cancelled() or f.exception())
+                runner.cancel()
+
+    async def arun(
+        self,
+        table_data: List_Student_HCD_Label,
+        mode: PipelineMode = "standard",
+        classify_concurrency: int | None = None,
+        eval_concurrency: int | None = None,
+    ) -> tuple[list[LLM_HCD_Label], List_Output_Label]:
+        """
+        Run every row chain to completion and return results in table order.
+
+        Returns:
+            tuple[list[LLM_HCD_Label], List_Output_Label]: Model labels and final verdicts.
+        """
+        llm_labels: dict[int, LLM_HCD_Label] = {}
+        final_labels: dict[int, Output_Label] = {}
+        async for event, idx, label in self.aiter_rows(
+            table_data, mode, classify_concurrency, eval_concurrency
+        ):
+            if event == "llm_label":
+                llm_labels[idx] = label
+            else:
+                final_labels[idx] = label
+        order = range(len(table_data.tables))
+        return (
+            [llm_labels[idx] for idx in order],
+            List_Output_Label(labels=[final_labels[idx] for idx in order]),
+        )
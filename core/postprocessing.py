@@ -7,16 +7,23 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from langchain.chat_models import init_chat_model
 
+from core.concurrency import limiter_for
 from core.data_table import (
+    Compact_Output_Label,
     Output_Label,
     LLM_HCD_Label,
     List_Student_HCD_Label,
     List_Output_Label,
+    Student_HCD_Label,
 )
 from core.model_config import FINAL_EVAL_MODEL
 from core.prompt import FINAL_EVAL_SYS_PROMPT
+from core.transport import recover_row, run_with_client
 from core.utils import KNOWN_SPACES, KNOWN_SUBSPACES, normalize_list
 
+CLASSIFICATION_FAILED_REASON = "Not evaluated: the activity could not be classified."
+EVALUATION_FAILED_REASON = "Not evaluated: the evaluation call failed."
+
 
 class FinalProcessing:
     """Post-processing helpers for final activity evaluation."""
@@ -25,11 +32,47 @@ class FinalProcessing:
         """
         Initialize the FinalProcessing helper.
 
-        Sets up the chat model using the final evaluation configuration and binds it to a structured output schema
-        (`Output_Label`) for consistent final activity evaluation results.
+        Sets up the chat model using the final evaluation configuration and binds it to a compact structured
+        output schema (`Compact_Output_Label`) holding only the verdicts; results are returned as `Output_Label`
+        rebuilt around the student entry.
         """
         self._model = FINAL_EVAL_MODEL
-        self.bound_model = self._model.with_structured_output(Output_Label)
+        self.bound_model = self._model.with_structured_output(Compact_Output_Label)
+
+    @staticmethod
+    def output_label(
+        student_entry: Student_HCD_Label, result: list[int], reason: str
+    ) -> Output_Label:
+        """Build the `Output_Label` for a student entry from the model's verdicts.
+
+        Args:
+            student_entry (Student_HCD_Label): The row that was evaluated.
+            result (list[int]): The model's verdicts, aligned to the student's subspaces.
+            reason (str): The model's justification.
+
+        Returns:
+            Output_Label: One verdict per student subspace; missing verdicts mean "not enough evidence".
+        """
+        n_subspaces = len(student_entry.HCD_Subspaces)
+        verdicts = [max(-1, min(1, v)) for v in result[:n_subspaces]]
+        verdicts += [0] * (n_subspaces - len(verdicts))
+        return Output_Label(
+            activity=student_entry.activity,
+            student_labeled_spaces=student_entry.HCD_Spaces,
+            student_labeled_subspaces=student_entry.HCD_Subspaces,
+            result=verdicts,
+            Reason=reason,
+        )
+
+    @classmethod
+    def not_evaluated(cls, student_entry: Student_HCD_Label, reason: str) -> Output_Label:
+        """A neutral verdict (0, not enough evidence, for every subspace) for a row that was not judged."""
+        return cls.output_label(student_entry, [], reason)
+
+    @staticmethod
+    def is_unlabelled(llm_entry: LLM_HCD_Label) -> bool:
+        """Whether classification produced nothing to judge the student's labels against."""
+        return not llm_entry.HCD_Spaces and not llm_entry.HCD_Subspaces
 
     @staticmethod
     def _build_eval_prompt(student_entry, llm_entry) -> list[dict[str, str]]:
@@ -57,27 +100,52 @@ class FinalProcessing:
         try:
             asyncio.get_running_loop()
         except RuntimeError:
-            return asyncio.run(self.afinal_eval(student_hcd_label, llm_hcd_label))
-
-        response = [
-            self.bound_model.invoke(self._build_eval_prompt(student_entry, llm_entry))
-            for student_entry, llm_entry in zip(student_hcd_label.tables, llm_hcd_label)
-        ]
+            return run_with_client(self.afinal_eval(student_hcd_label, llm_hcd_label))
+
+        response = []
+        for student_entry, llm_entry in zip(student_hcd_label.tables, llm_hcd_label):
+            if self.is_unlabelled(llm_entry):
+                response.append(self.not_evaluated(student_entry, CLASSIFICATION_FAILED_REASON))
+                continue
+            resp = self.bound_model.invoke(self._build_eval_prompt(student_entry, llm_entry))
+            response.append(self.output_label(student_entry, resp.result, resp.Reason))
         return List_Output_Label(labels=response)
 
+    async def aevaluate_entry(self, student_entry, llm_entry) -> Output_Label:
+        """Evaluate a single student entry against its LLM classification.
+
+        A row whose classification came back empty is not sent to the model and gets a neutral verdict.
+        """
+        if self.is_unlabelled(llm_entry):
+            return self.not_evaluated(student_entry, CLASSIFICATION_FAILED_REASON)
+        resp = await self.bound_model.ainvoke(
+            self._build_eval_prompt(student_entry, llm_entry)
+        )
+        return self.output_label(student_entry, resp.result, resp.Reason)
+
+    async def aevaluate_entry_or_skip(self, student_entry, llm_entry) -> Output_Label:
+        """Variant of :py:meth:`aevaluate_entry` that never fails the report.
+
+        A call that still fails after the transport's retries, or whose reply does not parse,
+        yields a neutral verdict.
+        """
+        return await recover_row(
+            self.aevaluate_entry(student_entry, llm_entry),
+            lambda: self.not_evaluated(student_entry, EVALUATION_FAILED_REASON),
+            "final evaluation failed, leaving activity unevaluated",
+        )
+
     async def afinal_eval(
         self,
         student_hcd_label: List_Student_HCD_Label,
         llm_hcd_label: list[LLM_HCD_Label],
-        max_concurrency: int = 4,
+        max_concurrency: int | None = None,
     ) -> List_Output_Label:
-        sem = asyncio.Semaphore(max_concurrency)
+        slot = limiter_for(max_concurrency)
 
         async def evaluate(student_entry, llm_entry):
-            async with sem:
-                return await self.bound_model.ainvoke(
-                    self._build_eval_prompt(student_entry, llm_entry)
-                )
+            async with slot():
+                return await self.aevaluate_entry_or_skip(student_entry, llm_entry)
 
         tasks = [
             evaluate(student_entry, llm_entry)
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 # PreProcessing module for document parsing and information extraction
 
+import asyncio
 import os
 import sys
+from typing import TYPE_CHECKING, Optional
 
 import fitz
 
@@ -11,49 +13,96 @@ from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
 
 from core.data_table import List_Student_HCD_Label
+from core.pdf_parsing import PdfSource, document_to_markdown, open_pdf
 from core.utils import KNOWN_SPACES, KNOWN_SUBSPACES, normalize_list
 from core.model_config import DEFAULT_MODEL
-from core.prompt import DATA_EXTRACTION_SYS_PROMPT
+from core.prompt import DATA_EXTRACTION_SYS_PROMPT, DATA_EXTRACTION_SYS_PROMPT_NEW
+from core.report_template import crop_activity_section, detect_template
+from core.table_extraction import (
+    MIN_TABLE_CONFIDENCE,
+    TableExtraction,
+    extract_student_table,
+)
 
-load_dotenv()
+if TYPE_CHECKING:
+    from core.parsing_pool import ParsingPool
 
+load_dotenv()
 
 class PreProcessor:
     """A Preprocessor that parses documents and extract information"""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        min_table_confidence: float = MIN_TABLE_CONFIDENCE,
+        parsing_pool: Optional["ParsingPool"] = None,
+    ) -> None:
+        """
+        Initialize the PreProcessor.
+
+        Args:
+            min_table_confidence (float): Minimum confidence for the deterministic table
+                extractor to be trusted; below it the LLM extracts the table instead.
+            parsing_pool (Optional[ParsingPool]): Process pool `ainvoke` parses PDFs on;
+                without one (or before it is started), parsing runs on a worker thread.
+        """
         model = DEFAULT_MODEL
         self.model_with_structure = model.with_structured_output(List_Student_HCD_Label)
+        self.min_table_confidence = min_table_confidence
+        self.parsing_pool = parsing_pool
 
-    def _parse(self, file_path: str) -> str:
-        """Parse a document and return its markdown text
+    def _detect_table(self, document: fitz.Document) -> List_Student_HCD_Label | None:
+        """Read the activity table straight from the PDF layout, if confidently found
 
         Args:
-            file_path (str): file path or URL to the document
+            document (fitz.Document): the opened document
 
         Returns:
-            str: The extracted markdown text from the document
+            List_Student_HCD_Label | None: The extracted table data, or None to fall back to the LLM
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
-
         try:
-            with fitz.open(file_path) as document:
-                pages_markdown = []
-                for page in document:
-                    try:
-                        markdown_text = page.get_text("markdown").strip()
-                    except (AssertionError, RuntimeError, ValueError):
-                        markdown_text = ""
-
-                    if not markdown_text:
-                        markdown_text = page.get_text().strip()
+            detected = extract_student_table(document)
+        except (AssertionError, RuntimeError, ValueError):
+            return None
+        return self._accept_detection(detected)
+
+    def _accept_detection(
+        self, detected: Optional[TableExtraction]
+    ) -> List_Student_HCD_Label | None:
+        if detected is None or detected.confidence < self.min_table_confidence:
+            return None
+        return detected.table
+
+    def _parse(self, source: PdfSource) -> str:
+        """Parse a document and return its markdown text
 
-                    pages_markdown.append(markdown_text)
-        except (AssertionError, RuntimeError, ValueError) as exc:
-            raise ValueError(f"Failed to parse PDF: {file_path}") from exc
+        Args:
+            source (PdfSource): file path, PDF bytes, or binary buffer of the document
 
-        return "\n\n".join(pages_markdown)
+        Returns:
+            str: The extracted markdown text from the document
+        """
+        with open_pdf(source) as document:
+            return self._parse_document(document)
+
+    @staticmethod
+    def _parse_document(document: fitz.Document) -> str:
+        return document_to_markdown(document)
+
+    @staticmethod
+    def _build_extraction_prompt(text: str) -> list[dict[str, str]]:
+        """Pick the prompt for the report's template and crop the text to its activity table"""
+        if detect_template(text) == "new":
+            system_prompt = DATA_EXTRACTION_SYS_PROMPT_NEW
+        else:
+            system_prompt = DATA_EXTRACTION_SYS_PROMPT
+        return [
+            {"role": "system", "content": system_prompt},
+            {
+                "role": "user",
+                "content": f"Extract the table data from the following progress report:\n\n{crop_activity_section(text)}",
+            },
+        ]
 
     def _extract_table_data(self, text: str) -> List_Student_HCD_Label:
         """Extract table data from the given text using LLM
@@ -63,28 +112,56 @@ class PreProcessor:
         Returns:
             List_Student_HCD_Label: The extracted table data
         """
-        response = self.model_with_structure.invoke(
-            [
-                {"role": "system", "content": DATA_EXTRACTION_SYS_PROMPT},
-                {
-                    "role": "user",
-                    "content": f"Extract the table data from the following progress report:\n\n{text}",
-                },
-            ]
-        )
+        response = self.model_with_structure.invoke(self._build_extraction_prompt(text))
         return response
 
-    def invoke(self, file_path: str) -> List_Student_HCD_Label:
+    def invoke(self, source: PdfSource) -> List_Student_HCD_Label:
         """Process a document and extract table data
 
         Args:
-            file_path (str): file path or URL to the document
+            source (PdfSource): file path, PDF bytes, or binary buffer of the document
 
         Returns:
             List_Student_HCD_Label: The extracted table data
         """
-        markdown_text = self._parse(file_path)
+        with open_pdf(source) as document:
+            detected = self._detect_table(document)
+            if detected is not None:
+                return detected
+            markdown_text = self._parse_document(document)
+
         table_data = self._extract_table_data(markdown_text)
+        return self._normalize_table(table_data)
+
+    async def ainvoke(self, source: PdfSource) -> List_Student_HCD_Label:
+        """Async variant of :py:meth:`invoke`.
+
+        PDF parsing runs on the parsing pool (or a worker thread without one) and the
+        LLM fallback uses the model's native async path, so the event loop never blocks.
+
+        Args:
+            source (PdfSource): file path, PDF bytes, or binary buffer of the document
+
+        Returns:
+            List_Student_HCD_Label: The extracted table data
+        """
+        if self.parsing_pool is None or not self.parsing_pool.started:
+            return await asyncio.to_thread(self.invoke, source)
+
+        source = self.parsing_pool.prepare_source(source)
+        detected, page_count = await self.parsing_pool.adetect_table(source)
+        table_data = self._accept_detection(detected)
+        if table_data is not None:
+            return table_data
+
+        markdown_text = await self.parsing_pool.aparse_markdown(source, page_count)
+        table_data = await self.model_with_structure.ainvoke(
+            self._build_extraction_prompt(markdown_text)
+        )
+        return self._normalize_table(table_data)
+
+    @staticmethod
+    def _normalize_table(table_data: List_Student_HCD_Label) -> List_Student_HCD_Label:
         # normalize spaces and subspaces to lowercase and fix typos
         for entry in table_data.tables:
             entry.HCD_Spaces = normalize_list(entry.HCD_Spaces, KNOWN_SPACES)
@@ -11,24 +11,77 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from langchain.chat_models import init_chat_model
 
-from core.data_table import List_Student_HCD_Label, LLM_HCD_Label
+from core.activity_memo import ACTIVITY_MEMO, prompt_version
+from core.concurrency import limiter_for
+from core.data_table import (
+    Compact_LLM_HCD_Label,
+    List_Indexed_LLM_HCD_Label,
+    List_Student_HCD_Label,
+    LLM_HCD_Label,
+)
+from core.local_classifier import (
+    LOCAL_CLASSIFIER_THRESHOLD,
+    LocalClassifier,
+    default_local_classifier,
+)
+from core.langchain_uiucchat_wrapper import IllinoisChatLLM
 from core.model_config import DEFAULT_MODEL
-from core.prompt import ACTIVITY_EVAL_SYS_PROMPT
+from core.prompt import ACTIVITY_BATCH_EVAL_INSTRUCTIONS, ACTIVITY_EVAL_SYS_PROMPT
+from core.structured_output import format_instructions
+from core.transport import recover_row, run_with_client
 from core.utils import KNOWN_SPACES, KNOWN_SUBSPACES, normalize_list
 
 
+DEFAULT_BATCH_SIZE = int(os.getenv("HCD_CLASSIFY_BATCH_SIZE", "1"))
+
+
 class Processing:
     """Post-processing helpers for activity evaluation."""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        cascade_threshold: float | None = LOCAL_CLASSIFIER_THRESHOLD,
+        local_classifier: LocalClassifier | None = None,
+        model: IllinoisChatLLM | None = None,
+    ) -> None:
         """
         Initialize the Processing helper.
 
-        Sets up the chat model using the default configuration and binds it to a structured output schema
-        (`LLM_HCD_Label`) for consistent activity classification results.
+        Sets up the chat model using the default configuration and binds it to a compact structured output
+        schema (`Compact_LLM_HCD_Label`); results are returned as `LLM_HCD_Label` rebuilt around the input activity.
+
+        Args:
+            batch_size (int): Activities classified per LLM call by `aclassify_table`. 1 disables batching.
+            cascade_threshold (float | None): Activities the local classifier labels with at least this
+                confidence are answered without the LLM. None disables the cascade.
+            local_classifier (LocalClassifier | None): Local model for the cascade; defaults to the one
+                configured by ``LOCAL_CLASSIFIER_PATH``.
+            model (IllinoisChatLLM | None): Chat model to classify with; defaults to `DEFAULT_MODEL`.
         """
-        self._model = DEFAULT_MODEL
-        self.bound_model = self._model.with_structured_output(LLM_HCD_Label)
+        self._model = DEFAULT_MODEL if model is None else model
+        self.bound_model = self._model.with_structured_output(Compact_LLM_HCD_Label)
+        self.batch_model = self._model.with_structured_output(
+            List_Indexed_LLM_HCD_Label
+        )
+        self.batch_size = batch_size
+        self.memo = ACTIVITY_MEMO
+        # everything but the activity: prompt template, model and output schema
+        self.prompt_version = prompt_version(
+            *(m["content"] for m in self._build_activity_prompt("")),
+            self._model.model,
+            format_instructions(Compact_LLM_HCD_Label),
+        )
+        # batched labels come from a different prompt and schema, so they get their own version
+        self.batch_prompt_version = prompt_version(
+            *(m["content"] for m in self._build_batch_prompt([])),
+            self._model.model,
+            format_instructions(List_Indexed_LLM_HCD_Label),
+        )
+        self.cascade_threshold = cascade_threshold
+        self.local_classifier = local_classifier
+        if local_classifier is None and cascade_threshold is not None:
+            self.local_classifier = default_local_classifier()
 
     @staticmethod
     def _build_activity_prompt(activity: str) -> list[dict[str, str]]:
@@ -43,20 +96,144 @@ class Processing:
             },
         ]
 
+    @staticmethod
+    def _build_batch_prompt(activities: list[str]) -> list[dict[str, str]]:
+        numbered = "\n".join(
+            f"[{idx}] {' '.join(activity.split())}"
+            for idx, activity in enumerate(activities)
+        )
+        return [
+            {
+                "role": "system",
+                "content": ACTIVITY_EVAL_SYS_PROMPT + ACTIVITY_BATCH_EVAL_INSTRUCTIONS,
+            },
+            {
+                "role": "user",
+                "content": (
+                    "Classify each of the following activities according to the HCD rubric:\n\n"
+                    f"{numbered}"
+                ),
+            },
+        ]
+
+    @staticmethod
+    def _rehydrate(activity: str, resp: Compact_LLM_HCD_Label) -> LLM_HCD_Label:
+        return LLM_HCD_Label(
+            activity=activity,
+            HCD_Spaces=normalize_list(resp.HCD_Spaces, KNOWN_SPACES),
+            HCD_Subspaces=normalize_list(resp.HCD_Subspaces, KNOWN_SUBSPACES),
+        )
+
+    def _recall(self, activity: str, version: str | None = None) -> LLM_HCD_Label | None:
+        if self.memo is None:
+            return None
+        return self.memo.get(version or self.prompt_version, activity)
+
+    def _remember(self, label: LLM_HCD_Label, version: str | None = None) -> None:
+        if self.memo is not None:
+            self.memo.put(version or self.prompt_version, label)
+
+    # the memo is a SQLite file; async callers reach it from a worker thread
+    async def _arecall(self, activity: str, version: str | None = None) -> LLM_HCD_Label | None:
+        if self.memo is None:
+            return None
+        return await asyncio.to_thread(self._recall, activity, version)
+
+    async def _aremember(self, labels: list[LLM_HCD_Label], version: str | None = None) -> None:
+        if self.memo is None or not labels:
+            return
+
+        def remember_all() -> None:
+            for label in labels:
+                self._remember(label, version)
+
+        await asyncio.to_thread(remember_all)
+
+    @staticmethod
+    def _unlabelled(activity: str) -> LLM_HCD_Label:
+        """Placeholder for a row whose classification failed after the transport's retries."""
+        return LLM_HCD_Label(activity=activity, HCD_Spaces=[], HCD_Subspaces=[])
+
+    @classmethod
+    async def _aclassify_or_unlabelled(cls, call, activity: str) -> LLM_HCD_Label:
+        """Await a classification `call` for `activity`, leaving the row unlabelled if it fails upstream."""
+        return await recover_row(
+            call,
+            lambda: cls._unlabelled(activity),
+            "classification failed, leaving activity unlabelled",
+        )
+
+    def _predict_locally(self, activity: str) -> LLM_HCD_Label | None:
+        """Return the local classifier's label if it clears the cascade threshold."""
+        if self.cascade_threshold is None or self.local_classifier is None:
+            return None
+        prediction = self.local_classifier.predict(activity)
+        if prediction is None or prediction.confidence < self.cascade_threshold:
+            return None
+        return LLM_HCD_Label(
+            activity=activity,
+            HCD_Spaces=[prediction.space],
+            HCD_Subspaces=[prediction.subspace],
+        )
+
     def classify_activity(self, activity: str) -> LLM_HCD_Label:
-        """Classify a single activity description using the configured LLM."""
+        """Classify a single activity description using the configured LLM.
+
+        With the cascade enabled, activities the local classifier is confident about skip the LLM.
+        """
+        cached = self._recall(activity) or self._predict_locally(activity)
+        if cached is not None:
+            return cached
         response = self.bound_model.invoke(self._build_activity_prompt(activity))
-        # normalize model outputs
-        response.HCD_Spaces = normalize_list(response.HCD_Spaces, KNOWN_SPACES)
-        response.HCD_Subspaces = normalize_list(response.HCD_Subspaces, KNOWN_SUBSPACES)
-        return response
+        label = self._rehydrate(activity, response)
+        self._remember(label)
+        return label
 
     async def aclassify_activity(self, activity: str) -> LLM_HCD_Label:
         """Async variant of :py:meth:`classify_activity`."""
+        cached = await self._arecall(activity) or self._predict_locally(activity)
+        if cached is not None:
+            return cached
         resp = await self.bound_model.ainvoke(self._build_activity_prompt(activity))
-        resp.HCD_Spaces = normalize_list(resp.HCD_Spaces, KNOWN_SPACES)
-        resp.HCD_Subspaces = normalize_list(resp.HCD_Subspaces, KNOWN_SUBSPACES)
-        return resp
+        label = self._rehydrate(activity, resp)
+        await self._aremember([label])
+        return label
+
+    async def aclassify_batch(self, activities: list[str]) -> dict[int, LLM_HCD_Label]:
+        """Classify several activities in a single structured LLM call.
+
+        Rows the model skipped, duplicated, numbered out of range, or labelled with
+        nothing recognisable are left out of the result so the caller can retry them
+        individually.
+
+        Args:
+            activities (list[str]): Activity descriptions, numbered by list position.
+
+        Returns:
+            dict[int, LLM_HCD_Label]: Labels keyed by position in `activities`.
+        """
+        resp = await self.batch_model.ainvoke(self._build_batch_prompt(activities))
+        labels: dict[int, LLM_HCD_Label] = {}
+        duplicates: set[int] = set()
+        for item in resp.labels:
+            if not 0 <= item.index < len(activities):
+                continue
+            if item.index in labels:
+                duplicates.add(item.index)
+                continue
+            spaces = normalize_list(item.HCD_Spaces, KNOWN_SPACES)
+            subspaces = normalize_list(item.HCD_Subspaces, KNOWN_SUBSPACES)
+            if not spaces or not subspaces:
+                continue
+            labels[item.index] = LLM_HCD_Label(
+                activity=activities[item.index],
+                HCD_Spaces=spaces,
+                HCD_Subspaces=subspaces,
+            )
+        for idx in duplicates:
+            labels.pop(idx, None)
+        await self._aremember(list(labels.values()), self.batch_prompt_version)
+        return labels
 
     def display_list_data_table(self, table_data: list[LLM_HCD_Label]) -> None:
         """Display the extracted List_Student_HCD_Label in a readable format.
@@ -84,22 +261,76 @@ class Processing:
         try:
             asyncio.get_running_loop()
         except RuntimeError:
-            return asyncio.run(self.aclassify_table(table_data))
+            return run_with_client(self.aclassify_table(table_data))
 
         # Fallback to sequential classification if already inside an event loop.
         return [self.classify_activity(entry.activity) for entry in table_data.tables]
 
     async def aclassify_table(
-        self, table_data: List_Student_HCD_Label, max_concurrency: int = 4
+        self,
+        table_data: List_Student_HCD_Label,
+        max_concurrency: int | None = None,
+        batch_size: int | None = None,
     ) -> list[LLM_HCD_Label]:
-        sem = asyncio.Semaphore(max_concurrency)
+        """
+        Classify every activity in the table, optionally several per LLM call.
+
+        Args:
+            table_data (List_Student_HCD_Label): The structured table data containing student activities to classify.
+            max_concurrency (int | None): Maximum number of LLM calls in flight at once; None
+                leaves concurrency to the process-wide LLM governor.
+            batch_size (int | None): Activities per call; defaults to `self.batch_size`. Rows a batch
+                response misses or mangles are classified individually.
+
+        Returns:
+            list[LLM_HCD_Label]: Classification results in the same order as `table_data.tables`.
+                A row that still fails after retries gets empty labels instead of failing the table.
+        """
+        slot = limiter_for(max_concurrency)
+        activities = [entry.activity for entry in table_data.tables]
+        batch_size = self.batch_size if batch_size is None else batch_size
 
         async def classify(entry_activity: str) -> LLM_HCD_Label:
-            async with sem:
-                return await self.aclassify_activity(entry_activity)
+            async with slot():
+                return await self._aclassify_or_unlabelled(
+                    self.aclassify_activity(entry_activity), entry_activity
+                )
+
+        if batch_size <= 1:
+            return await asyncio.gather(*(classify(a) for a in activities))
+
+        results: dict[int, LLM_HCD_Label] = {}
+        for idx, activity in enumerate(activities):
+            cached = await self._arecall(
+                activity, self.batch_prompt_version
+            ) or self._predict_locally(activity)
+            if cached is not None:
+                results[idx] = cached
+        pending = [idx for idx in range(len(activities)) if idx not in results]
+
+        async def classify_batch(rows: list[int]) -> dict[int, LLM_HCD_Label]:
+            async with slot():
+                labels = await recover_row(
+                    self.aclassify_batch([activities[i] for i in rows]),
+                    dict,
+                    "batch classification failed, retrying rows",
+                )
+            return {rows[pos]: label for pos, label in labels.items()}
+
+        for batch in await asyncio.gather(
+            *(
+                classify_batch(pending[start : start + batch_size])
+                for start in range(0, len(pending), batch_size)
+            )
+        ):
+            results.update(batch)
 
-        tasks = [classify(entry.activity) for entry in table_data.tables]
-        return await asyncio.gather(*tasks)
+        missing = [idx for idx in range(len(activities)) if idx not in results]
+        for idx, label in zip(
+            missing, await asyncio.gather(*(classify(activities[i]) for i in missing))
+        ):
+            results[idx] = label
+        return [results[idx] for idx in range(len(activities))]
 
 
 if __name__ == "__main__":
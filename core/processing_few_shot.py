@@ -6,121 +6,140 @@ from __future__ import annotations
 import asyncio
 import os
 import sys
-import csv
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from langchain.chat_models import init_chat_model
 
-from core.data_table import List_Student_HCD_Label, LLM_HCD_Label
+from core.activity_memo import ACTIVITY_MEMO, prompt_version
+from core.concurrency import limiter_for
+from core.data_table import (
+    Compact_LLM_HCD_Label,
+    List_Student_HCD_Label,
+    LLM_HCD_Label,
+)
+from core.few_shot_index import (
+    FEW_SHOT_K,
+    FEW_SHOT_TOKEN_BUDGET,
+    FewShotIndex,
+    default_few_shot_index,
+    format_examples,
+)
 from core.model_config import DEFAULT_MODEL
+from core.processing import Processing
 from core.prompt import ACTIVITY_EVAL_SYS_PROMPT
-from core.utils import KNOWN_SPACES, KNOWN_SUBSPACES, normalize_list
-
-
-def load_few_shot_examples() -> str:
-    """Loads one example per subspace from the exported CSV."""
-    csv_path = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-        "all_annotated_data.csv",
-    )
-    examples_by_subspace = {}
-
-    if not os.path.exists(csv_path):
-        print(f"Warning: Few-shot CSV not found at {csv_path}")
-        return ""
-
-    with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            raw_spaces = row.get("HCD_Space", "")
-            raw_subspaces = row.get("HCD_Subspace", "")
-
-            spaces = [
-                x.strip()
-                for x in raw_spaces.replace(" and ", ",").replace(" & ", ",").split(",")
-                if x.strip()
-            ]
-            subspaces = [
-                x.strip()
-                for x in raw_subspaces.replace(" and ", ",")
-                .replace(" & ", ",")
-                .split(",")
-                if x.strip()
-            ]
-
-            # Select unambiguous examples with 1 space and 1 subspace
-            if len(spaces) == 1 and len(subspaces) == 1:
-                space = spaces[0].lower()
-                subspace = subspaces[0].lower()
-
-                # Filter out unknown labels and only take the first good example for each subspace
-                if (
-                    space != "unknown"
-                    and subspace != "unknown"
-                    and subspace not in examples_by_subspace
-                ):
-                    examples_by_subspace[subspace] = row
-
-    if not examples_by_subspace:
-        return ""
-
-    example_str = "\n\n## Few-Shot Examples\nHere are some high-quality examples of correct classifications to guide your labeling:\n\n"
-    for sub, row in examples_by_subspace.items():
-        activity = row["Activity"]
-        space = row["HCD_Space"]
-        reason = row["Reason"]
-
-        example_str += f'**Activity**: "{activity}"\n'
-        example_str += f'**Classification**:\n- HCD_Spaces: ["{space.lower()}"]\n- HCD_Subspaces: ["{sub}"]\n'
-        if reason:
-            example_str += f"**Reasoning**: {reason}\n"
-        example_str += "---\n"
-
-    return example_str
+from core.structured_output import format_instructions
+from core.transport import run_with_client
 
 
 class ProcessingFewShot:
     """Post-processing helpers for activity evaluation using few-shot classification."""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        index: FewShotIndex | None = None,
+        k: int = FEW_SHOT_K,
+        token_budget: int = FEW_SHOT_TOKEN_BUDGET,
+        exclude_self: bool = False,
+    ) -> None:
         """
         Initialize the Processing helper.
 
-        Sets up the chat model using the default configuration and binds it to a structured output schema
-        (`LLM_HCD_Label`) for consistent activity classification results. Also loads few-shot examples.
+        Sets up the chat model using the default configuration and binds it to a compact structured output
+        schema (`Compact_LLM_HCD_Label`); results are returned as `LLM_HCD_Label`. Few-shot examples are retrieved
+        per activity from a lexical index of the annotated activities.
+
+        Args:
+            index (FewShotIndex | None): Example index; defaults to the process-wide one built from the CSV.
+            k (int): Maximum examples per prompt.
+            token_budget (int): Approximate token cap for the examples in one prompt.
+            exclude_self (bool): Never use an activity's own labelled row as its example; set when
+                evaluating on the indexed rows so gold labels do not leak into the prompt.
         """
         self._model = DEFAULT_MODEL
-        self.bound_model = self._model.with_structured_output(LLM_HCD_Label)
-        self.few_shot_examples = load_few_shot_examples()
+        self.bound_model = self._model.with_structured_output(Compact_LLM_HCD_Label)
+        self.index = index if index is not None else default_few_shot_index()
+        self.k = k
+        self.token_budget = token_budget
+        self.exclude_self = exclude_self
+        self.memo = ACTIVITY_MEMO
+        self._prompt_version: tuple[tuple, str] | None = None
+
+    @property
+    def prompt_version(self) -> str:
+        # examples depend on the activity and the index contents, so both go into the version;
+        # the hash is recomputed only when the index is refreshed or a setting changes
+        settings = (self.index.version, self._model.model, self.k, self.token_budget, self.exclude_self)
+        if self._prompt_version is None or self._prompt_version[0] != settings:
+            version = prompt_version(
+                ACTIVITY_EVAL_SYS_PROMPT,
+                self._model.model,
+                format_instructions(Compact_LLM_HCD_Label),
+                self.index.version,
+                f"{self.k}:{self.token_budget}:{self.exclude_self}",
+            )
+            self._prompt_version = (settings, version)
+        return self._prompt_version[1]
 
     def _build_activity_prompt(self, activity: str) -> list[dict[str, str]]:
-        system_prompt = ACTIVITY_EVAL_SYS_PROMPT + self.few_shot_examples
+        examples = format_examples(
+            self.index.search(
+                activity,
+                k=self.k,
+                token_budget=self.token_budget,
+                exclude=activity if self.exclude_self else None,
+            )
+        )
+        # examples go in the user turn so the system prompt stays identical across calls
         return [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": ACTIVITY_EVAL_SYS_PROMPT},
             {
                 "role": "user",
                 "content": (
-                    "Classify the following activity according to the HCD rubric:\n\n"
+                    (f"{examples}\n" if examples else "")
+                    + "Classify the following activity according to the HCD rubric:\n\n"
                     f"{activity}"
                 ),
             },
         ]
 
+    def _recall(self, activity: str) -> LLM_HCD_Label | None:
+        if self.memo is None:
+            return None
+        return self.memo.get(self.prompt_version, activity)
+
+    def _remember(self, label: LLM_HCD_Label) -> None:
+        if self.memo is not None:
+            self.memo.put(self.prompt_version, label)
+
+    async def _arecall(self, activity: str) -> LLM_HCD_Label | None:
+        if self.memo is None:
+            return None
+        return await asyncio.to_thread(self.memo.get, self.prompt_version, activity)
+
+    async def _aremember(self, label: LLM_HCD_Label) -> None:
+        if self.memo is not None:
+            await asyncio.to_thread(self.memo.put, self.prompt_version, label)
+
     def classify_activity(self, activity: str) -> LLM_HCD_Label:
         """Classify a single activity description using the configured LLM."""
+        cached = self._recall(activity)
+        if cached is not None:
+            return cached
         response = self.bound_model.invoke(self._build_activity_prompt(activity))
-        # normalize model outputs
-        response.HCD_Spaces = normalize_list(response.HCD_Spaces, KNOWN_SPACES)
-        response.HCD_Subspaces = normalize_list(response.HCD_Subspaces, KNOWN_SUBSPACES)
-        return response
+        label = Processing._rehydrate(activity, response)
+        self._remember(label)
+        return label
 
     async def aclassify_activity(self, activity: str) -> LLM_HCD_Label:
         """Async variant of :py:meth:`classify_activity`."""
+        cached = await self._arecall(activity)
+        if cached is not None:
+            return cached
         resp = await self.bound_model.ainvoke(self._build_activity_prompt(activity))
-        resp.HCD_Spaces = normalize_list(resp.HCD_Spaces, KNOWN_SPACES)
-        resp.HCD_Subspaces = normalize_list(resp.HCD_Subspaces, KNOWN_SUBSPACES)
-        return resp
+        label = Processing._rehydrate(activity, resp)
+        await self._aremember(label)
+        return label
 
     def display_list_data_table(self, table_data: list[LLM_HCD_Label]) -> None:
         """Display the extracted List_Student_HCD_Label in a readable format.
@@ -148,19 +167,21 @@ class ProcessingFewShot:
         try:
             asyncio.get_running_loop()
         except RuntimeError:
-            return asyncio.run(self.aclassify_table(table_data))
+            return run_with_client(self.aclassify_table(table_data))
 
         # Fallback to sequential classification if already inside an event loop.
         return [self.classify_activity(entry.activity) for entry in table_data.tables]
 
     async def aclassify_table(
-        self, table_data: List_Student_HCD_Label, max_concurrency: int = 4
+        self, table_data: List_Student_HCD_Label, max_concurrency: int | None = None
     ) -> list[LLM_HCD_Label]:
-        sem = asyncio.Semaphore(max_concurrency)
+        slot = limiter_for(max_concurrency)
 
         async def classify(entry_activity: str) -> LLM_HCD_Label:
-            async with sem:
-                return await self.aclassify_activity(entry_activity)
+            async with slot():
+                return await Processing._aclassify_or_unlabelled(
+                    self.aclassify_activity(entry_activity), entry_activity
+                )
 
         tasks = [classify(entry.activity) for entry in table_data.tables]
         return await asyncio.gather(*tasks)
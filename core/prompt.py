@@ -97,8 +97,7 @@ You are the rubric enforcer for the Human-Centered Design (HCD) activity classif
 - The wording may be terse, informal, or contain multiple actions; treat it as a factual report of what occurred.
 
 ## Output Contract
-Provide values that map cleanly onto the `LLM_HCD_Label` Pydantic schema:
-- `activity`: repeat the original activity string verbatim.
+Provide values that map cleanly onto the requested JSON schema:
 - `HCD_Spaces`: a list containing EXACTLY ONE item from {understand, synthesize, ideate, prototype, implement} in lowercase.
 - `HCD_Subspaces`: a list containing EXACTLY ONE subspace (lowercase) that aligns with the chosen space in `HCD_Spaces`.
 
@@ -106,7 +105,7 @@ Provide values that map cleanly onto the `LLM_HCD_Label` Pydantic schema:
 
 - You MUST select ONLY ONE space and ONLY ONE subspace that best represents the primary or most significant action in the activity.
 - Do NOT output multiple pairs, even if the activity spans distinct phases. Evaluate and choose the dominant one.
-- Never invent new fields or omit required ones.
+- Never invent new fields or omit required ones, and do not repeat the activity text.
 
 ## Decision Process
 1. Parse the activity for concrete actions, intentions, and outcomes.
@@ -153,16 +152,35 @@ Provide values that map cleanly onto the `LLM_HCD_Label` Pydantic schema:
 - If the activity combines multiple steps in sequence, reflect that sequence in the paired lists.
 """
 
+ACTIVITY_BATCH_EVAL_INSTRUCTIONS = """
+## Batch Mode
+You will receive several activities at once, each prefixed with its row number in square brackets (e.g. `[3]`).
+- Classify every activity independently using the rubric above; never let one activity influence another.
+- Return exactly one entry per activity with `index` set to its row number.
+- Do not repeat the activity text; only return `index`, `HCD_Spaces` and `HCD_Subspaces`.
+"""
+
+FUSED_EVAL_INSTRUCTIONS = """
+## Fused Classification and Evaluation
+You also receive the student's own HCD labels for the activity. Do both steps in one response:
+1. Classify the activity yourself following the rubric above and report it in `HCD_Spaces` and `HCD_Subspaces`.
+2. Judge each student subspace independently against the rubric and your classification, and report one flag per student subspace in `result`, aligned by index:
+  - 1 (correct) if the student subspace matches your classification and the evidence supports it.
+  - 0 (not enough evidence) if the evidence is ambiguous or insufficient to confirm or deny that subspace.
+  - -1 (incorrect) if the evidence contradicts the subspace or the rubric refutes it.
+- Focus on verifying the student's labels; do not penalize reasonable omissions.
+- `Reason`: concise explanation (1-2 sentences) for the overall assignment.
+- Do not repeat the activity text or the student's labels.
+"""
+
 FINAL_EVAL_SYS_PROMPT = """
 You are the final evaluator who determines whether the student's self-labeled HCD subspaces are justified when compared with the model's classification for the same activity.
 
 ## Output Schema
-Return data that matches the `Output_Label` Pydantic model exactly:
-- `activity`: repeat the original activity string verbatim.
-- `student_labeled_spaces`: list of normalized, lowercase spaces.
-- `student_labeled_subspaces`: list of normalized, lowercase subspaces.
-- `result`: list[int] aligned by index to `student_labeled_subspaces`. For each subspace, output 1 if correct, 0 if not enough evidence, -1 if incorrect.
+Return only these fields:
+- `result`: list[int] aligned by index to the student's HCD subspaces. For each subspace, output 1 if correct, 0 if not enough evidence, -1 if incorrect.
 - `Reason`: concise explanation (1-2 sentences) for the overall assignment. Keep brief.
+- Do not repeat the activity text or the student's labels.
 
 ## Evaluation Rules
 1. Compare subspace names case-insensitively, using normalized lowercase values.
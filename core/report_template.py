@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Fast, non-LLM template detection and cropping for progress report text.
+
+Used before LLM table extraction so the model gets the prompt that matches the
+report's template and only the activity-table section rather than every page.
+"""
+
+from __future__ import annotations
+
+import re
+
+from core.table_extraction import TemplateName
+
+_NEW_TEMPLATE_MARKERS = ("activity title", "activity description", "hcd process")
+_SECTION_START = re.compile(r"provide a brief list of activities", re.IGNORECASE)
+_TABLE_HEADER = re.compile(r"^\s*activity(?: title)?\s*$", re.IGNORECASE | re.MULTILINE)
+# the numbered questions that follow the activity table in both templates, e.g. "5. Expand on ...";
+# templates use zero-width spaces. Anchored to the headings so numbered activity rows do not match.
+_NEXT_SECTION = re.compile(
+    r"^\s*\d{1,2}\.[\s\u200b]*(?:what |expand on |describe how |as you engaged |highlight the )",
+    re.IGNORECASE | re.MULTILINE,
+)
+# the table's HCD column headers ("HCD space(s)", "HCD subspace(s)", "HDC process(es)", ...)
+_COLUMN_HEADER = re.compile(r"\bh(?:cd|dc) (?:sub)?(?:space|process)\((?:s|es)\)", re.IGNORECASE)
+
+MIN_CROPPED_CHARS = 40
+
+
+def detect_template(text: str) -> TemplateName:
+    """Return "new" for the updated SIIP template, otherwise "legacy".
+
+    Args:
+        text (str): Markdown or plain text of the whole report.
+
+    Returns:
+        TemplateName: The detected template.
+    """
+    lowered = text.lower()
+    if all(marker in lowered for marker in _NEW_TEMPLATE_MARKERS):
+        return "new"
+    return "legacy"
+
+
+def crop_activity_section(text: str) -> str:
+    """Keep only the activity-table section of a report.
+
+    The section starts at the "Provide a brief list of activities" prompt (or the
+    table's "Activity" header) and ends at the next numbered question, which drops
+    the title block, the HCD overview grid and the narrative questions. The full
+    text is returned unchanged when the section cannot be located.
+
+    Args:
+        text (str): Markdown or plain text of the whole report.
+
+    Returns:
+        str: The cropped text, or `text` itself if cropping is not safe.
+    """
+    start_match = _SECTION_START.search(text) or _TABLE_HEADER.search(text)
+    if start_match is None:
+        return text
+
+    # skip the heading line itself so it is not mistaken for the next section
+    body_start = text.find("\n", start_match.end())
+    if body_start == -1:
+        return text
+    end_match = _NEXT_SECTION.search(text, body_start)
+    end = end_match.start() if end_match else len(text)
+
+    cropped = text[start_match.start() : end].strip()
+    if len(cropped) < MIN_CROPPED_CHARS or not _has_rows(cropped):
+        return text
+    return cropped
+
+
+def _has_rows(cropped: str) -> bool:
+    """Whether anything follows the table's column headers, i.e. the crop kept at least one row."""
+    headers = list(_COLUMN_HEADER.finditer(cropped))
+    if not headers:
+        return True
+    return re.search(r"\w", cropped[headers[-1].end() :]) is not None
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Structured output for chat models that only return text.
+
+`IllinoisChatLLM.with_structured_output` appends JSON format instructions to
+the last user message and parses the reply into a Pydantic model. This module
+keeps that path cheap:
+
+- format instructions are rendered once per schema and reused;
+- prompt messages are built without copying the caller's messages (only the
+  message that gets the instructions is replaced);
+- replies are parsed in one pass: validate the text as JSON directly, else
+  extract the outermost JSON value from code fences or surrounding prose,
+  apply a few textual repairs (trailing commas, Python literals, unclosed
+  brackets) and validate again with ``model_validate_json``.
+
+Unparseable replies raise `OutputParserException`, a `ValueError`, as
+`PydanticOutputParser` did, so callers' error handling is unchanged.
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Any, Optional, Type, TypeVar
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.output_parsers import PydanticOutputParser
+from pydantic import BaseModel, ValidationError
+
+T = TypeVar("T", bound=BaseModel)
+
+STRICT_JSON_NOTICE = (
+    "CRITICAL: You MUST strictly output ONLY valid JSON following the schema below. "
+    "DO NOT output markdown tables or text.\n"
+)
+
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+@lru_cache(maxsize=None)
+def format_instructions(schema: Type[BaseModel]) -> str:
+    """Return the JSON format instructions for `schema`, rendered once per schema."""
+    return PydanticOutputParser(pydantic_object=schema).get_format_instructions()
+
+
+def _to_message(message: Any) -> BaseMessage:
+    if isinstance(message, BaseMessage):
+        return message
+    if isinstance(message, dict):
+        content = message.get("content", "")
+        if message.get("role", "user") == "system":
+            return SystemMessage(content=content)
+        return HumanMessage(content=content)
+    return HumanMessage(content=str(message))
+
+
+def build_messages(messages: Any, instructions: str) -> list[BaseMessage]:
+    """
+    Normalize a prompt and attach format instructions to its last human message.
+
+    The caller's messages are never mutated or deep-copied; the message that
+    receives the instructions is replaced by a new one.
+
+    Args:
+        messages (Any): A string, or a list of messages, role/content dicts or strings.
+        instructions (str): Format instructions for the expected JSON.
+
+    Returns:
+        list[BaseMessage]: Messages to send to the chat model.
+    """
+    if isinstance(messages, list):
+        prompt = [_to_message(m) for m in messages]
+    else:
+        prompt = [HumanMessage(content=str(messages))]
+
+    for i in range(len(prompt) - 1, -1, -1):
+        if isinstance(prompt[i], HumanMessage):
+            prompt[i] = HumanMessage(
+                content=f"{prompt[i].content}\n\n{STRICT_JSON_NOTICE}{instructions}"
+            )
+            return prompt
+
+    # no human message: send the instructions as a trailing system message
+    prompt.append(SystemMessage(content=STRICT_JSON_NOTICE + instructions))
+    return prompt
+
+
+def _extract_json(text: str) -> Optional[str]:
+    """Return the outermost JSON object or array in `text`, closing it if it was cut off."""
+    start = min(
+        (i for i in (text.find("{"), text.find("[")) if i != -1), default=-1
+    )
+    if start == -1:
+        return None
+    stack: list[str] = []
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in "}]":
+            if not stack or stack.pop() != char:
+                return None
+            if not stack:
+                return text[start : i + 1]
+    # truncated reply: close whatever is still open
+    tail = '"' if in_string else ""
+    return text[start:] + tail + "".join(reversed(stack))
+
+
+def _repair(candidate: str) -> str:
+    """Cheap textual fixes for JSON-like output; applied outside string literals only."""
+    parts = re.split(r'("(?:[^"\\]|\\.)*")', candidate)
+    for i in range(0, len(parts), 2):
+        part = _TRAILING_COMMA.sub(r"\1", parts[i])
+        part = re.sub(r"\bTrue\b", "true", part)
+        part = re.sub(r"\bFalse\b", "false", part)
+        parts[i] = re.sub(r"\bNone\b", "null", part)
+    return "".join(parts)
+
+
+def parse_structured(text: str, schema: Type[T]) -> T:
+    """
+    Parse a model reply into `schema`, tolerating fences, prose and small JSON mistakes.
+
+    Args:
+        text (str): Raw reply text.
+        schema (Type[T]): Pydantic model to validate against.
+
+    Returns:
+        T: The validated object.
+
+    Raises:
+        OutputParserException: If no valid `schema` instance can be recovered.
+    """
+    try:
+        return schema.model_validate_json(text)
+    except ValidationError as exc:
+        error: Exception = exc
+
+    candidate = _extract_json(text)
+    if candidate is not None:
+        for attempt in (candidate, _repair(candidate)):
+            try:
+                return schema.model_validate_json(attempt)
+            except ValidationError as exc:
+                error = exc
+    raise OutputParserException(
+        f"Failed to parse {schema.__name__} from completion {text!r}. Got: {error}",
+        llm_output=text,
+    )
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Deterministic activity-table extraction for the SIIP progress report templates.
+
+Both templates put the student's activities in a ruled table, which PyMuPDF's
+table finder recovers directly:
+
+- legacy template: "Activity" | "HCD space(s)" | "HCD subspace(s)"
+- updated template (Section 4): "Activity Title" | "Activity Description" |
+  "HCD space(s)" | "HCD process(es)", with an instructional "Example" row
+
+The extractor maps those columns into `List_Student_HCD_Label` and reports a
+confidence score so `PreProcessor` can fall back to the LLM when the layout
+does not look like either template.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+from dataclasses import dataclass
+from typing import Literal, Optional
+
+import fitz
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.data_table import List_Student_HCD_Label, Student_HCD_Label
+from core.utils import KNOWN_SPACES, KNOWN_SUBSPACES, normalize_list
+
+TemplateName = Literal["legacy", "new"]
+
+MIN_TABLE_CONFIDENCE = float(os.getenv("TABLE_EXTRACTION_MIN_CONFIDENCE", "0.8"))
+
+_LABEL_SPLIT = re.compile(r"\s*(?:[/,;&+]|\band\b)\s*", re.IGNORECASE)
+
+
+@dataclass
+class TableExtraction:
+    """Result of deterministic table detection.
+
+    Attributes:
+        table: Extracted rows, with spaces and subspaces normalized.
+        template: Which report template the table header matched.
+        confidence: Share of label tokens that normalized to a known space or
+            subspace; 0.0 when no usable row was found.
+    """
+
+    table: List_Student_HCD_Label
+    template: TemplateName
+    confidence: float
+
+
+def _clean_cell(cell: Optional[str]) -> str:
+    return " ".join((cell or "").split())
+
+
+def _match_header(row: list[Optional[str]]) -> Optional[tuple[TemplateName, dict[str, int]]]:
+    cells = [_clean_cell(c).lower() for c in row]
+
+    def find(prefix: str) -> Optional[int]:
+        return next((i for i, c in enumerate(cells) if c.startswith(prefix)), None)
+
+    space_col = find("hcd space")
+    if space_col is None:
+        return None
+
+    title_col, desc_col = find("activity title"), find("activity description")
+    process_col = find("hcd process")
+    if title_col is not None and desc_col is not None and process_col is not None:
+        return "new", {
+            "title": title_col,
+            "description": desc_col,
+            "space": space_col,
+            "subspace": process_col,
+        }
+
+    activity_col, subspace_col = find("activity"), find("hcd subspace")
+    if activity_col is not None and subspace_col is not None:
+        return "legacy", {
+            "activity": activity_col,
+            "space": space_col,
+            "subspace": subspace_col,
+        }
+    return None
+
+
+def _split_labels(cell: str) -> list[str]:
+    return [part for part in _LABEL_SPLIT.split(cell) if part]
+
+
+def _row_activity(template: TemplateName, columns: dict[str, int], row: list[str]) -> str:
+    if template == "legacy":
+        return row[columns["activity"]]
+    title, description = row[columns["title"]], row[columns["description"]]
+    if title and description:
+        return f"{title}: {description}"
+    return title or description
+
+
+def extract_student_table(document: fitz.Document) -> Optional[TableExtraction]:
+    """Find the activity table in a progress report and map it to student labels.
+
+    Rows on later pages that continue the table (same column count, no header)
+    are appended. Blank rows and the template's "Example" row are skipped.
+
+    Args:
+        document (fitz.Document): An open PDF document.
+
+    Returns:
+        Optional[TableExtraction]: The extraction, or None when no activity table header was found.
+    """
+    template: Optional[TemplateName] = None
+    columns: dict[str, int] = {}
+    width = 0
+    raw_rows: list[list[str]] = []
+
+    for page in document:
+        try:
+            tables = page.find_tables().tables
+        except (AssertionError, RuntimeError, ValueError):
+            continue
+        for table in tables:
+            rows = [[_clean_cell(c) for c in row] for row in table.extract()]
+            if not rows:
+                continue
+            if template is None:
+                for header_idx, row in enumerate(rows[:2]):
+                    matched = _match_header(row)
+                    if matched is not None:
+                        template, columns = matched
+                        width = len(row)
+                        raw_rows.extend(rows[header_idx + 1 :])
+                        break
+            elif len(rows[0]) == width and _match_header(rows[0]) is None:
+                raw_rows.extend(rows)
+
+    if template is None:
+        return None
+
+    entries: list[Student_HCD_Label] = []
+    total_tokens = recognized_tokens = 0
+    for row in raw_rows:
+        if not any(row):
+            continue
+        activity = _row_activity(template, columns, row)
+        if not activity or activity.lower().startswith("example"):
+            continue
+        raw_spaces = _split_labels(row[columns["space"]])
+        raw_subspaces = _split_labels(row[columns["subspace"]])
+        spaces = normalize_list(raw_spaces, KNOWN_SPACES)
+        subspaces = normalize_list(raw_subspaces, KNOWN_SUBSPACES)
+        total_tokens += len(raw_spaces) + len(raw_subspaces) or 1
+        recognized_tokens += sum(
+            1 for s in raw_spaces if normalize_list([s], KNOWN_SPACES)
+        ) + sum(1 for s in raw_subspaces if normalize_list([s], KNOWN_SUBSPACES))
+        entries.append(
+            Student_HCD_Label(
+                activity=activity, HCD_Spaces=spaces, HCD_Subspaces=subspaces
+            )
+        )
+
+    confidence = recognized_tokens / total_tokens if entries else 0.0
+    return TableExtraction(
+        table=List_Student_HCD_Label(tables=entries),
+        template=template,
+        confidence=confidence,
+    )
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""HTTP transport shared by the UIUC chat wrapper.
+
+A single keep-alive ``httpx.AsyncClient`` per event loop is shared by every
+async LLM call on that loop so concurrent requests reuse TCP/TLS connections
+instead of opening a new one per activity. The FastAPI app opens the pool on
+startup and closes it on shutdown; the sync ``classify_table`` helpers run
+their loop through :func:`run_with_client`, which closes the loop's client
+before the loop ends. A client left open is dropped with its loop.
+
+Sync calls share a thread-safe ``httpx.Client`` in the same way. Both paths go
+through :func:`post_json` / :func:`apost_json`, which apply connect/read
+timeouts, retry transient failures (connection errors, timeouts, 429 and 5xx)
+with exponential backoff and full jitter, honour ``Retry-After`` and record
+the latency of every attempt in :data:`ATTEMPT_LOG`. An optional per-attempt
+guard (the LLM governor's rate token and concurrency slot) is held for each
+HTTP attempt only, never across backoff sleeps.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import nullcontext
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import AsyncContextManager, Awaitable, Callable, ContextManager, Optional, TypeVar
+
+import dotenv
+import httpx
+from langchain_core.exceptions import OutputParserException
+
+dotenv.load_dotenv()
+
+MAX_CONNECTIONS = int(os.getenv("UIUC_CHAT_MAX_CONNECTIONS", "32"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("UIUC_CHAT_MAX_KEEPALIVE", "16"))
+KEEPALIVE_EXPIRY = float(os.getenv("UIUC_CHAT_KEEPALIVE_EXPIRY", "30"))
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+
+# connections are bound to the loop that opened them, so each loop gets its own client
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_async_clients_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+_sync_client_lock = threading.Lock()
+
+
+@dataclass
+class RetryPolicy:
+    """Timeout and retry settings for a single logical request.
+
+    Attributes:
+        connect_timeout: Seconds allowed to establish a connection.
+        read_timeout: Seconds allowed between bytes of the response.
+        max_retries: Retries after the first attempt (0 disables retrying).
+        backoff_base: Base delay in seconds for exponential backoff.
+        backoff_max: Upper bound in seconds for any single backoff delay.
+    """
+
+    connect_timeout: float = 10.0
+    read_timeout: float = 120.0
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            self.read_timeout, connect=self.connect_timeout, pool=self.connect_timeout
+        )
+
+
+@dataclass
+class AttemptRecord:
+    """Outcome of one HTTP attempt against the upstream chat API.
+
+    Attributes:
+        url: Endpoint that was called.
+        attempt: 0-based attempt number within the logical request.
+        latency: Wall-clock seconds spent on the attempt.
+        status_code: HTTP status, or None when no response was received.
+        error: Exception class name for transport failures, else None.
+        started_at: ``time.time()`` when the attempt began.
+        request_bytes: Size of the request body (0 when no response was received).
+        response_bytes: Size of the response body.
+    """
+
+    url: str
+    attempt: int
+    latency: float
+    status_code: Optional[int]
+    error: Optional[str]
+    started_at: float
+    request_bytes: int = 0
+    response_bytes: int = 0
+
+
+ATTEMPT_LOG: deque[AttemptRecord] = deque(maxlen=5000)
+# called with every AttemptRecord as it is logged, e.g. to react to throttling
+ATTEMPT_LISTENERS: list[Callable[[AttemptRecord], None]] = []
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the running loop's shared async client, creating it on first use.
+
+    Connections are bound to the event loop that opened them, so every loop
+    (e.g. each ``asyncio.run`` of a sync helper, or a loop on another thread)
+    gets its own client instead of replacing, and leaking, another loop's.
+
+    Returns:
+        httpx.AsyncClient: The shared keep-alive client.
+    """
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(limits=_pool_limits())
+            _async_clients[loop] = client
+        return client
+
+
+async def aclose_async_client() -> None:
+    """Close the running loop's async client and drop its pooled connections."""
+    with _async_clients_lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def run_with_client(main: Awaitable[T]) -> T:
+    """Run `main` in a new event loop like ``asyncio.run``, closing the loop's client before it ends."""
+
+    async def runner() -> T:
+        try:
+            return await main
+        finally:
+            await aclose_async_client()
+
+    return asyncio.run(runner())
+
+
+# failures one LLM-backed row can absorb: the transport gave up after its retries,
+# the call timed out, the upstream answered with a body that is not JSON, or the
+# model's reply never parsed (what `parse_structured` raises)
+ROW_FAILURES = (
+    httpx.HTTPError,
+    asyncio.TimeoutError,
+    json.JSONDecodeError,
+    OutputParserException,
+)
+
+
+async def recover_row(call: Awaitable[T], placeholder: Callable[[], T], warning: str) -> T:
+    """Await one row's LLM call, falling back to `placeholder()` if it fails upstream.
+
+    A placeholder instead of an exception keeps every other row's completed work.
+    Only `ROW_FAILURES` are absorbed (and reported with `warning`); anything else
+    is a bug and propagates.
+    """
+    try:
+        return await call
+    except ROW_FAILURES as exc:
+        print(f"Warning: {warning}: {exc!r}")
+        return placeholder()
+
+
+def get_sync_client() -> httpx.Client:
+    """Return the process-wide sync client, creating it on first use."""
+    global _sync_client
+
+    with _sync_client_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(limits=_pool_limits())
+        return _sync_client
+
+
+def _retry_after_seconds(response: Optional[httpx.Response]) -> Optional[float]:
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(
+    policy: RetryPolicy, attempt: int, response: Optional[httpx.Response]
+) -> float:
+    """Full-jitter exponential backoff, never shorter than ``Retry-After``."""
+    delay = random.uniform(0, min(policy.backoff_max, policy.backoff_base * 2**attempt))
+    retry_after = _retry_after_seconds(response)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, policy.backoff_max))
+    return delay
+
+
+def _record(
+    url: str,
+    attempt: int,
+    started_at: float,
+    response: Optional[httpx.Response],
+    error: Optional[BaseException],
+) -> None:
+    record = AttemptRecord(
+        url=url,
+        attempt=attempt,
+        latency=time.time() - started_at,
+        status_code=response.status_code if response is not None else None,
+        error=type(error).__name__ if error is not None else None,
+        started_at=started_at,
+        request_bytes=len(response.request.content) if response is not None else 0,
+        response_bytes=len(response.content) if response is not None else 0,
+    )
+    ATTEMPT_LOG.append(record)
+    for listener in ATTEMPT_LISTENERS:
+        listener(record)
+
+
+def _should_retry(
+    policy: RetryPolicy, attempt: int, response: Optional[httpx.Response]
+) -> bool:
+    if attempt >= policy.max_retries:
+        return False
+    return response is None or response.status_code in RETRYABLE_STATUS_CODES
+
+
+def post_json(
+    url: str,
+    payload: dict,
+    policy: RetryPolicy,
+    guard: Callable[[], ContextManager] = nullcontext,
+) -> dict:
+    """POST ``payload`` as JSON with retries and return the decoded body.
+
+    Args:
+        url (str): Endpoint to call.
+        payload (dict): JSON request body.
+        policy (RetryPolicy): Timeout and retry settings.
+        guard (Callable[[], ContextManager]): Entered around each attempt, e.g. to take a
+            rate token and a concurrency slot; it exits with an error for failed attempts.
+
+    Returns:
+        dict: The decoded JSON response.
+
+    Raises:
+        httpx.HTTPStatusError: The final attempt returned an error status.
+        httpx.TransportError: The final attempt failed to connect or timed out.
+    """
+    client = get_sync_client()
+    attempt = 0
+    while True:
+        response: Optional[httpx.Response] = None
+        try:
+            with guard():
+                started_at = time.time()
+                try:
+                    response = client.post(url, json=payload, timeout=policy.timeout())
+                except httpx.TransportError as exc:
+                    _record(url, attempt, started_at, None, exc)
+                    raise
+                _record(url, attempt, started_at, response, None)
+                response.raise_for_status()
+                return response.json()
+        except (httpx.TransportError, httpx.HTTPStatusError):
+            if not _should_retry(policy, attempt, response):
+                raise
+        time.sleep(_backoff_delay(policy, attempt, response))
+        attempt += 1
+
+
+async def apost_json(
+    url: str,
+    payload: dict,
+    policy: RetryPolicy,
+    guard: Callable[[], AsyncContextManager] = nullcontext,
+) -> dict:
+    """Async variant of :func:`post_json` using the shared keep-alive pool."""
+    client = get_async_client()
+    attempt = 0
+    while True:
+        response: Optional[httpx.Response] = None
+        try:
+            async with guard():
+                started_at = time.time()
+                try:
+                    response = await client.post(url, json=payload, timeout=policy.timeout())
+                except httpx.TransportError as exc:
+                    _record(url, attempt, started_at, None, exc)
+                    raise
+                _record(url, attempt, started_at, response, None)
+                response.raise_for_status()
+                return response.json()
+        except (httpx.TransportError, httpx.HTTPStatusError):
+            if not _should_retry(policy, attempt, response):
+                raise
+        await asyncio.sleep(_backoff_delay(policy, attempt, response))
+        attempt += 1
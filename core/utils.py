@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
-from difflib import get_close_matches
+import re
+from functools import lru_cache
+from typing import Iterable, Optional
 
 KNOWN_SPACES = {
     "understand",
@@ -33,30 +35,219 @@ KNOWN_SUBSPACES = {
 }
 
 
+# Spellings students and models use for each label besides the label itself.
+# Plurals, -ed/-ing forms and punctuation variants are generated automatically.
+LABEL_ALIASES = {
+    "understand": ["understanding"],
+    "synthesize": ["synthesis", "synthesise", "synthesizing", "synthesising"],
+    "ideate": ["ideation", "ideating", "ideas"],
+    "prototype": ["prototyping", "prototypes"],
+    "implement": ["implementation", "implementing"],
+    "explore": ["exploration", "exploring"],
+    "observe": ["observation", "observations", "observing"],
+    "empathize": ["empathy", "empathise", "empathizing", "empathising"],
+    "reflect": ["reflection", "reflections", "reflecting"],
+    "debrief": ["debriefing"],
+    "organize": ["organization", "organise", "organisation", "organizing", "organising"],
+    "interpret": ["interpretation", "interpreting"],
+    "define": ["definition", "defining"],
+    "brainstorm": ["brainstorming", "brain storm", "brain storming"],
+    "propose": ["proposal", "proposals", "proposing"],
+    "plan": ["planning", "plans"],
+    "narrow concepts": [
+        "narrow concept",
+        "narrowing concepts",
+        "narrowing concept",
+        "narrow down concepts",
+        "narrowing down concepts",
+        "concept narrowing",
+    ],
+    "create": ["creation", "creating", "(re)create", "recreate", "re-create"],
+    "engage": ["engagement", "engaging"],
+    "evaluate": ["evaluation", "evaluating"],
+    "iterate": ["iteration", "iterations", "iterating"],
+    "support": ["supporting"],
+    "sustain": ["sustaining", "sustainment", "sustainability"],
+    "evolve": ["evolution", "evolving"],
+    "execute": ["execution", "executing"],
+}
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def _label_key(text: str) -> str:
+    """Lowercase, turn punctuation into spaces and collapse whitespace."""
+    return " ".join(_NON_ALNUM.sub(" ", text.lower()).split())
+
+
+def _inflections(label: str) -> set[str]:
+    # inflect the last word only; odd forms like "narrow conceptss" are harmless
+    head, _, last = label.rpartition(" ")
+    prefix = f"{head} " if head else ""
+    stem = last[:-1] if last.endswith("e") else last
+    return {
+        prefix + form
+        for form in (last + "s", last + "es", last + "d", last + "ed", stem + "ing", stem + "ed")
+    }
+
+
+def _levenshtein(a: str, b: str) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            )
+        previous = current
+    return previous[-1]
+
+
+class _BKTree:
+    """Burkhard-Keller tree over alias keys for bounded edit-distance search."""
+
+    def __init__(self, words: Iterable[str]) -> None:
+        self._root: Optional[tuple[str, dict]] = None
+        for word in words:
+            self._add(word)
+
+    def _add(self, word: str) -> None:
+        if self._root is None:
+            self._root = (word, {})
+            return
+        node = self._root
+        while True:
+            distance = _levenshtein(word, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (word, {})
+                return
+            node = child
+
+    def search(self, word: str, radius: int) -> list[tuple[int, str]]:
+        """Return (distance, key) for every key within `radius` edits of `word`."""
+        if self._root is None:
+            return []
+        found, stack = [], [self._root]
+        while stack:
+            key, children = stack.pop()
+            distance = _levenshtein(word, key)
+            if distance <= radius:
+                found.append((distance, key))
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+class LabelNormalizer:
+    """Maps free-form HCD space/subspace labels onto a known label set.
+
+    Exact labels, aliases, inflections and punctuation variants resolve with a
+    single dict lookup. Anything else falls back to the closest alias key by
+    edit distance (via a BK-tree), and every resolution is memoized, so a
+    label string is only ever matched once per process.
+    """
+
+    def __init__(
+        self,
+        known: Iterable[str],
+        aliases: Optional[dict[str, list[str]]] = None,
+        cutoff: float = 0.75,
+        memo_size: int = 8192,
+    ) -> None:
+        """
+        Build the alias table and edit-distance index.
+
+        Args:
+            known (Iterable[str]): Canonical labels.
+            aliases (Optional[dict[str, list[str]]]): Extra spellings per canonical label;
+                spellings of labels outside `known` are reserved as non-matches.
+            cutoff (float): Minimum similarity (1 - edits / longer length) for a fuzzy match.
+            memo_size (int): Distinct inputs whose resolution is memoized.
+        """
+        self.known = frozenset(known)
+        self.cutoff = cutoff
+        aliases = aliases or {}
+        self._table: dict[str, Optional[str]] = {}
+        for label in sorted(self.known):
+            for variant in {label, *_inflections(label), *aliases.get(label, [])}:
+                key = _label_key(variant)
+                if key and key not in self._table:
+                    self._table[key] = label
+        for label in self.known:
+            # a canonical label always wins over another label's generated variant
+            self._table[_label_key(label)] = label
+        # spellings of labels outside this set resolve to no match instead of a near
+        # neighbour, e.g. "ideation" is not a misspelt "iteration"
+        for label in sorted(set(aliases) - self.known):
+            for variant in {label, *_inflections(label), *aliases[label]}:
+                self._table.setdefault(_label_key(variant), None)
+        self._index = _BKTree(sorted(self._table))
+        self._resolve = lru_cache(maxsize=memo_size)(self._resolve_uncached)
+
+    def _resolve_uncached(self, item: str) -> Optional[str]:
+        key = _label_key(item)
+        if not key:
+            return ""
+        if key in self._table:
+            return self._table[key]
+
+        radius = max(1, int(len(key) * (1 - self.cutoff)))
+        best: Optional[tuple[float, str]] = None
+        for distance, candidate in self._index.search(key, radius):
+            similarity = 1 - distance / max(len(key), len(candidate))
+            if similarity >= self.cutoff and (
+                best is None or (-similarity, candidate) < (-best[0], best[1])
+            ):
+                best = (similarity, candidate)
+        return self._table[best[1]] if best is not None else None
+
+    def normalize(self, item: str) -> Optional[str]:
+        """Return the canonical label for `item`, "" for blank input, or None if nothing matches."""
+        return self._resolve((item or "").strip().lower())
+
+    def normalize_many(self, items: Iterable[str]) -> list[Optional[str]]:
+        """Normalize many labels at once, resolving each distinct string only once."""
+        items = list(items)
+        resolved = {item: self.normalize(item) for item in set(items)}
+        return [resolved[item] for item in items]
+
+    def normalize_list(self, items: Optional[list[str]]) -> list[str]:
+        """Normalize a label list, dropping unmatched labels and duplicates but keeping order."""
+        normalized: list[str] = []
+        seen = set()
+        for norm in self.normalize_many(items or []):
+            if norm and norm not in seen:
+                normalized.append(norm)
+                seen.add(norm)
+        return normalized
+
+
+SPACE_NORMALIZER = LabelNormalizer(KNOWN_SPACES, LABEL_ALIASES)
+SUBSPACE_NORMALIZER = LabelNormalizer(KNOWN_SUBSPACES, LABEL_ALIASES)
+_NORMALIZERS: dict[frozenset, LabelNormalizer] = {
+    SPACE_NORMALIZER.known: SPACE_NORMALIZER,
+    SUBSPACE_NORMALIZER.known: SUBSPACE_NORMALIZER,
+}
+
+
+def get_normalizer(known: set[str]) -> LabelNormalizer:
+    """Return the shared normalizer for a label set, building one for unfamiliar sets."""
+    key = frozenset(known)
+    normalizer = _NORMALIZERS.get(key)
+    if normalizer is None:
+        normalizer = _NORMALIZERS[key] = LabelNormalizer(key, LABEL_ALIASES)
+    return normalizer
+
+
 def _normalize_item(item: str, known: set[str]) -> str:
-    s = (item or "").strip().lower()
-    if not s:
-        return ""
-    if s in known:
-        return s
-    # try to match by removing extra punctuation
-    s_clean = "".join(ch for ch in s if ch.isalnum() or ch.isspace())
-    if s_clean in known:
-        return s_clean
-    # fuzzy match
-    candidates = get_close_matches(s, list(known), n=1, cutoff=0.75)
-    if candidates:
-        return candidates[0]
-    candidates = get_close_matches(s_clean, list(known), n=1, cutoff=0.75)
-    return candidates[0] if candidates else None
+    return get_normalizer(known).normalize(item)
 
 
 def normalize_list(items: list[str], known: set[str]) -> list[str]:
-    normalized: list[str] = []
-    seen = set()
-    for it in items or []:
-        norm = _normalize_item(it, known)
-        if norm and norm not in seen:
-            normalized.append(norm)
-            seen.add(norm)
-    return normalized
+    return get_normalizer(known).normalize_list(items)
@@ -0,0 +1,325 @@
+"""Local stand-in for the UIUC chat API, for offline benchmarking.
+
+Serves the same endpoint as chat.illinois.edu with schema-valid, rule-based
+replies: the JSON schema that `IllinoisChatLLM.with_structured_output`
+appends to the prompt decides the shape of each reply. Latency, errors, 429
+bursts, a capacity limit and slow response bodies can be injected, so
+throughput, concurrency and retry behaviour can be measured reproducibly
+without network access or quota.
+
+Usage:
+    python fake_chat_server.py --latency lognormal:-0.5,0.4 --throttle-rate 0.05
+    UIUC_CHAT_BASE_URL=http://127.0.0.1:8001/api/chat-api/chat python pipeline_test.py
+
+GET /stats returns request counters; POST /stats/reset clears them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CHAT_PATH = "/api/chat-api/chat"
+
+# keyword -> (space, subspace); first match wins, checked in order
+CLASSIFICATION_RULES: list[tuple[tuple[str, ...], tuple[str, str]]] = [
+    (("interview", "survey", "client", "stakeholder", "user"), ("understand", "empathize")),
+    (("observ", "site visit", "shadow"), ("understand", "observe")),
+    (("research", "literature", "review", "background"), ("understand", "explore")),
+    (("debrief",), ("synthesize", "debrief")),
+    (("organiz", "affinity", "cluster", "sort"), ("synthesize", "organize")),
+    (("requirement", "problem statement", "specification", "criteria"), ("synthesize", "define")),
+    (("brainstorm", "idea", "sketch"), ("ideate", "brainstorm")),
+    (("select", "decision matrix", "rank", "down-select", "narrow"), ("ideate", "narrow concepts")),
+    (("present", "pitch", "propos"), ("ideate", "propose")),
+    (("plan", "schedule", "timeline", "gantt"), ("ideate", "plan")),
+    (("test", "measur", "experiment", "validat", "simulat"), ("prototype", "evaluate")),
+    (("revis", "redesign", "iterat", "refin", "modif"), ("prototype", "iterate")),
+    (("build", "cad", "model", "fabricat", "print", "assembl", "prototype"), ("prototype", "create")),
+    (("train", "manual", "documentation", "onboard"), ("implement", "support")),
+    (("deploy", "manufactur", "deliver", "install"), ("implement", "execute")),
+]
+DEFAULT_LABEL = ("prototype", "iterate")
+
+# activity table returned for extraction prompts without a markdown table
+CANNED_TABLE = [
+    {"activity": "Interviewed the client about requirements", "HCD_Spaces": ["understand"], "HCD_Subspaces": ["empathize"]},
+    {"activity": "Brainstormed hinge concepts", "HCD_Spaces": ["ideate"], "HCD_Subspaces": ["brainstorm"]},
+    {"activity": "Built a CAD model of the bracket", "HCD_Spaces": ["prototype"], "HCD_Subspaces": ["create"]},
+    {"activity": "Tested the bracket under load", "HCD_Spaces": ["prototype"], "HCD_Subspaces": ["evaluate", "iterate"]},
+    {"activity": "Planned next week's experiments", "HCD_Spaces": ["ideate"], "HCD_Subspaces": ["plan"]},
+]
+
+_SCHEMA_MARKER = "```\n"
+_NUMBERED_ROW = re.compile(r"^\[(\d+)\]\s*(.*)$", re.MULTILINE)
+
+
+def classify(text: str) -> tuple[str, str]:
+    """Rule-based (space, subspace) for an activity description."""
+    lowered = text.lower()
+    for keywords, label in CLASSIFICATION_RULES:
+        if any(keyword in lowered for keyword in keywords):
+            return label
+    return DEFAULT_LABEL
+
+
+def _schema_from_prompt(prompt: str) -> Optional[dict]:
+    """Find the JSON schema appended by the structured-output format instructions."""
+    start = prompt.rfind(_SCHEMA_MARKER)
+    if start == -1:
+        return None
+    end = prompt.find("\n```", start + len(_SCHEMA_MARKER))
+    try:
+        return json.loads(prompt[start + len(_SCHEMA_MARKER) : end if end != -1 else None])
+    except json.JSONDecodeError:
+        return None
+
+
+def _line_value(prompt: str, label: str) -> list[str]:
+    match = re.search(rf"^{re.escape(label)}:\s*(.*)$", prompt, re.MULTILINE)
+    if not match:
+        return []
+    return [x.strip() for x in match.group(1).split(",") if x.strip()]
+
+
+def _activity(prompt: str) -> str:
+    # the instructions follow the activity text; drop them
+    body = prompt.split("\n\nCRITICAL:", 1)[0]
+    labelled = re.search(r"^Activity:\s*(.*)$", body, re.MULTILINE)
+    return labelled.group(1) if labelled else body.rsplit("\n\n", 1)[-1]
+
+
+def _table_rows(prompt: str) -> list[dict]:
+    """Rows of the first markdown table in the prompt, read as activity/space/subspace."""
+    rows = []
+    for line in prompt.splitlines():
+        cells = [c.strip() for c in line.strip().strip("|").split("|")]
+        if len(cells) < 3 or not line.strip().startswith("|"):
+            continue
+        if set("".join(cells)) <= set("-: ") or cells[0].lower().startswith("activit"):
+            continue
+        rows.append(
+            {
+                "activity": cells[0],
+                "HCD_Spaces": [x.strip() for x in cells[1].split(",") if x.strip()],
+                "HCD_Subspaces": [x.strip() for x in cells[2].split(",") if x.strip()],
+            }
+        )
+    return rows
+
+
+def _placeholder(schema: dict, defs: dict) -> Any:
+    """A minimal instance of a JSON schema, for shapes without a dedicated rule."""
+    if "$ref" in schema:
+        return _placeholder(defs.get(schema["$ref"].rsplit("/", 1)[-1], {}), defs)
+    if "anyOf" in schema:
+        return _placeholder(schema["anyOf"][0], defs)
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        return {
+            name: _placeholder(prop, defs)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    return {"array": [], "string": "", "integer": 0, "number": 0.0, "boolean": False}.get(
+        kind
+    )
+
+
+def build_reply(prompt: str) -> str:
+    """Return a reply that validates against the schema requested in `prompt`."""
+    schema = _schema_from_prompt(prompt)
+    if schema is None:
+        return "OK"
+    properties = set(schema.get("properties", {}))
+
+    if {"HCD_Spaces", "HCD_Subspaces", "result"} <= properties:
+        space, subspace = classify(_activity(prompt))
+        student = _line_value(prompt, "Student HCD Subspaces")
+        reply = {
+            "HCD_Spaces": [space],
+            "HCD_Subspaces": [subspace],
+            "result": [1 if s.lower() == subspace else -1 for s in student],
+            "Reason": f"The activity is mainly {subspace} work.",
+        }
+    elif {"result", "Reason"} <= properties:
+        student = _line_value(prompt, "Student HCD Subspaces")
+        model = {s.lower() for s in _line_value(prompt, "LLM HCD Subspaces")}
+        reply = {
+            "result": [1 if s.lower() in model else 0 for s in student],
+            "Reason": "Compared the student's subspaces with the model classification.",
+        }
+    elif "labels" in properties:
+        reply = {
+            "labels": [
+                {
+                    "index": int(index),
+                    "HCD_Spaces": [classify(text)[0]],
+                    "HCD_Subspaces": [classify(text)[1]],
+                }
+                for index, text in _NUMBERED_ROW.findall(prompt)
+            ]
+        }
+    elif {"HCD_Spaces", "HCD_Subspaces"} <= properties:
+        activity = _activity(prompt)
+        space, subspace = classify(activity)
+        reply = {"HCD_Spaces": [space], "HCD_Subspaces": [subspace]}
+        if "activity" in properties:
+            reply["activity"] = activity
+    elif "tables" in properties:
+        # PDF text rarely keeps the table's pipes; fall back to a fixed report
+        reply = {"tables": _table_rows(prompt) or CANNED_TABLE}
+    else:
+        reply = _placeholder(schema, schema.get("$defs", {}))
+    return json.dumps(reply)
+
+
+@dataclass
+class FaultProfile:
+    """Latency and failure behaviour of the fake upstream."""
+
+    latency: str = "fixed:0.2"
+    token_latency: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    burst_every: float = 0.0
+    burst_duration: float = 0.0
+    retry_after: float = 1.0
+    max_concurrency: int = 0
+    slow_body: float = 0.0
+    seed: Optional[int] = None
+    rng: random.Random = field(default_factory=random.Random)
+
+    def __post_init__(self) -> None:
+        self.rng.seed(self.seed)
+        kind, _, params = self.latency.partition(":")
+        values = [float(x) for x in params.split(",") if x]
+        samplers = {
+            "fixed": lambda: values[0],
+            "uniform": lambda: self.rng.uniform(values[0], values[1]),
+            "exponential": lambda: self.rng.expovariate(1 / values[0]),
+            "lognormal": lambda: self.rng.lognormvariate(values[0], values[1]),
+        }
+        if kind not in samplers:
+            raise ValueError(f"Unknown latency distribution: {self.latency}")
+        self.sample_latency = samplers[kind]
+        self.started = time.monotonic()
+
+    def in_burst(self) -> bool:
+        if self.burst_every <= 0:
+            return False
+        return (time.monotonic() - self.started) % self.burst_every < self.burst_duration
+
+
+def create_app(profile: FaultProfile) -> FastAPI:
+    """Build the fake chat app for a fault profile."""
+    app = FastAPI(title="Fake UIUC chat API")
+    stats = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "in_flight": 0, "peak_in_flight": 0}
+    capacity = asyncio.Semaphore(profile.max_concurrency) if profile.max_concurrency else None
+
+    def _throttled() -> JSONResponse:
+        stats["throttled"] += 1
+        return JSONResponse(
+            {"error": "Too many requests"},
+            status_code=429,
+            headers={"Retry-After": str(profile.retry_after)},
+        )
+
+    async def _respond(body: dict) -> Any:
+        prompt = str(body.get("messages", [{}])[-1].get("content", ""))
+        reply = build_reply(prompt)
+        # time to first byte plus generation time proportional to the reply length
+        await asyncio.sleep(
+            max(0.0, profile.sample_latency()) + profile.token_latency * len(reply) / 4
+        )
+        if profile.rng.random() < profile.error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": "Internal server error"}, status_code=500)
+        stats["ok"] += 1
+        if profile.slow_body <= 0:
+            return JSONResponse({"message": reply})
+        payload = json.dumps({"message": reply}).encode("utf-8")
+
+        async def trickle():
+            for i in range(0, len(payload), 64):
+                yield payload[i : i + 64]
+                await asyncio.sleep(profile.slow_body)
+
+        return StreamingResponse(trickle(), media_type="application/json")
+
+    @app.post(CHAT_PATH)
+    async def chat(request: Request):
+        stats["requests"] += 1
+        if profile.in_burst() or profile.rng.random() < profile.throttle_rate:
+            return _throttled()
+        body = await request.json()
+        stats["in_flight"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+        try:
+            if capacity is None:
+                return await _respond(body)
+            async with capacity:
+                return await _respond(body)
+        finally:
+            stats["in_flight"] -= 1
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        for key in stats:
+            stats[key] = 0
+        return stats
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument(
+        "--latency",
+        default="fixed:0.2",
+        help="fixed:S | uniform:LO,HI | exponential:MEAN | lognormal:MU,SIGMA (seconds)",
+    )
+    parser.add_argument("--token-latency", type=float, default=0.0, help="extra seconds per reply token (~4 chars)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="start a 429 burst every N seconds")
+    parser.add_argument("--burst-duration", type=float, default=0.0, help="length of each 429 burst in seconds")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After sent with 429s")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="requests served at once; 0 = unlimited")
+    parser.add_argument("--slow-body", type=float, default=0.0, help="seconds between 64-byte body chunks")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    profile = FaultProfile(
+        latency=args.latency,
+        token_latency=args.token_latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        burst_every=args.burst_every,
+        burst_duration=args.burst_duration,
+        retry_after=args.retry_after,
+        max_concurrency=args.max_concurrency,
+        slow_body=args.slow_body,
+        seed=args.seed,
+    )
+    print(f"Fake chat API on http://{args.host}:{args.port}{CHAT_PATH}")
+    uvicorn.run(create_app(profile), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,37 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import io
+import json
 import os
 import tempfile
+import uuid
+import zipfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from typing import AsyncIterator
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+import httpx
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 
+from core.batch import BatchClassifier
+from core.cassette import LLM_CASSETTE
 from core.data_table import LLM_HCD_Label, List_Output_Label, List_Student_HCD_Label
+from core.fused_processing import FusedProcessing
+from core.governor import LLM_GOVERNOR, llm_flow
+from core.hedging import hedging_snapshot
+from core.jobs import Job, JobRunner, JobStore
+from core.parsing_pool import ParsingPool, ParsingPoolBusy
+from core.pipeline import ClassificationPipeline, PipelineMode
 from core.postprocessing import FinalProcessing
 from core.preprocessing import PreProcessor
 from core.processing import Processing
+from core.transport import aclose_async_client, get_async_client
 from database.db import (
     fetch_unlabeld_activity,
     label_activity,
@@ -22,6 +42,26 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# uploads larger than this are spooled to a temp file instead of kept in memory
+UPLOAD_SPOOL_THRESHOLD_BYTES = int(
+    os.getenv("UPLOAD_SPOOL_THRESHOLD_BYTES", str(32 * 1024 * 1024))
+)
+
+# jobs keep the PDF in SQLite, so a job upload is held in memory once; this caps it
+JOB_MAX_UPLOAD_BYTES = int(os.getenv("JOB_MAX_UPLOAD_BYTES", str(UPLOAD_SPOOL_THRESHOLD_BYTES)))
+
+# limits for /classify-batch, counted after zip archives are expanded
+MAX_BATCH_REPORTS = int(os.getenv("CLASSIFY_BATCH_MAX_REPORTS", "200"))
+MAX_BATCH_UNZIPPED_BYTES = int(
+    os.getenv("CLASSIFY_BATCH_MAX_UNZIPPED_BYTES", str(512 * 1024 * 1024))
+)
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+DEFAULT_PIPELINE_MODE: PipelineMode = (
+    "fused" if os.getenv("HCD_PIPELINE_MODE", "standard") == "fused" else "standard"
+)
+
 
 class ClassificationResponse(BaseModel):
     student_labels: List_Student_HCD_Label
@@ -29,6 +69,40 @@ class ClassificationResponse(BaseModel):
     final_labels: List_Output_Label
 
 
+class BatchReportResult(BaseModel):
+    filename: str
+    student_labels: List_Student_HCD_Label | None = None
+    llm_labels: list[LLM_HCD_Label] = []
+    final_labels: List_Output_Label | None = None
+    error: str | None = None
+
+
+class BatchStatsResponse(BaseModel):
+    reports: int
+    failed_reports: int
+    activities: int
+    unique_activities: int
+    unique_evaluations: int
+
+
+class BatchClassificationResponse(BaseModel):
+    reports: list[BatchReportResult]
+    stats: BatchStatsResponse
+
+
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    mode: str
+    filename: str
+    attempts: int
+    created_at: float
+    updated_at: float
+    events: int
+    error: str | None = None
+    result: ClassificationResponse | None = None
+
+
 class RootResponse(BaseModel):
     message: str
     endpoints: dict[str, str]
@@ -80,11 +154,30 @@ class LabelStatsResponse(BaseModel):
     unlabeled: int
 
 
-app = FastAPI(title="SIIP HCD Classifier API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared LLM connection pool and warm the PDF parsing workers with the
+    # app; close both on shutdown.
+    get_async_client()
+    await parsing_pool.start()
+    await job_runner.start()
+    try:
+        yield
+    finally:
+        await job_runner.stop()
+        parsing_pool.shutdown()
+        await aclose_async_client()
+
 
-preprocessor = PreProcessor()
+app = FastAPI(title="SIIP HCD Classifier API", version="0.1.0", lifespan=lifespan)
+
+parsing_pool = ParsingPool()
+preprocessor = PreProcessor(parsing_pool=parsing_pool)
 processor = Processing()
 final_processor = FinalProcessing()
+fused_processor = FusedProcessing()
+pipeline = ClassificationPipeline(processor, final_processor, fused_processor)
+batch_classifier = BatchClassifier(processor, final_processor, fused_processor)
 
 
 def _validate_upload(file: UploadFile) -> None:
@@ -104,19 +197,115 @@ def _validate_upload(file: UploadFile) -> None:
         raise HTTPException(status_code=400, detail="Uploaded file must be a PDF.")
 
 
-async def _persist_upload(file: UploadFile) -> Path:
-    contents = await file.read()
-    if not contents:
+@dataclass
+class UploadedPDF:
+    """An uploaded PDF held in memory, or spooled to disk when it is large.
+
+    Attributes:
+        data: The PDF bytes, when the upload fit under the spool threshold.
+        path: Temp file holding the PDF, when it did not.
+        sha256: Hex digest of the content, computed while reading.
+        size: Upload size in bytes.
+    """
+
+    data: bytes | None
+    path: Path | None
+    sha256: str
+    size: int
+
+    @property
+    def source(self) -> bytes | str:
+        return self.data if self.data is not None else self.path.as_posix()
+
+    def cleanup(self) -> None:
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+async def _read_upload(file: UploadFile, max_bytes: int | None = None) -> UploadedPDF:
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    spool = None
+    size = 0
+
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            digest.update(chunk)
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                if spool is not None:
+                    spool.close()
+                    os.remove(spool.name)
+                    spool = None
+                raise HTTPException(
+                    status_code=413, detail=f"Uploaded PDF is larger than {max_bytes} bytes."
+                )
+            if spool is None and size > UPLOAD_SPOOL_THRESHOLD_BYTES:
+                suffix = Path(file.filename or "uploaded.pdf").suffix or ".pdf"
+                spool = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+                spool.write(buffer)
+                buffer = bytearray()
+            if spool is not None:
+                spool.write(chunk)
+            else:
+                buffer.extend(chunk)
+    finally:
+        if spool is not None:
+            spool.close()
+        await file.close()
+
+    if size == 0:
         raise HTTPException(status_code=400, detail="Uploaded PDF is empty.")
 
-    suffix = Path(file.filename or "uploaded.pdf").suffix or ".pdf"
+    return UploadedPDF(
+        data=bytes(buffer) if spool is None else None,
+        path=Path(spool.name) if spool is not None else None,
+        sha256=digest.hexdigest(),
+        size=size,
+    )
+
+
+def _is_zip(file: UploadFile) -> bool:
+    return (file.content_type or "").lower() in ZIP_CONTENT_TYPES or (
+        file.filename or ""
+    ).lower().endswith(".zip")
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        path = Path(tmp.name)
-        tmp.write(contents)
 
-    await file.close()
-    return path
+def _too_many_reports() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"A batch may contain at most {MAX_BATCH_REPORTS} reports.",
+    )
+
+
+def _expand_zip(upload: UploadedPDF, max_reports: int) -> list[tuple[str, bytes]]:
+    """Return the (name, content) of every PDF in an uploaded zip archive.
+
+    Limits are checked against the archive's directory, before any member is decompressed.
+    """
+    archive_source = io.BytesIO(upload.data) if upload.data is not None else upload.path
+    try:
+        with zipfile.ZipFile(archive_source) as archive:
+            members = [
+                info
+                for info in archive.infolist()
+                if not info.is_dir()
+                and info.filename.lower().endswith(".pdf")
+                and not info.filename.startswith("__MACOSX/")
+                and not os.path.basename(info.filename).startswith(".")
+            ]
+            if len(members) > max_reports:
+                raise _too_many_reports()
+            if sum(info.file_size for info in members) > MAX_BATCH_UNZIPPED_BYTES:
+                raise HTTPException(
+                    status_code=400, detail="Zip archive is too large once expanded."
+                )
+            return [(info.filename, archive.read(info)) for info in members]
+    except zipfile.BadZipFile as exc:
+        raise HTTPException(status_code=400, detail="Uploaded zip is not valid.") from exc
 
 
 @app.get("/health")
@@ -124,13 +313,32 @@ async def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics() -> dict:
+    """Per-model LLM concurrency limit, rate budget and load, and PDF parsing pool load."""
+    return {
+        "llm": LLM_GOVERNOR.snapshot(),
+        "hedging": hedging_snapshot(),
+        "cassette": LLM_CASSETTE.snapshot() if LLM_CASSETTE is not None else None,
+        "parsing_pool": {
+            "workers": parsing_pool.workers,
+            "pending": parsing_pool.pending,
+            "max_pending": parsing_pool.max_pending,
+        },
+    }
+
+
 @app.get("/", response_model=RootResponse)
 async def root() -> RootResponse:
     return RootResponse(
         message="SIIP HCD Classifier API",
         endpoints={
             "health": "/health",
+            "metrics": "/metrics",
             "classify": "/classify",
+            "classify-stream": "/classify-stream",
+            "classify-batch": "/classify-batch",
+            "jobs": "/jobs",
             "fetch-unlabeled": "/fetch-unlabeled",
             "label-activity": "/label-activity",
             "activity-annotations": "/activity-annotations",
@@ -141,25 +349,28 @@ async def root() -> RootResponse:
 
 
 @app.post("/classify", response_model=ClassificationResponse)
-async def classify_pdf(file: UploadFile = File(...)) -> ClassificationResponse:
+async def classify_pdf(
+    file: UploadFile = File(...),
+    mode: PipelineMode = Query(
+        DEFAULT_PIPELINE_MODE,
+        description="'fused' classifies and evaluates each activity in one LLM call.",
+    ),
+) -> ClassificationResponse:
     _validate_upload(file)
-    temp_path: Path | None = None
+    upload: UploadedPDF | None = None
 
     try:
-        temp_path = await _persist_upload(file)
-        student_labels = await asyncio.to_thread(
-            preprocessor.invoke, temp_path.as_posix()
-        )
-        llm_labels = await processor.aclassify_table(student_labels)
-        final_labels = await final_processor.afinal_eval(student_labels, llm_labels)
+        upload = await _read_upload(file)
+        with llm_flow(f"classify:{uuid.uuid4().hex}"):
+            student_labels = await preprocessor.ainvoke(upload.source)
+            llm_labels, final_labels = await pipeline.arun(student_labels, mode)
+    except ParsingPoolBusy as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
     except (ValueError, RuntimeError) as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     finally:
-        if temp_path is not None:
-            try:
-                os.remove(temp_path)
-            except FileNotFoundError:
-                pass
+        if upload is not None:
+            upload.cleanup()
 
     return ClassificationResponse(
         student_labels=student_labels,
@@ -168,6 +379,295 @@ async def classify_pdf(file: UploadFile = File(...)) -> ClassificationResponse:
     )
 
 
+def _event_payload(event: str, index: int | None = None, data=None, **extra) -> dict:
+    payload: dict = {"event": event}
+    if index is not None:
+        payload["index"] = index
+    if data is not None:
+        payload["data"] = data.model_dump() if isinstance(data, BaseModel) else data
+    payload.update(extra)
+    return payload
+
+
+def _ndjson_event(event: str, index: int | None = None, data=None, **extra) -> str:
+    return json.dumps(_event_payload(event, index, data, **extra), ensure_ascii=False) + "\n"
+
+
+async def _stream_classification(
+    upload: UploadedPDF, mode: PipelineMode
+) -> AsyncIterator[str]:
+    """Run the classification pipeline and yield NDJSON events as rows finish."""
+    try:
+        with llm_flow(f"stream:{uuid.uuid4().hex}"):
+            student_labels = await preprocessor.ainvoke(upload.source)
+            yield _ndjson_event("student_labels", data=student_labels)
+
+            async for event, idx, label in pipeline.aiter_rows(student_labels, mode):
+                yield _ndjson_event(event, idx, label)
+
+        yield _ndjson_event("done", total=len(student_labels.tables))
+    except (ValueError, RuntimeError) as exc:
+        yield _ndjson_event("error", detail=str(exc))
+    except httpx.HTTPError as exc:
+        yield _ndjson_event("error", detail=f"LLM request failed: {exc}")
+    except Exception as exc:
+        # the status line is already sent, so the client only learns of a failure from this event
+        print(f"Warning: classification stream failed: {exc!r}")
+        yield _ndjson_event("error", detail="Internal error while classifying the report.")
+    finally:
+        upload.cleanup()
+
+
+@app.post("/classify-stream")
+async def classify_pdf_stream(
+    file: UploadFile = File(...),
+    mode: PipelineMode = Query(
+        DEFAULT_PIPELINE_MODE,
+        description="'fused' classifies and evaluates each activity in one LLM call.",
+    ),
+) -> StreamingResponse:
+    """
+    Stream classification results as newline-delimited JSON.
+
+    Emits one `student_labels` event once extraction finishes, then an `llm_label`
+    and a `final_label` event per activity (tagged with its row `index`) in
+    completion order, and finally `done` (or `error`).
+    """
+    _validate_upload(file)
+    upload = await _read_upload(file)
+    # the generator's own cleanup never runs if the client leaves before the body starts
+    return StreamingResponse(
+        _stream_classification(upload, mode),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(upload.cleanup),
+    )
+
+
+@app.post("/classify-batch", response_model=BatchClassificationResponse)
+async def classify_batch(
+    files: list[UploadFile] = File(...),
+    mode: PipelineMode = Query(
+        DEFAULT_PIPELINE_MODE,
+        description="'fused' classifies and evaluates each activity in one LLM call.",
+    ),
+) -> BatchClassificationResponse:
+    """
+    Classify many reports in one request.
+
+    Accepts several PDFs and/or zip archives of PDFs. Reports are parsed in
+    parallel, identical activities are classified once across the whole batch,
+    and results are returned per report in upload order. A report that cannot
+    be parsed carries an `error` instead of labels; the rest still complete.
+    """
+    # more uploads than the report limit can be rejected before any of them is read
+    if len(files) > MAX_BATCH_REPORTS:
+        raise _too_many_reports()
+
+    uploads: list[UploadedPDF] = []
+    sources: list[tuple[str, bytes | str]] = []
+
+    try:
+        for file in files:
+            if _is_zip(file):
+                upload = await _read_upload(file)
+                uploads.append(upload)
+                # decompressing can take seconds, so keep it off the event loop
+                sources.extend(
+                    await asyncio.to_thread(
+                        _expand_zip, upload, MAX_BATCH_REPORTS - len(sources)
+                    )
+                )
+            else:
+                _validate_upload(file)
+                upload = await _read_upload(file)
+                uploads.append(upload)
+                sources.append((file.filename, upload.source))
+
+        if not sources:
+            raise HTTPException(status_code=400, detail="No PDF reports found in upload.")
+        if len(sources) > MAX_BATCH_REPORTS:
+            raise _too_many_reports()
+
+        # keep one batch from claiming every parsing slot at once
+        parse_slots = asyncio.Semaphore(parsing_pool.workers)
+
+        async def parse(source: bytes | str) -> List_Student_HCD_Label:
+            async with parse_slots:
+                return await preprocessor.ainvoke(source)
+
+        # the whole batch is one flow, so it shares LLM capacity fairly with other requests
+        batch_flow = f"batch:{uuid.uuid4().hex}"
+        with llm_flow(batch_flow):
+            parsed = await asyncio.gather(
+                *(parse(source) for _, source in sources), return_exceptions=True
+            )
+    finally:
+        for upload in uploads:
+            upload.cleanup()
+
+    reports: list[BatchReportResult] = []
+    tables: list[tuple[str, List_Student_HCD_Label]] = []
+    for (filename, _), outcome in zip(sources, parsed):
+        if isinstance(outcome, ParsingPoolBusy):
+            raise HTTPException(status_code=503, detail=str(outcome)) from outcome
+        if isinstance(outcome, Exception):
+            if not isinstance(outcome, (ValueError, RuntimeError)):
+                print(f"Warning: failed to parse {filename}: {outcome!r}")
+            reports.append(BatchReportResult(filename=filename, error=str(outcome)))
+        elif isinstance(outcome, BaseException):
+            # cancellation (and interpreter exit) must not be recorded as a report error
+            raise outcome
+        else:
+            reports.append(BatchReportResult(filename=filename))
+            tables.append((str(len(reports) - 1), outcome))
+
+    try:
+        with llm_flow(batch_flow):
+            results, stats = await batch_classifier.aclassify_reports(tables, mode)
+    except (ValueError, RuntimeError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    for result in results:
+        report = reports[int(result.name)]
+        report.student_labels = result.student_labels
+        report.llm_labels = result.llm_labels
+        report.final_labels = result.final_labels
+
+    return BatchClassificationResponse(
+        reports=reports,
+        stats=BatchStatsResponse(
+            reports=len(reports),
+            failed_reports=len(reports) - stats.reports,
+            activities=stats.activities,
+            unique_activities=stats.unique_activities,
+            unique_evaluations=stats.unique_evaluations,
+        ),
+    )
+
+
+async def _run_classification_job(job: Job, data: bytes, emit) -> dict:
+    """Job handler: the `/classify-stream` pipeline, recording each event on the job."""
+    with llm_flow(f"job:{job.id}"):
+        return await _classify_job(job, data, emit)
+
+
+async def _classify_job(job: Job, data: bytes, emit) -> dict:
+    student_labels = await preprocessor.ainvoke(data)
+    await emit(_event_payload("student_labels", data=student_labels))
+
+    rows = len(student_labels.tables)
+    llm_labels: list[LLM_HCD_Label | None] = [None] * rows
+    final_labels: list = [None] * rows
+    async for event, idx, label in pipeline.aiter_rows(student_labels, job.mode):
+        await emit(_event_payload(event, idx, label))
+        if event == "llm_label":
+            llm_labels[idx] = label
+        else:
+            final_labels[idx] = label
+
+    await emit(_event_payload("done", total=rows))
+    return ClassificationResponse(
+        student_labels=student_labels,
+        llm_labels=llm_labels,
+        final_labels=List_Output_Label(labels=final_labels),
+    ).model_dump()
+
+
+job_store = JobStore()
+job_runner = JobRunner(job_store, _run_classification_job)
+
+
+async def _job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        id=job.id,
+        status=job.status,
+        mode=job.mode,
+        filename=job.filename,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        events=await asyncio.to_thread(job_store.count_events, job.id),
+        error=job.error,
+        result=job.result,
+    )
+
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    mode: PipelineMode = Query(
+        DEFAULT_PIPELINE_MODE,
+        description="'fused' classifies and evaluates each activity in one LLM call.",
+    ),
+) -> JobResponse:
+    """
+    Queue a PDF for background classification and return the job immediately.
+
+    Submitting the same PDF (by content hash) with the same mode returns the
+    existing job; a failed job is queued again. PDFs larger than
+    `JOB_MAX_UPLOAD_BYTES` are rejected with 413.
+    """
+    _validate_upload(file)
+    upload = await _read_upload(file, max_bytes=JOB_MAX_UPLOAD_BYTES)
+    try:
+        # only a limit configured above the spool threshold leaves the PDF on disk
+        data = (
+            upload.data
+            if upload.data is not None
+            else await asyncio.to_thread(upload.path.read_bytes)
+        )
+    finally:
+        upload.cleanup()
+
+    job, queued = await asyncio.to_thread(
+        job_store.submit, data, upload.sha256, file.filename, mode
+    )
+    if queued:
+        job_runner.notify()
+    return await _job_response(job)
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str) -> JobResponse:
+    """Return a job's status, and its full result once it has succeeded."""
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return await _job_response(job)
+
+
+async def _follow_job(job_id: str, after: int, follow: bool) -> AsyncIterator[str]:
+    while True:
+        # read the status first so events recorded before a finish are never missed
+        job = await asyncio.to_thread(job_store.get, job_id)
+        for seq, payload in await asyncio.to_thread(job_store.events, job_id, after):
+            after = seq
+            yield json.dumps({"seq": seq, **payload}, ensure_ascii=False) + "\n"
+        if job is None or job.finished or not follow:
+            return
+        await job_runner.wait_for_change(timeout=15)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(
+    job_id: str,
+    after: int = Query(0, ge=0, description="Only return events with a larger `seq`."),
+    follow: bool = Query(True, description="Keep streaming until the job finishes."),
+) -> StreamingResponse:
+    """
+    Stream a job's partial results as newline-delimited JSON.
+
+    Events have the same shape as `/classify-stream` plus a `seq` number; pass
+    the last `seq` seen as `after` to resume. Transient failures that are
+    retried appear as `retry` events.
+    """
+    if await asyncio.to_thread(job_store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return StreamingResponse(
+        _follow_job(job_id, after, follow), media_type="application/x-ndjson"
+    )
+
+
 @app.get("/fetch-unlabeled", response_model=UnlabeledActivityResponse)
 async def fetch_unlabeled() -> UnlabeledActivityResponse:
     """Fetch one unlabeled activity from the database."""
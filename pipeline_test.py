@@ -1,13 +1,24 @@
+import argparse
 import asyncio
+import csv
+import json
 import os
+import statistics
 import sys
 import time
+from contextlib import contextmanager
+from typing import Iterator
 
 from dotenv import load_dotenv
 
+from core.concurrency import AdaptiveLimiter
 from core.data_table import Student_HCD_Label, List_Student_HCD_Label
+from core.governor import LLM_GOVERNOR
+from core.local_classifier import cross_validate
+from core.model_config import DEFAULT_MODEL
 from core.processing import Processing
 from core.processing_few_shot import ProcessingFewShot
+from core.transport import ATTEMPT_LISTENERS, AttemptRecord
 from database.db import client, DATABASE_ID
 
 load_dotenv()
@@ -32,6 +43,19 @@ async def fetch_labeled_activities(limit: int = 30) -> list[dict]:
     return []
 
 
+def load_csv_rows(path: str, limit: int) -> list[dict]:
+    """Read labelled rows from a CSV export of the labels table, skipping unknown labels."""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [
+            row
+            for row in csv.DictReader(f)
+            if row.get("HCD_Space")
+            and row["HCD_Space"].lower() != "unknown"
+            and row.get("HCD_Subspace", "").lower() != "unknown"
+        ]
+    return rows[:limit]
+
+
 def parse_split(val: str) -> list[str]:
     if not val:
         return []
@@ -82,32 +106,273 @@ def calculate_latency_stats(latencies: list[float]) -> dict:
     }
 
 
-async def main():
-    print("Fetching labeled activities from D1...")
-    rows = await fetch_labeled_activities(limit=100)
+def cascade_report(
+    rows: list[dict],
+    llm_labels: list,
+    thresholds: tuple[float, ...] = (0.5, 0.6, 0.7, 0.8, 0.9),
+) -> list[str]:
+    """Report how a local-classifier cascade would trade LLM calls for accuracy on `rows`.
 
-    if not rows:
-        print("No labeled activities found!")
-        return
+    Local predictions come from 5-fold cross-validation on the same rows, so no row is
+    predicted by a model that saw its label. Rows below the threshold keep the LLM's labels.
+    """
+    local = cross_validate(rows)
+    true_spaces = [set(parse_split(row.get("HCD_Space", ""))) for row in rows]
+    true_subspaces = [set(parse_split(row.get("HCD_Subspace", ""))) for row in rows]
+
+    lines = ["\n--- Local Classifier Cascade (5-fold cross-validation) ---"]
+    for threshold in thresholds:
+        pred_spaces, pred_subspaces, covered = [], [], 0
+        local_space_hits = local_subspace_hits = 0
+        for i, (_, prediction) in enumerate(local):
+            if prediction is not None and prediction.confidence >= threshold:
+                covered += 1
+                pred_spaces.append({prediction.space})
+                pred_subspaces.append({prediction.subspace})
+                local_space_hits += prediction.space in {x.lower() for x in true_spaces[i]}
+                local_subspace_hits += prediction.subspace in {
+                    x.lower() for x in true_subspaces[i]
+                }
+            else:
+                pred_spaces.append(set(llm_labels[i].HCD_Spaces))
+                pred_subspaces.append(set(llm_labels[i].HCD_Subspaces))
+        sp_f1 = calculate_metrics(true_spaces, pred_spaces)[2]
+        ssp_f1 = calculate_metrics(true_subspaces, pred_subspaces)[2]
+        coverage = covered / len(rows) if rows else 0.0
+        lines.append(
+            f"Threshold {threshold:.2f}: coverage {coverage:.1%} ({covered}/{len(rows)} rows without an LLM call)"
+        )
+        if covered:
+            lines.append(
+                f"  Local accuracy:  spaces {local_space_hits / covered:.4f}, "
+                f"subspaces {local_subspace_hits / covered:.4f}"
+            )
+        lines.append(f"  Cascade F1:      spaces {sp_f1:.4f}, subspaces {ssp_f1:.4f}")
+    return lines
 
-    print(f"Fetched {len(rows)} labeled activities.")
 
+def rows_to_table(rows: list[dict]) -> List_Student_HCD_Label:
     student_labels = []
     for row in rows:
-        activity_text = row.get("Activity", "")
-        spaces = parse_split(row.get("HCD_Space", ""))
-        subspaces = parse_split(row.get("HCD_Subspace", ""))
-
         student_labels.append(
             Student_HCD_Label(
-                activity=activity_text, HCD_Spaces=spaces, HCD_Subspaces=subspaces
+                activity=row.get("Activity", ""),
+                HCD_Spaces=parse_split(row.get("HCD_Space", "")),
+                HCD_Subspaces=parse_split(row.get("HCD_Subspace", "")),
             )
         )
+    return List_Student_HCD_Label(tables=student_labels)
+
+
+@contextmanager
+def governor_limit(model: str, concurrency: int | None) -> Iterator[None]:
+    """Run the block under a fresh governor limiter for `model`, restoring the old one after.
+
+    `concurrency` fixes the limit; None gives a fresh adaptive limiter.
+    """
+    budget = LLM_GOVERNOR.budget(model)
+    previous = budget.limiter
+    budget.limiter = (
+        AdaptiveLimiter()
+        if concurrency is None
+        else AdaptiveLimiter(
+            initial_limit=concurrency, min_limit=concurrency, max_limit=concurrency
+        )
+    )
+    try:
+        yield
+    finally:
+        budget.limiter = previous
+
+
+async def run_benchmark_once(
+    table: List_Student_HCD_Label, concurrency: int | None, batch_size: int
+) -> dict:
+    """Classify `table` once with Processing and measure it from the transport's attempt records.
+
+    `concurrency` fixes the governor's per-model limit for the run; None keeps it adaptive.
+    """
+    # cached replies would make every repeat after the first free
+    model = DEFAULT_MODEL.model_copy(update={"cache": False})
+    processor = Processing(batch_size=batch_size, cascade_threshold=None, model=model)
+    # every repeat must reach the model
+    processor.memo = None
+
+    records: list[AttemptRecord] = []
+    ATTEMPT_LISTENERS.append(records.append)
+    failed = False
+    start = time.perf_counter()
+    try:
+        with governor_limit(model.model, concurrency):
+            await processor.aclassify_table(table)
+    except Exception as exc:
+        print(f"  run failed: {exc}")
+        failed = True
+    finally:
+        elapsed = time.perf_counter() - start
+        ATTEMPT_LISTENERS.remove(records.append)
+
+    ok = [r for r in records if r.error is None and r.status_code and r.status_code < 400]
+    return {
+        "elapsed": elapsed,
+        "throughput": len(table.tables) / elapsed if elapsed > 0 and not failed else 0.0,
+        "latencies": [r.latency for r in ok],
+        "calls": len(ok),
+        "errors": len(records) - len(ok),
+        "retries": sum(1 for r in records if r.attempt > 0),
+        "request_bytes": sum(r.request_bytes for r in records),
+        "response_bytes": sum(r.response_bytes for r in records),
+        "failed": failed,
+    }
 
-    student_data = List_Student_HCD_Label(tables=student_labels)
+
+def summarize_runs(
+    runs: list[dict], concurrency: int | None, batch_size: int, activities: int
+) -> dict:
+    latencies = [latency for run in runs for latency in run["latencies"]]
+    throughputs = [run["throughput"] for run in runs]
+    request_bytes = sum(run["request_bytes"] for run in runs)
+    response_bytes = sum(run["response_bytes"] for run in runs)
+    processed = activities * len(runs)
+    return {
+        "concurrency": "auto" if concurrency is None else concurrency,
+        "batch_size": batch_size,
+        "repeats": len(runs),
+        "failed_runs": sum(run["failed"] for run in runs),
+        "throughput": {
+            "median": statistics.median(throughputs),
+            "min": min(throughputs),
+            "max": max(throughputs),
+        },
+        "latency": calculate_latency_stats(latencies),
+        "calls": sum(run["calls"] for run in runs),
+        "errors": sum(run["errors"] for run in runs),
+        "retries": sum(run["retries"] for run in runs),
+        # the chat API reports no usage counts; this is an estimate of 4 request/response bytes per token
+        "estimated_tokens": {
+            "prompt": request_bytes // 4,
+            "completion": response_bytes // 4,
+            "per_activity": (request_bytes + response_bytes) / 4 / processed if processed else 0.0,
+        },
+    }
+
+
+def compare_to_baseline(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """List configurations that got slower, less reliable or costlier than the baseline."""
+    previous = {
+        (str(config["concurrency"]), config["batch_size"]): config
+        for config in baseline.get("configs", [])
+    }
+    regressions = []
+    for config in results:
+        name = f"concurrency={config['concurrency']} batch_size={config['batch_size']}"
+        before = previous.get((str(config["concurrency"]), config["batch_size"]))
+        if before is None:
+            continue
+        if config["throughput"]["median"] < before["throughput"]["median"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {config['throughput']['median']:.2f}/s "
+                f"vs baseline {before['throughput']['median']:.2f}/s"
+            )
+        p90, base_p90 = config["latency"].get("p90"), before["latency"].get("p90")
+        if p90 is not None and base_p90 is not None and p90 > base_p90 * (1 + tolerance):
+            regressions.append(f"{name}: p90 latency {p90:.2f}s vs baseline {base_p90:.2f}s")
+        if config["errors"] + config["failed_runs"] > before["errors"] + before["failed_runs"]:
+            regressions.append(
+                f"{name}: {config['errors']} errors / {config['failed_runs']} failed runs "
+                f"vs baseline {before['errors']} / {before['failed_runs']}"
+            )
+        tokens = config["estimated_tokens"]["per_activity"]
+        base_tokens = before["estimated_tokens"]["per_activity"]
+        if base_tokens and tokens > base_tokens * (1 + tolerance):
+            regressions.append(
+                f"{name}: ~{tokens:.0f} estimated tokens/activity (bytes/4) "
+                f"vs baseline ~{base_tokens:.0f}"
+            )
+    return regressions
+
+
+async def benchmark(rows: list[dict], args: argparse.Namespace) -> int:
+    """Sweep concurrency limits and batch sizes, write JSON results and check the baseline.
+
+    Returns:
+        int: Process exit code; 1 if any configuration regressed against the baseline.
+    """
+    table = rows_to_table(rows)
+    levels = [
+        None if level.strip() == "auto" else int(level)
+        for level in args.concurrency.split(",")
+    ]
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    results = []
+    for batch_size in batch_sizes:
+        for level in levels:
+            runs = []
+            for repeat in range(args.repeats):
+                print(
+                    f"concurrency={level or 'auto'} batch_size={batch_size} "
+                    f"run {repeat + 1}/{args.repeats}"
+                )
+                runs.append(await run_benchmark_once(table, level, batch_size))
+            summary = summarize_runs(runs, level, batch_size, len(table.tables))
+            results.append(summary)
+            print(
+                f"  {summary['throughput']['median']:.2f} activities/s, "
+                f"p90 {summary['latency'].get('p90', float('nan')):.2f}s, "
+                f"{summary['errors']} errors, {summary['retries']} retries"
+            )
+
+    healthy = [c for c in results if not c["failed_runs"] and not c["errors"]] or results
+    best = max(healthy, key=lambda c: c["throughput"]["median"])
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "model": DEFAULT_MODEL.model,
+        "base_url": DEFAULT_MODEL.base_url,
+        "activities": len(table.tables),
+        "configs": results,
+        "best": {"concurrency": best["concurrency"], "batch_size": best["batch_size"]},
+        "regressions": [],
+    }
+
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = compare_to_baseline(results, json.load(f), args.tolerance)
+        for line in report["regressions"]:
+            print(f"REGRESSION {line}")
+        if not report["regressions"]:
+            print(f"No regressions against {args.baseline}.")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(
+        f"\nBest: concurrency={best['concurrency']} batch_size={best['batch_size']} "
+        f"({best['throughput']['median']:.2f} activities/s). Results saved to '{args.output}'."
+    )
+    return 1 if report["regressions"] else 0
+
+
+async def main(args: argparse.Namespace) -> int:
+    if args.csv:
+        print(f"Reading labeled activities from {args.csv}...")
+        rows = load_csv_rows(args.csv, args.limit)
+    else:
+        print("Fetching labeled activities from D1...")
+        rows = await fetch_labeled_activities(limit=args.limit)
+
+    if not rows:
+        print("No labeled activities found!")
+        return 1
+
+    print(f"Fetched {len(rows)} labeled activities.")
+
+    if args.benchmark:
+        return await benchmark(rows, args)
+
+    student_data = rows_to_table(rows)
 
     print("\n--- Running AI Classifier (ProcessingFewShot) ---")
-    processor = ProcessingFewShot()
+    processor = ProcessingFewShot(exclude_self=True)
 
     sem = asyncio.Semaphore(4)
     latencies = []
@@ -193,6 +458,8 @@ async def main():
     report_lines.append(f"  Recall:    {ssp_r:.4f}")
     report_lines.append(f"  F1 Score:  {ssp_f1:.4f}")
 
+    report_lines.extend(cascade_report(rows, llm_labels))
+
     if latency_stats:
         report_lines.append("\n--- Latency & Performance ---")
         report_lines.append(f"Total Pipeline Time: {total_time:.2f} seconds")
@@ -212,7 +479,33 @@ async def main():
         f.write(report_text)
 
     print(f"\nFew-Shot Report with {mismatch_count} differences saved to '{filename}'.")
+    return 0
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(
+        description="Evaluate the few-shot classifier on labeled activities, or benchmark throughput."
+    )
+    parser.add_argument("--limit", type=int, default=100, help="labeled activities to use")
+    parser.add_argument("--csv", help="read labeled rows from this CSV export instead of D1")
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="sweep concurrency limits and batch sizes instead of evaluating accuracy",
+    )
+    parser.add_argument(
+        "--concurrency",
+        default="1,2,4,8,16",
+        help="comma-separated per-model LLM concurrency limits; 'auto' keeps the adaptive limit",
+    )
+    parser.add_argument("--batch-sizes", default="1", help="comma-separated activities per LLM call")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per configuration")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--baseline", help="earlier results file to check for regressions")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="relative slowdown or growth that counts as a regression",
+    )
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,60 @@
+import pytest
+
+from core.data_table import List_Student_HCD_Label, Student_HCD_Label
+from core.processing import Processing
+
+
+class FakeModel:
+    """Stands in for a structured-output model bound with `with_structured_output`.
+
+    Records the last message of every prompt and answers with `reply`; a prompt
+    containing one of the keys of `failures` raises that exception instead.
+    """
+
+    def __init__(self, reply=None, failures=None):
+        self.reply = reply
+        self.failures = failures or {}
+        self.prompts = []
+
+    @property
+    def calls(self):
+        return len(self.prompts)
+
+    async def ainvoke(self, messages):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        for text, exc in self.failures.items():
+            if text in prompt:
+                raise exc
+        return self.reply
+
+
+def make_table(*activities, spaces=("ideate",), subspaces=("brainstorm",)):
+    return List_Student_HCD_Label(
+        tables=[
+            Student_HCD_Label(
+                activity=a, HCD_Spaces=list(spaces), HCD_Subspaces=list(subspaces)
+            )
+            for a in activities
+        ]
+    )
+
+
+@pytest.fixture
+def fake_model():
+    """The `FakeModel` class: ``fake_model(reply, {"activity text": exc})``."""
+    return FakeModel
+
+
+@pytest.fixture
+def table():
+    """Builds a student table of `activities`, all labelled ideate/brainstorm by default."""
+    return make_table
+
+
+@pytest.fixture
+def processor():
+    """A `Processing` stage with no activity memo and no local cascade."""
+    processor = Processing(cascade_threshold=None)
+    processor.memo = None
+    return processor
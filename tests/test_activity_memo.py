@@ -0,0 +1,120 @@
+import asyncio
+import threading
+
+import pytest
+
+from core import processing_few_shot
+from core.activity_memo import ActivityMemo
+from core.data_table import (
+    Compact_LLM_HCD_Label,
+    Indexed_LLM_HCD_Label,
+    List_Indexed_LLM_HCD_Label,
+)
+from core.few_shot_index import FewShotExample, FewShotIndex
+from core.processing import Processing
+from core.processing_few_shot import ProcessingFewShot
+
+EXAMPLES = [
+    FewShotExample("Interviewed the client about requirements", "understand", "empathize"),
+    FewShotExample("Brainstormed hinge concepts", "ideate", "brainstorm"),
+]
+
+
+class ThreadRecordingMemo(ActivityMemo):
+    """An ActivityMemo that records which thread each lookup and write ran on."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = []
+
+    def get(self, version, activity):
+        self.threads.append(("get", threading.get_ident()))
+        return super().get(version, activity)
+
+    def put(self, version, label):
+        self.threads.append(("put", threading.get_ident()))
+        super().put(version, label)
+
+
+@pytest.fixture
+def memo(tmp_path):
+    return ThreadRecordingMemo(str(tmp_path / "memo.sqlite3"))
+
+
+def classify_twice(processor, activity):
+    async def run():
+        loop_thread = threading.get_ident()
+        first = await processor.aclassify_activity(activity)
+        second = await processor.aclassify_activity(f"  {activity.upper()} ")
+        return loop_thread, first, second
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("few_shot", [False, True])
+def test_async_memo_io_runs_off_the_event_loop(memo, fake_model, few_shot):
+    if few_shot:
+        processor = ProcessingFewShot(index=FewShotIndex(EXAMPLES))
+    else:
+        processor = Processing(cascade_threshold=None)
+    processor.memo = memo
+    processor.bound_model = model = fake_model(
+        Compact_LLM_HCD_Label(HCD_Spaces=["ideate"], HCD_Subspaces=["brainstorm"])
+    )
+
+    loop_thread, first, second = classify_twice(processor, "Brainstormed bracket ideas")
+
+    assert model.calls == 1
+    assert first.HCD_Subspaces == second.HCD_Subspaces == ["brainstorm"]
+    assert second.activity == "  BRAINSTORMED BRACKET IDEAS "
+    assert [op for op, _ in memo.threads] == ["get", "put", "get"]
+    assert all(thread != loop_thread for _, thread in memo.threads)
+
+
+def test_batched_memo_writes_run_off_the_event_loop(memo, fake_model):
+    batch_model = fake_model(
+        List_Indexed_LLM_HCD_Label(
+            labels=[
+                Indexed_LLM_HCD_Label(index=i, HCD_Spaces=["ideate"], HCD_Subspaces=["plan"])
+                for i in range(2)
+            ]
+        )
+    )
+    processor = Processing(batch_size=2, cascade_threshold=None)
+    processor.memo = memo
+    processor.batch_model = batch_model
+
+    async def run():
+        await processor.aclassify_batch(["Planned the week", "Planned testing"])
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+
+    assert [op for op, _ in memo.threads] == ["put", "put"]
+    assert all(thread != loop_thread for _, thread in memo.threads)
+    assert memo.get(processor.batch_prompt_version, "planned testing").HCD_Subspaces == ["plan"]
+
+
+def test_few_shot_prompt_version_is_hashed_once_per_index_version(monkeypatch):
+    hashes = []
+    original = processing_few_shot.prompt_version
+
+    def counting(*parts):
+        hashes.append(parts)
+        return original(*parts)
+
+    monkeypatch.setattr(processing_few_shot, "prompt_version", counting)
+    index = FewShotIndex(EXAMPLES)
+    processor = ProcessingFewShot(index=index)
+
+    first = processor.prompt_version
+    assert processor.prompt_version == first
+    assert len(hashes) == 1
+
+    index.refresh(EXAMPLES[:1])
+    refreshed = processor.prompt_version
+    assert refreshed != first and len(hashes) == 2
+
+    processor.k = 1
+    assert processor.prompt_version not in {first, refreshed}
+    assert len(hashes) == 3
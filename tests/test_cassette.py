@@ -0,0 +1,186 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import core.langchain_uiucchat_wrapper as wrapper
+from core.cassette import Cassette, CassetteMissError, request_key
+from core.langchain_uiucchat_wrapper import IllinoisChatLLM
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAYLOAD = {
+    "model": "m",
+    "messages": [{"role": "user", "content": "Brainstormed hinges"}],
+    "api_key": "secret",
+    "temperature": 0.1,
+}
+
+
+def test_key_ignores_credentials_and_field_order():
+    reordered = dict(reversed(list(PAYLOAD.items())))
+
+    assert request_key(PAYLOAD) == request_key({**reordered, "api_key": "other"})
+    assert request_key(PAYLOAD) == request_key({k: v for k, v in PAYLOAD.items() if k != "api_key"})
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        {"messages": [{"role": "user", "content": "Sketched a bracket"}]},
+        {"model": "other"},
+        {"temperature": 0.0},
+    ],
+    ids=["messages", "model", "temperature"],
+)
+def test_key_changes_with_anything_that_changes_the_reply(change):
+    assert request_key(PAYLOAD) != request_key({**PAYLOAD, **change})
+
+
+def test_recorded_call_replays_from_a_fresh_cassette(tmp_path):
+    path = str(tmp_path / "nested" / "llm.jsonl")
+    recorder = Cassette(path, mode="record")
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        return {"message": "recorded reply"}
+
+    assert recorder.call(PAYLOAD, upstream) == {"message": "recorded reply"}
+    assert recorder.snapshot()["recorded"] == 1 and len(calls) == 1
+
+    player = Cassette(path, mode="replay", latency="zero")
+    reply = player.call({**PAYLOAD, "api_key": "someone else"}, upstream)
+
+    assert reply == {"message": "recorded reply"} and len(calls) == 1
+    assert (player.hits, player.misses) == (1, 0)
+
+
+def test_async_recording_writes_off_the_event_loop(tmp_path):
+    recorder = Cassette(str(tmp_path / "llm.jsonl"), mode="record")
+    record = recorder._record
+    writers = []
+
+    def record_and_note_thread(*args):
+        writers.append(threading.get_ident())
+        record(*args)
+
+    recorder._record = record_and_note_thread
+
+    async def upstream():
+        return {"message": "recorded reply"}
+
+    async def run():
+        await recorder.acall(PAYLOAD, upstream)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+
+    assert writers and writers[0] != loop_thread
+    assert Cassette(recorder.path, latency="zero").call(PAYLOAD, None) == {
+        "message": "recorded reply"
+    }
+
+
+def test_unrecorded_request_is_a_miss(tmp_path):
+    player = Cassette(str(tmp_path / "llm.jsonl"), mode="replay", latency="zero")
+
+    with pytest.raises(CassetteMissError):
+        player.call(PAYLOAD, lambda: pytest.fail("replay must not call upstream"))
+    assert player.misses == 1
+
+
+def test_latest_recording_of_a_request_wins(tmp_path):
+    path = str(tmp_path / "llm.jsonl")
+    recorder = Cassette(path, mode="record")
+    recorder.call(PAYLOAD, lambda: {"message": "first"})
+    recorder.call(PAYLOAD, lambda: {"message": "second"})
+
+    player = Cassette(path, mode="replay", latency="zero")
+
+    assert len(player) == 1
+    assert player.call(PAYLOAD, lambda: None) == {"message": "second"}
+
+
+def test_async_replay_waits_the_recorded_latency_unless_zero(tmp_path):
+    path = str(tmp_path / "llm.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'{{"key": "{request_key(PAYLOAD)}", "message": "slow", "latency": 0.2}}\n')
+
+    async def timed(cassette):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        reply = await cassette.acall(PAYLOAD, lambda: None)
+        return reply["message"], loop.time() - started
+
+    message, elapsed = asyncio.run(timed(Cassette(path, latency="original")))
+    assert message == "slow" and elapsed >= 0.19
+    message, elapsed = asyncio.run(timed(Cassette(path, latency="zero")))
+    assert message == "slow" and elapsed < 0.1
+
+
+@pytest.mark.parametrize("kwargs", [{"mode": "off"}, {"latency": "fast"}])
+def test_rejects_unknown_settings(tmp_path, kwargs):
+    with pytest.raises(ValueError):
+        Cassette(str(tmp_path / "llm.jsonl"), **kwargs)
+
+
+def test_chat_model_replays_without_the_network(tmp_path, monkeypatch):
+    path = str(tmp_path / "llm.jsonl")
+    monkeypatch.setattr(wrapper, "post_json", lambda *args, **kwargs: {"message": "live"})
+    recorder = IllinoisChatLLM(
+        course_name="matse", api_key="mine", cache=False, cassette=Cassette(path, mode="record")
+    )
+    assert recorder.invoke("Classify this").content == "live"
+
+    def offline(*args, **kwargs):
+        raise AssertionError("replay reached the network")
+
+    monkeypatch.setattr(wrapper, "post_json", offline)
+    player = IllinoisChatLLM(
+        course_name="matse",
+        api_key="yours",
+        cache=False,
+        cassette=Cassette(path, mode="replay", latency="zero"),
+    )
+
+    assert player.invoke("Classify this").content == "live"
+    with pytest.raises(CassetteMissError):
+        player.invoke("Something new")
+
+
+def import_caches(tmp_path, mode):
+    """Import the shared model and memo in a fresh interpreter with `mode` set."""
+    env = {
+        **os.environ,
+        "LLM_CASSETTE_MODE": mode,
+        "LLM_CASSETTE_PATH": str(tmp_path / "llm.jsonl"),
+        "ACTIVITY_MEMO_ENABLED": "true",
+        "ACTIVITY_MEMO_PATH": str(tmp_path / "memo.sqlite"),
+        "LLM_CACHE_ENABLED": "true",
+        "LLM_CACHE_PATH": str(tmp_path / "cache.sqlite"),
+    }
+    script = (
+        "from core.activity_memo import ACTIVITY_MEMO\n"
+        "from core.model_config import DEFAULT_MODEL\n"
+        "from core.processing import Processing\n"
+        "print(ACTIVITY_MEMO is None, Processing(cascade_threshold=None).memo is None,"
+        " DEFAULT_MODEL.cache is None, DEFAULT_MODEL.cassette is None)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout.split()[-4:]
+
+
+@pytest.mark.parametrize("mode", ["record", "replay"])
+def test_active_cassette_bypasses_the_memo_and_response_cache(tmp_path, mode):
+    assert import_caches(tmp_path, mode) == ["True", "True", "True", "False"]
+
+
+def test_memo_and_response_cache_are_used_without_a_cassette(tmp_path):
+    assert import_caches(tmp_path, "off") == ["False", "False", "False", "True"]
@@ -0,0 +1,252 @@
+import io
+import json
+import zipfile
+
+import httpx
+import pytest
+
+pytest.importorskip("fitz")
+
+from fastapi.testclient import TestClient
+
+import main
+from core.batch import BatchClassifier
+from core.data_table import Compact_LLM_HCD_Label, Compact_Output_Label, Fused_HCD_Label
+from core.fused_processing import FusedProcessing
+from core.pipeline import ClassificationPipeline
+from core.postprocessing import CLASSIFICATION_FAILED_REASON, FinalProcessing
+
+
+class StubPreprocessor:
+    """Maps uploaded bytes to a table, or to an exception to raise."""
+
+    def __init__(self, reports):
+        self.reports = reports
+
+    async def ainvoke(self, source):
+        outcome = self.reports[source]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def stages(monkeypatch, processor, fake_model):
+    processor.bound_model = fake_model(
+        Compact_LLM_HCD_Label(HCD_Spaces=["ideate"], HCD_Subspaces=["brainstorm"]),
+        {"Unreachable": httpx.ConnectError("upstream down")},
+    )
+    final = FinalProcessing()
+    final.bound_model = fake_model(Compact_Output_Label(result=[1], Reason="matches"))
+    fused = FusedProcessing()
+    fused.bound_model = fake_model(
+        Fused_HCD_Label(
+            HCD_Spaces=["ideate"], HCD_Subspaces=["brainstorm"], result=[1], Reason="fused"
+        )
+    )
+    monkeypatch.setattr(main, "pipeline", ClassificationPipeline(processor, final, fused))
+    monkeypatch.setattr(main, "batch_classifier", BatchClassifier(processor, final, fused))
+    return processor, final, fused
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def use_reports(monkeypatch, reports):
+    monkeypatch.setattr(main, "preprocessor", StubPreprocessor(reports))
+
+
+def stream(client, data=b"%PDF report", **params):
+    response = client.post(
+        "/classify-stream",
+        files={"file": ("report.pdf", data, "application/pdf")},
+        params=params,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.mark.parametrize("mode", ["standard", "fused"])
+def test_stream_emits_rows_between_student_labels_and_done(client, stages, table, monkeypatch, mode):
+    report = table("Brainstormed hinges", "Sketched a bracket", "Ranked concepts")
+    use_reports(monkeypatch, {b"%PDF report": report})
+
+    events = stream(client, mode=mode)
+
+    assert events[0] == {"event": "student_labels", "data": report.model_dump()}
+    assert events[-1] == {"event": "done", "total": 3}
+    rows = events[1:-1]
+    assert sorted((e["event"], e["index"]) for e in rows) == sorted(
+        (event, index) for event in ("llm_label", "final_label") for index in range(3)
+    )
+    order = [(e["event"], e["index"]) for e in rows]
+    for index in range(3):
+        # a row's verdict never arrives before its classification
+        assert order.index(("llm_label", index)) < order.index(("final_label", index))
+        label = next(e for e in rows if e["index"] == index and e["event"] == "llm_label")
+        assert label["data"]["activity"] == report.tables[index].activity
+    reasons = {e["data"]["Reason"] for e in rows if e["event"] == "final_label"}
+    assert reasons == {"fused" if mode == "fused" else "matches"}
+
+
+def test_stream_keeps_going_when_one_row_fails_upstream(client, stages, table, monkeypatch):
+    use_reports(monkeypatch, {b"%PDF report": table("Brainstormed hinges", "Unreachable row")})
+    _, final, _ = stages
+
+    events = stream(client)
+
+    assert events[-1] == {"event": "done", "total": 2}
+    failed = {e["event"]: e["data"] for e in events if e.get("index") == 1}
+    assert failed["llm_label"]["HCD_Spaces"] == [] and failed["llm_label"]["HCD_Subspaces"] == []
+    assert failed["final_label"]["Reason"] == CLASSIFICATION_FAILED_REASON
+    # the unlabelled row is not sent for evaluation
+    assert len(final.bound_model.prompts) == 1
+
+
+@pytest.mark.parametrize(
+    "exc, detail",
+    [
+        (ValueError("Failed to open PDF"), "Failed to open PDF"),
+        (httpx.ConnectError("refused"), "LLM request failed: refused"),
+        (KeyError("tables"), "Internal error while classifying the report."),
+    ],
+    ids=["parse", "upstream", "unexpected"],
+)
+def test_stream_reports_failures_as_a_final_error_event(client, stages, monkeypatch, exc, detail):
+    use_reports(monkeypatch, {b"%PDF report": exc})
+
+    assert stream(client) == [{"event": "error", "detail": detail}]
+
+
+def test_stream_rejects_non_pdf_before_streaming(client, stages):
+    response = client.post(
+        "/classify-stream", files={"file": ("notes.txt", b"hello", "text/plain")}
+    )
+
+    assert response.status_code == 400
+
+
+def zip_of(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("mode", ["standard", "fused"])
+def test_batch_classifies_each_distinct_activity_once(client, stages, table, monkeypatch, mode):
+    week_1 = table("Team meeting", "Brainstormed hinges")
+    week_2 = table("  team   MEETING ", "Built a CAD model")
+    # same activity, different student labels: one classification, two evaluations
+    week_3 = table("Team meeting", spaces=["implement"], subspaces=["support"])
+    use_reports(
+        monkeypatch,
+        {
+            b"%PDF week 1": week_1,
+            b"%PDF week 2": week_2,
+            b"%PDF week 3": week_3,
+            b"%PDF broken": ValueError("Failed to open PDF"),
+        },
+    )
+    processor, final, fused = stages
+
+    response = client.post(
+        "/classify-batch",
+        params={"mode": mode},
+        files=[
+            ("files", ("week1.pdf", b"%PDF week 1", "application/pdf")),
+            (
+                "files",
+                (
+                    "later.zip",
+                    zip_of(
+                        {
+                            "later/week2.pdf": b"%PDF week 2",
+                            "later/broken.pdf": b"%PDF broken",
+                            "__MACOSX/later/._week2.pdf": b"junk",
+                            "later/notes.txt": b"skip me",
+                        }
+                    ),
+                    "application/zip",
+                ),
+            ),
+            ("files", ("week3.pdf", b"%PDF week 3", "application/pdf")),
+        ],
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["filename"] for r in body["reports"]] == [
+        "week1.pdf",
+        "later/week2.pdf",
+        "later/broken.pdf",
+        "week3.pdf",
+    ]
+    assert body["reports"][2]["error"] == "Failed to open PDF"
+    assert body["reports"][2]["llm_labels"] == []
+    assert body["stats"] == {
+        "reports": 4,
+        "failed_reports": 1,
+        "activities": 5,
+        "unique_activities": 4 if mode == "fused" else 3,
+        "unique_evaluations": 4,
+    }
+    if mode == "fused":
+        assert len(fused.bound_model.prompts) == 4
+    else:
+        assert len(processor.bound_model.prompts) == 3
+        assert len(final.bound_model.prompts) == 4
+
+    # every row gets its own activity text back, and its own student labels' verdict
+    week_2_result = body["reports"][1]
+    assert [label["activity"] for label in week_2_result["llm_labels"]] == [
+        "  team   MEETING ",
+        "Built a CAD model",
+    ]
+    assert week_2_result["final_labels"]["labels"][0]["activity"] == "  team   MEETING "
+    assert body["reports"][3]["final_labels"]["labels"][0]["student_labeled_subspaces"] == [
+        "support"
+    ]
+
+
+def test_batch_without_pdfs_is_rejected(client, stages, monkeypatch):
+    use_reports(monkeypatch, {})
+
+    response = client.post(
+        "/classify-batch",
+        files=[("files", ("empty.zip", zip_of({"notes.txt": b"no reports"}), "application/zip"))],
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No PDF reports found in upload."
+
+
+def test_oversized_batch_is_rejected_before_reading(client, stages, monkeypatch):
+    use_reports(monkeypatch, {})
+    monkeypatch.setattr(main, "MAX_BATCH_REPORTS", 2)
+
+    def no_decompression(*args, **kwargs):
+        raise AssertionError("member decompressed before the limit was checked")
+
+    monkeypatch.setattr(zipfile.ZipFile, "read", no_decompression)
+
+    too_many_files = client.post(
+        "/classify-batch",
+        files=[("files", (f"week{i}.pdf", b"%PDF", "application/pdf")) for i in range(3)],
+    )
+    archive = zip_of({f"week{i}.pdf": b"%PDF" for i in range(2)})
+    too_many_members = client.post(
+        "/classify-batch",
+        files=[
+            ("files", ("week0.pdf", b"%PDF", "application/pdf")),
+            ("files", ("later.zip", archive, "application/zip")),
+        ],
+    )
+
+    for response in (too_many_files, too_many_members):
+        assert response.status_code == 400
+        assert response.json()["detail"] == "A batch may contain at most 2 reports."
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from core.data_table import (
+    Compact_LLM_HCD_Label,
+    Compact_Output_Label,
+    Fused_HCD_Label,
+    Indexed_LLM_HCD_Label,
+    List_Indexed_LLM_HCD_Label,
+    LLM_HCD_Label,
+    Student_HCD_Label,
+)
+from core.fused_processing import FusedProcessing
+from core.postprocessing import FinalProcessing
+
+ENTRY = Student_HCD_Label(
+    activity="  Sketched hinge   ideas ",
+    HCD_Spaces=["ideate", "prototype"],
+    HCD_Subspaces=["brainstorm", "create", "iterate"],
+)
+
+
+@pytest.mark.parametrize(
+    "result, expected",
+    [
+        ([1, 0, -1], [1, 0, -1]),
+        ([5, -3, 0], [1, -1, 0]),
+        ([1], [1, 0, 0]),
+        ([1, 1, 1, -1, -1], [1, 1, 1]),
+        ([], [0, 0, 0]),
+    ],
+    ids=["aligned", "clamped", "padded", "truncated", "empty"],
+)
+def test_output_label_has_one_bounded_verdict_per_student_subspace(result, expected):
+    label = FinalProcessing.output_label(ENTRY, result, "why")
+
+    assert label.result == expected
+    assert label.activity == ENTRY.activity
+    assert label.student_labeled_spaces == ENTRY.HCD_Spaces
+    assert label.student_labeled_subspaces == ENTRY.HCD_Subspaces
+
+
+def test_classification_is_rebuilt_from_the_activity_that_was_sent(processor, fake_model):
+    processor.bound_model = model = fake_model(
+        Compact_LLM_HCD_Label(HCD_Spaces=["Ideate"], HCD_Subspaces=["Brainstorming"])
+    )
+
+    label = asyncio.run(processor.aclassify_activity(ENTRY.activity))
+
+    assert label == LLM_HCD_Label(
+        activity=ENTRY.activity, HCD_Spaces=["ideate"], HCD_Subspaces=["brainstorm"]
+    )
+    assert ENTRY.activity in model.prompts[0]
+
+
+def test_evaluation_is_rebuilt_from_the_student_entry(fake_model):
+    final = FinalProcessing()
+    final.bound_model = fake_model(Compact_Output_Label(result=[1, -1], Reason="partly"))
+    llm = LLM_HCD_Label(activity=ENTRY.activity, HCD_Spaces=["ideate"], HCD_Subspaces=["brainstorm"])
+
+    label = asyncio.run(final.aevaluate_entry(ENTRY, llm))
+
+    assert label.activity == ENTRY.activity
+    assert label.student_labeled_subspaces == ENTRY.HCD_Subspaces
+    assert (label.result, label.Reason) == ([1, -1, 0], "partly")
+
+
+def test_fused_reply_is_split_into_both_labels(fake_model):
+    fused = FusedProcessing()
+    fused.bound_model = fake_model(
+        Fused_HCD_Label(
+            HCD_Spaces=["IDEATE"], HCD_Subspaces=["brainstorm"], result=[1, 2, -1, 1], Reason="fused"
+        )
+    )
+
+    llm_label, output_label = asyncio.run(fused.aevaluate_entry(ENTRY))
+
+    assert llm_label == LLM_HCD_Label(
+        activity=ENTRY.activity, HCD_Spaces=["ideate"], HCD_Subspaces=["brainstorm"]
+    )
+    assert output_label.result == [1, 1, -1] and output_label.activity == ENTRY.activity
+
+
+def indexed(index, space="ideate", subspace="brainstorm"):
+    return Indexed_LLM_HCD_Label(index=index, HCD_Spaces=[space], HCD_Subspaces=[subspace])
+
+
+def test_batch_drops_rows_it_cannot_trust(processor, fake_model):
+    activities = ["Brainstormed", "Sketched", "Built", "Tested", "Planned"]
+    processor.batch_model = fake_model(
+        List_Indexed_LLM_HCD_Label(
+            labels=[
+                indexed(0),
+                indexed(1),
+                indexed(1, "prototype", "create"),
+                indexed(2, "nonsense", "nonsense"),
+                indexed(3, "prototype", "Evaluation"),
+                indexed(7),
+                indexed(-1),
+            ]
+        )
+    )
+
+    labels = asyncio.run(processor.aclassify_batch(activities))
+
+    # 1 is duplicated, 2 is unrecognised, 4 is missing; out-of-range rows are ignored
+    assert sorted(labels) == [0, 3]
+    assert labels[0].activity == "Brainstormed"
+    assert labels[3] == LLM_HCD_Label(
+        activity="Tested", HCD_Spaces=["prototype"], HCD_Subspaces=["evaluate"]
+    )
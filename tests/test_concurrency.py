@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import pytest
+
+from core.concurrency import AdaptiveLimiter
+from core.transport import AttemptRecord
+
+
+def attempt(status_code=None, error=None):
+    return AttemptRecord(
+        url="http://upstream",
+        attempt=0,
+        latency=0.1,
+        status_code=status_code,
+        error=error,
+        started_at=time.time(),
+    )
+
+
+def test_limit_grows_while_saturated_and_is_cut_when_latency_climbs():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=8, window=2, decrease_factor=0.5)
+
+    async def run():
+        await limiter.acquire()
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+
+        # a flat window with callers queueing adds one slot and hands it over
+        limiter.record_latency(1.0)
+        limiter.record_latency(1.0)
+        await asyncio.wait_for(waiter, 1)
+        assert (limiter.limit, limiter.in_flight) == (3, 3)
+        assert limiter.baseline == 1.0
+
+        # p90 above tolerance x baseline cuts the limit multiplicatively
+        limiter.record_latency(1.0)
+        limiter.record_latency(2.0)
+        assert limiter.limit == 1
+
+        # an unsaturated flat window leaves the limit alone
+        for _ in range(3):
+            limiter.release()
+        limiter.record_latency(1.0)
+        limiter.record_latency(1.0)
+        assert limiter.limit == 1
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize(
+    "record, cuts",
+    [
+        (attempt(429), True),
+        (attempt(503), True),
+        (attempt(500), True),
+        (attempt(502), True),
+        (attempt(504), True),
+        (attempt(error="ReadTimeout"), True),
+        (attempt(error="ConnectError"), False),
+        (attempt(400), False),
+        (attempt(200), False),
+    ],
+    ids=lambda value: str(value) if isinstance(value, bool) else str(value.status_code or value.error),
+)
+def test_retryable_failures_cut_the_limit(record, cuts):
+    limiter = AdaptiveLimiter(initial_limit=10, max_limit=10, decrease_factor=0.5)
+
+    limiter.observe_attempt(record)
+
+    assert limiter.limit == (5 if cuts else 10)
+
+
+def test_throttling_cuts_at_most_once_per_cooldown():
+    limiter = AdaptiveLimiter(
+        initial_limit=16, max_limit=16, min_limit=3, decrease_factor=0.5, cooldown=0.05
+    )
+
+    limiter.observe_attempt(attempt(429))
+    limiter.observe_attempt(attempt(502))
+    assert limiter.limit == 8
+
+    time.sleep(0.06)
+    limiter.observe_attempt(attempt(503))
+    assert limiter.limit == 4
+
+    # never below the floor
+    time.sleep(0.06)
+    limiter.observe_attempt(attempt(429))
+    assert limiter.limit == 3
+
+
+def test_waiters_are_served_round_robin_across_flows():
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+    served = []
+
+    async def call(flow, name):
+        await limiter.acquire(flow)
+        served.append(name)
+        await asyncio.sleep(0)
+        limiter.release()
+
+    async def run():
+        await limiter.acquire("big")
+        tasks = [asyncio.ensure_future(call("big", f"big-{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(call("small", "small-0")))
+        await asyncio.sleep(0)
+        assert limiter.queued == 4
+        limiter.release()
+        await asyncio.wait_for(asyncio.gather(*tasks), 1)
+
+    asyncio.run(run())
+
+    assert served == ["big-0", "small-0", "big-1", "big-2"]
+    assert limiter.in_flight == 0 and limiter.queued == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+
+    async def run():
+        await limiter.acquire("a")
+        waiter = asyncio.ensure_future(limiter.acquire("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.queued == 0
+        limiter.release()
+
+    asyncio.run(run())
+
+    assert limiter.in_flight == 0
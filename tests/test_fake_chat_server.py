@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import core.langchain_uiucchat_wrapper as wrapper
+from core.data_table import (
+    Compact_LLM_HCD_Label,
+    Compact_Output_Label,
+    Fused_HCD_Label,
+    LLM_HCD_Label,
+    List_Indexed_LLM_HCD_Label,
+    Student_HCD_Label,
+)
+from core.fused_processing import FusedProcessing
+from core.langchain_uiucchat_wrapper import IllinoisChatLLM
+from core.postprocessing import FinalProcessing
+from core.processing import Processing
+from fake_chat_server import CHAT_PATH, FaultProfile, classify, create_app
+
+
+def server(**profile):
+    return TestClient(create_app(FaultProfile(latency="fixed:0", seed=0, **profile)))
+
+
+def chat(client, prompt="hello"):
+    return client.post(
+        CHAT_PATH, json={"messages": [{"role": "user", "content": prompt}], "api_key": "x"}
+    )
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """A chat model whose requests are served by the fake server in-process."""
+    client = server()
+    monkeypatch.setattr(
+        wrapper,
+        "post_json",
+        lambda url, payload, *args, **kwargs: client.post(CHAT_PATH, json=payload).json(),
+    )
+    return IllinoisChatLLM(course_name="matse", api_key="x", cache=False)
+
+
+@pytest.mark.parametrize(
+    "activity, label",
+    [
+        ("Interviewed the client", ("understand", "empathize")),
+        ("Brainstormed hinge ideas", ("ideate", "brainstorm")),
+        ("Load tested the bracket", ("prototype", "evaluate")),
+        ("Ate lunch", ("prototype", "iterate")),
+    ],
+)
+def test_rules_classify_by_keyword(activity, label):
+    assert classify(activity) == label
+
+
+def test_replies_validate_against_each_requested_schema(llm):
+    entry = Student_HCD_Label(
+        activity="Brainstormed hinge ideas", HCD_Spaces=["ideate"], HCD_Subspaces=["brainstorm", "plan"]
+    )
+    single = llm.with_structured_output(Compact_LLM_HCD_Label).invoke(
+        Processing._build_activity_prompt(entry.activity)
+    )
+    batch = llm.with_structured_output(List_Indexed_LLM_HCD_Label).invoke(
+        Processing._build_batch_prompt(["Interviewed the client", "Tested the bracket"])
+    )
+    model_label = LLM_HCD_Label(
+        activity=entry.activity, HCD_Spaces=["ideate"], HCD_Subspaces=["brainstorm"]
+    )
+    verdict = llm.with_structured_output(Compact_Output_Label).invoke(
+        FinalProcessing._build_eval_prompt(entry, model_label)
+    )
+    fused = llm.with_structured_output(Fused_HCD_Label).invoke(
+        FusedProcessing._build_fused_prompt(entry)
+    )
+
+    assert (single.HCD_Spaces, single.HCD_Subspaces) == (["ideate"], ["brainstorm"])
+    assert [(row.index, row.HCD_Subspaces) for row in batch.labels] == [
+        (0, ["empathize"]),
+        (1, ["evaluate"]),
+    ]
+    assert verdict.result == [1, 0]
+    assert (fused.HCD_Subspaces, fused.result) == (["brainstorm"], [1, -1])
+
+
+def test_plain_prompts_get_plain_text(llm):
+    assert llm.invoke("ping").content == "OK"
+
+
+def test_injected_failures_and_stats():
+    assert chat(server(error_rate=1.0)).status_code == 500
+
+    client = server(throttle_rate=1.0, retry_after=2.5)
+    throttled = chat(client)
+    assert throttled.status_code == 429 and throttled.headers["Retry-After"] == "2.5"
+    assert client.get("/stats").json()["throttled"] == 1
+
+    client = server()
+    assert chat(client).json() == {"message": "OK"}
+    assert client.get("/stats").json()["ok"] == 1
+    assert client.post("/stats/reset").json()["requests"] == 0
+
+
+def test_slow_body_streams_the_same_reply():
+    assert chat(server(slow_body=0.001)).json() == {"message": "OK"}
+
+
+def test_capacity_queues_requests_beyond_the_limit():
+    app = create_app(FaultProfile(latency="fixed:0.05", max_concurrency=2))
+    endpoint = next(route.endpoint for route in app.routes if getattr(route, "path", "") == CHAT_PATH)
+
+    class Body:
+        async def json(self):
+            return {"messages": [{"role": "user", "content": "hello"}]}
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(endpoint(Body()) for _ in range(6)))
+        return loop.time() - started
+
+    # six requests, two at a time, 50 ms each
+    assert asyncio.run(run()) >= 0.14
+
+
+def test_unknown_latency_distribution_is_rejected():
+    with pytest.raises(ValueError):
+        FaultProfile(latency="gamma:1")
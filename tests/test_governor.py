@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+from core.governor import LLMGovernor
+
+
+def run_in_thread(target, timeout=5.0):
+    """Run `target` on a daemon thread and report whether it finished in time."""
+    errors = []
+
+    def run():
+        try:
+            target()
+        except BaseException as exc:  # surfaced by the assertion below
+            errors.append(exc)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not errors, errors
+    return not thread.is_alive()
+
+
+def test_sync_call_on_loop_thread_does_not_wait_for_async_holders():
+    governor = LLMGovernor(budgets={"m": {"max_concurrency": 1}})
+    limiter = governor.budget("m").limiter
+
+    async def main():
+        async with governor.acall("m"):
+            # every slot is held by a task on this loop; waiting would never end
+            with governor.call("m"):
+                assert limiter.in_flight == 2
+        assert limiter.in_flight == 0
+
+    assert run_in_thread(lambda: asyncio.run(main()))
+    assert limiter.queued == 0
+
+
+def test_sync_call_on_worker_thread_waits_for_a_slot():
+    governor = LLMGovernor(budgets={"m": {"max_concurrency": 1}})
+    limiter = governor.budget("m").limiter
+    entered = threading.Event()
+
+    def worker():
+        with governor.call("m"):
+            entered.set()
+
+    async def main():
+        async with governor.acall("m"):
+            thread = threading.Thread(target=worker, daemon=True)
+            thread.start()
+            await asyncio.sleep(0.05)
+            assert not entered.is_set() and limiter.queued == 1
+        await asyncio.to_thread(thread.join, 5)
+
+    assert run_in_thread(lambda: asyncio.run(main()))
+    assert entered.is_set() and limiter.in_flight == 0
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from core import hedging
+from core.hedging import HedgePolicy, hedge_policy_for, hedging_snapshot
+
+
+def warm_policy(budget, min_delay=0.01):
+    """A policy that has seen enough fast calls to hedge after `min_delay`."""
+    policy = HedgePolicy(budget=budget, min_samples=1, window=1000, min_delay=min_delay)
+    # enough history that the few slow calls in a test never move the quantile
+    for _ in range(1000):
+        policy._record(0.0)
+    return policy
+
+
+class Upstream:
+    """Attempt factory: each attempt sleeps for the next of `latencies` (or raises it)."""
+
+    def __init__(self, *latencies):
+        self.latencies = list(latencies)
+        self.started = 0
+        self.cancelled = 0
+
+    async def call(self):
+        outcome = self.latencies[self.started]
+        self.started += 1
+        try:
+            if isinstance(outcome, Exception):
+                raise outcome
+            await asyncio.sleep(outcome)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return outcome
+
+
+def run_calls(policy, upstreams):
+    async def run():
+        return [await policy.run(upstream.call) for upstream in upstreams]
+
+    return asyncio.run(run())
+
+
+def test_no_hedge_until_enough_latencies_are_observed():
+    policy = HedgePolicy(budget=1.0, min_samples=3, min_delay=0.0)
+    upstream = Upstream(0.02)
+
+    assert policy.delay() is None
+    assert run_calls(policy, [upstream]) == [0.02]
+    assert (upstream.started, policy.hedges) == (1, 0)
+
+
+def test_slow_call_is_hedged_and_loser_cancelled():
+    policy = warm_policy(budget=1.0)
+    upstream = Upstream(1.0, 0.0)
+
+    assert run_calls(policy, [upstream]) == [0.0]
+    assert upstream.started == 2 and upstream.cancelled == 1
+    assert policy.snapshot()["hedges"] == policy.snapshot()["hedge_wins"] == 1
+
+
+@pytest.mark.parametrize(
+    "budget, every", [(0.5, 2), (0.25, 4), (0.2, 5), (0.1, 10), (0.05, 20)]
+)
+def test_budget_allows_one_hedge_per_1_over_budget_calls(budget, every):
+    policy = warm_policy(budget)
+    slow_calls = [Upstream(0.05, 0.0) for _ in range(3 * every)]
+
+    run_calls(policy, slow_calls)
+
+    hedged = [i for i, upstream in enumerate(slow_calls) if upstream.started == 2]
+    assert hedged == [every - 1, 2 * every - 1, 3 * every - 1]
+    assert policy.calls == 3 * every and policy.hedges == 3
+
+
+def test_idle_credit_is_capped():
+    policy = warm_policy(budget=0.1)
+    # a long run of fast calls banks at most one hedge
+    run_calls(policy, [Upstream(0.0) for _ in range(50)])
+    slow_calls = [Upstream(0.05, 0.0) for _ in range(5)]
+
+    run_calls(policy, slow_calls)
+
+    assert [upstream.started for upstream in slow_calls] == [2, 1, 1, 1, 1]
+
+
+def test_fast_primary_spends_no_credit():
+    policy = warm_policy(budget=0.5, min_delay=0.05)
+    run_calls(policy, [Upstream(0.0), Upstream(0.0)])
+    slow = Upstream(0.2, 0.0)
+
+    run_calls(policy, [slow])
+
+    assert slow.started == 2 and policy.hedges == 1
+
+
+def test_hedge_failure_falls_back_to_primary():
+    policy = warm_policy(budget=1.0)
+    upstream = Upstream(0.05, RuntimeError("hedge failed"))
+
+    assert run_calls(policy, [upstream]) == [0.05]
+    assert policy.hedge_wins == 0
+
+
+def test_both_attempts_failing_raises_the_primary_error():
+    policy = warm_policy(budget=1.0)
+
+    class Slow(Upstream):
+        async def call(self):
+            self.started += 1
+            attempt = self.started
+            await asyncio.sleep(0.03 if attempt == 1 else 0.0)
+            raise RuntimeError(f"attempt {attempt}")
+
+    with pytest.raises(RuntimeError, match="attempt 1"):
+        run_calls(policy, [Slow()])
+
+
+def test_credit_is_exact_over_many_calls():
+    policy = HedgePolicy(budget=0.1)
+    spent = 0
+    for _ in range(10_000):
+        policy._start_call()
+        spent += policy._spend()
+
+    assert spent == 1000
+
+
+def test_policies_are_shared_only_between_identical_settings(monkeypatch):
+    monkeypatch.setattr(hedging, "_POLICIES", {})
+
+    default = hedge_policy_for("m", 0.9, 0.1)
+    assert hedge_policy_for("m", 0.9, 0.1) is default
+    eager = hedge_policy_for("m", 0.5, 0.2)
+    other = hedge_policy_for("n", 0.9, 0.1)
+
+    assert eager is not default and other is not default
+    assert (eager.quantile, eager.budget) == (0.5, 0.2)
+    assert sorted(hedging_snapshot()) == [
+        "m (quantile=0.5, budget=0.2)",
+        "m (quantile=0.9, budget=0.1)",
+        "n",
+    ]
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import sqlite3
+import time
+
+import pytest
+
+pytest.importorskip("fitz")
+
+from core.jobs import JobRunner, JobStore
+from core.pdf_parsing import PDFParseError
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield store
+    store.close()
+
+
+def submit(store, data=b"%PDF", sha256="abc"):
+    job, _ = store.submit(data, sha256, "report.pdf", "standard")
+    return job
+
+
+def test_recover_requeues_running_job_with_retry_event(store):
+    job = submit(store)
+    claimed = store.claim()
+    assert claimed.id == job.id and claimed.attempts == 1
+    store.append_event(job.id, {"event": "llm_label", "index": 0, "attempt": 1})
+
+    assert store.recover() == 1
+
+    recovered = store.get(job.id)
+    assert recovered.status == "queued"
+    assert [payload for _, payload in store.events(job.id)] == [
+        {"event": "llm_label", "index": 0, "attempt": 1},
+        {"event": "retry", "attempt": 1, "detail": "Interrupted by a restart."},
+    ]
+
+
+def test_recover_fails_job_out_of_attempts(store):
+    job = submit(store)
+    store.claim()
+
+    assert store.recover(max_attempts=1) == 0
+
+    failed = store.get(job.id)
+    assert failed.status == "failed"
+    assert failed.error == "Interrupted too many times."
+    assert store.events(job.id) == []
+
+
+def test_recover_ignores_queued_and_finished_jobs(store):
+    queued = submit(store, sha256="a")
+    done = submit(store, data=b"%PDF-2", sha256="b")
+    store.succeed(done.id, {"ok": True})
+
+    assert store.recover() == 0
+    assert store.get(queued.id).status == "queued"
+    assert store.get(done.id).status == "succeeded"
+
+
+def test_discard_events_keeps_retries_and_numbering(store):
+    job = submit(store)
+    store.claim()
+    store.append_event(job.id, {"event": "student_labels", "attempt": 1})
+    store.append_event(job.id, {"event": "llm_label", "index": 0, "attempt": 1})
+    store.recover()
+    store.claim()
+    store.append_event(job.id, {"event": "student_labels", "attempt": 2})
+
+    store.discard_events(job.id, before_attempt=2)
+
+    events = store.events(job.id)
+    assert [(seq, payload["event"], payload["attempt"]) for seq, payload in events] == [
+        (3, "retry", 1),
+        (4, "student_labels", 2),
+    ]
+    # new events keep numbering after the ones a client may already have seen
+    assert store.append_event(job.id, {"event": "done", "attempt": 2}) == 5
+
+
+def test_requeued_job_waits_out_its_delay(store):
+    job = submit(store)
+    store.claim()
+
+    store.requeue(job.id, 1, "upstream 503", delay=0.2)
+
+    assert store.get(job.id).status == "queued"
+    assert store.claim() is None
+    time.sleep(0.25)
+    assert store.claim().attempts == 2
+
+
+def test_retry_delay_doubles_up_to_the_cap(store):
+    runner = JobRunner(store, None, retry_backoff=5, retry_backoff_max=30)
+
+    assert [runner.retry_delay(attempt) for attempt in range(1, 6)] == [5, 10, 20, 30, 30]
+
+
+def test_old_database_gains_the_available_at_column(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, sha256 TEXT NOT NULL, mode TEXT NOT NULL, "
+        "filename TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+        "error TEXT, result TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+        "UNIQUE (sha256, mode))"
+    )
+    conn.execute(
+        "INSERT INTO jobs (id, sha256, mode, filename, status, created_at, updated_at) "
+        "VALUES ('old', 'abc', 'standard', 'report.pdf', 'queued', 0, 0)"
+    )
+    conn.commit()
+    conn.close()
+
+    store = JobStore(path)
+    try:
+        assert store.claim().id == "old"
+    finally:
+        store.close()
+
+
+def test_runner_retries_transient_failure_without_duplicate_rows(store):
+    attempts = []
+
+    async def handler(job, data, emit):
+        attempts.append(job.attempts)
+        await emit({"event": "llm_label", "index": 0})
+        if data == b"unreadable":
+            raise PDFParseError("Failed to open PDF")
+        if len(attempts) == 1:
+            raise RuntimeError("upstream hiccup")
+        return {"ok": True}
+
+    async def run(job_id):
+        runner = JobRunner(store, handler, workers=1, poll_interval=0.01, retry_backoff=0.01)
+        await runner.start()
+        runner.notify()
+        try:
+            for _ in range(500):
+                if store.get(job_id).finished:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await runner.stop()
+
+    job = submit(store)
+    asyncio.run(run(job.id))
+
+    finished = store.get(job.id)
+    assert finished.status == "succeeded" and finished.attempts == 2
+    events = [payload for _, payload in store.events(job.id)]
+    assert [(e["event"], e["attempt"]) for e in events] == [
+        ("retry", 1),
+        ("llm_label", 2),
+    ]
+
+    # an unreadable PDF fails at once instead of being retried
+    bad = submit(store, data=b"unreadable", sha256="bad")
+    asyncio.run(run(bad.id))
+    failed = store.get(bad.id)
+    assert failed.status == "failed" and failed.attempts == 1
+
+
+def test_worker_survives_store_errors(store, monkeypatch, capsys):
+    claim = store.claim
+    failures = []
+
+    def flaky_claim():
+        if not failures:
+            failures.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        return claim()
+
+    monkeypatch.setattr(store, "claim", flaky_claim)
+
+    async def handler(job, data, emit):
+        return {"ok": True}
+
+    async def run():
+        runner = JobRunner(store, handler, workers=1, poll_interval=0.01)
+        await runner.start()
+        await asyncio.sleep(0.05)
+        job = submit(store)
+        runner.notify()
+        try:
+            for _ in range(500):
+                if store.get(job.id).finished:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await runner.stop()
+        return job
+
+    job = asyncio.run(run())
+
+    assert failures and store.get(job.id).status == "succeeded"
+    assert "database is locked" in capsys.readouterr().out
+
+
+EMPTY_RESULT = {
+    "student_labels": {"tables": []},
+    "llm_labels": [],
+    "final_labels": {"labels": []},
+}
+
+
+class StubRunner:
+    """Stands in for the app's JobRunner; each wait finishes the followed job."""
+
+    def __init__(self, store):
+        self.store = store
+        self.notified = 0
+        self.follow = None
+
+    def notify(self):
+        self.notified += 1
+
+    async def wait_for_change(self, timeout):
+        self.store.append_event(self.follow, {"event": "done", "attempt": 1})
+        self.store.succeed(self.follow, EMPTY_RESULT)
+
+
+@pytest.fixture
+def api(store, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    runner = StubRunner(store)
+    monkeypatch.setattr(main, "job_store", store)
+    monkeypatch.setattr(main, "job_runner", runner)
+    return TestClient(main.app), runner
+
+
+def post_pdf(client, data=b"%PDF-1.4 report"):
+    return client.post("/jobs", files={"file": ("report.pdf", data, "application/pdf")})
+
+
+def test_submit_and_get_job(api, store):
+    client, runner = api
+
+    response = post_pdf(client)
+    assert response.status_code == 202
+    job = response.json()
+    assert (job["status"], job["filename"], job["events"], job["result"]) == (
+        "queued",
+        "report.pdf",
+        0,
+        None,
+    )
+    assert runner.notified == 1
+
+    # the same content is not queued twice
+    assert post_pdf(client).json()["id"] == job["id"]
+    assert runner.notified == 1
+
+    store.claim()
+    store.append_event(job["id"], {"event": "student_labels", "attempt": 1})
+    store.succeed(job["id"], EMPTY_RESULT)
+
+    fetched = client.get(f"/jobs/{job['id']}").json()
+    assert fetched["status"] == "succeeded"
+    assert fetched["events"] == 1
+    assert fetched["result"] == EMPTY_RESULT
+
+
+def test_oversized_job_upload_is_rejected(api, store, monkeypatch):
+    import main
+
+    client, runner = api
+    monkeypatch.setattr(main, "UPLOAD_SPOOL_THRESHOLD_BYTES", 4)
+    monkeypatch.setattr(main, "JOB_MAX_UPLOAD_BYTES", 8)
+
+    response = post_pdf(client, data=b"%PDF-1.4 " + b"x" * 32)
+
+    assert response.status_code == 413
+    assert runner.notified == 0 and store.claim() is None
+    # a PDF within the limit is queued even if it was spooled to disk
+    assert post_pdf(client, data=b"%PDF-1.4").status_code == 202
+
+
+def test_job_events_resume_after_seq(api, store):
+    client, _ = api
+    job_id = post_pdf(client).json()["id"]
+    for index in range(3):
+        store.append_event(job_id, {"event": "llm_label", "index": index, "attempt": 1})
+
+    response = client.get(f"/jobs/{job_id}/events", params={"after": 1, "follow": False})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["seq"], line["index"]) for line in lines] == [(2, 1), (3, 2)]
+
+
+def test_job_events_follow_until_finished(api, store):
+    client, runner = api
+    job_id = post_pdf(client).json()["id"]
+    store.append_event(job_id, {"event": "student_labels", "attempt": 1})
+    runner.follow = job_id
+
+    response = client.get(f"/jobs/{job_id}/events")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["seq"], line["event"]) for line in lines] == [
+        (1, "student_labels"),
+        (2, "done"),
+    ]
+    assert store.get(job_id).status == "succeeded"
+
+
+def test_unknown_job_is_404(api):
+    client, _ = api
+
+    assert client.get("/jobs/missing").status_code == 404
+    assert client.get("/jobs/missing/events").status_code == 404
@@ -0,0 +1,90 @@
+from difflib import get_close_matches
+
+import pytest
+
+from core.utils import (
+    KNOWN_SPACES,
+    KNOWN_SUBSPACES,
+    LABEL_ALIASES,
+    LabelNormalizer,
+    get_normalizer,
+    normalize_list,
+)
+
+
+def difflib_normalize(item, known):
+    """The matcher LabelNormalizer replaced, kept as the reference behaviour."""
+    s = (item or "").strip().lower()
+    if not s:
+        return ""
+    if s in known:
+        return s
+    s_clean = "".join(ch for ch in s if ch.isalnum() or ch.isspace())
+    if s_clean in known:
+        return s_clean
+    candidates = get_close_matches(s, list(known), n=1, cutoff=0.75)
+    if candidates:
+        return candidates[0]
+    candidates = get_close_matches(s_clean, list(known), n=1, cutoff=0.75)
+    return candidates[0] if candidates else None
+
+
+@pytest.mark.parametrize(
+    "item, known, expected",
+    [
+        # exact, case and surrounding whitespace
+        ("ideate", KNOWN_SPACES, "ideate"),
+        ("  EMPATHIZE ", KNOWN_SUBSPACES, "empathize"),
+        ("", KNOWN_SUBSPACES, ""),
+        # punctuation
+        ("Narrow Concepts!", KNOWN_SUBSPACES, "narrow concepts"),
+        ("narrow-concepts", KNOWN_SUBSPACES, "narrow concepts"),
+        # inflections and aliases difflib also caught
+        ("brainstorming", KNOWN_SUBSPACES, "brainstorm"),
+        ("Brainstormed", KNOWN_SUBSPACES, "brainstorm"),
+        ("synthesis", KNOWN_SPACES, "synthesize"),
+        # typos
+        ("emphathize", KNOWN_SUBSPACES, "empathize"),
+        ("evalute", KNOWN_SUBSPACES, "evaluate"),
+        ("prototyp", KNOWN_SPACES, "prototype"),
+        # unrelated words
+        ("banana", KNOWN_SUBSPACES, None),
+        ("prototyp", KNOWN_SUBSPACES, None),
+    ],
+)
+def test_matches_difflib_where_it_was_right(item, known, expected):
+    assert get_normalizer(known).normalize(item) == expected
+    assert difflib_normalize(item, known) == expected
+
+
+@pytest.mark.parametrize(
+    "item, known, expected, old",
+    [
+        # aliases difflib missed
+        ("ideation", KNOWN_SPACES, "ideate", None),
+        ("observation", KNOWN_SUBSPACES, "observe", None),
+        ("iterations", KNOWN_SUBSPACES, "iterate", None),
+        # another label set's spelling is not a misspelt neighbour
+        ("Ideate", KNOWN_SUBSPACES, None, "iterate"),
+        ("ideation", KNOWN_SUBSPACES, None, None),
+    ],
+)
+def test_improves_on_difflib(item, known, expected, old):
+    assert get_normalizer(known).normalize(item) == expected
+    assert difflib_normalize(item, known) == old
+
+
+def test_reserved_spelling_does_not_fuzzy_match():
+    normalizer = LabelNormalizer(KNOWN_SUBSPACES, LABEL_ALIASES)
+    assert normalizer.normalize("ideation") is None
+    assert normalizer.normalize("iteratoin") == "iterate"
+
+
+def test_normalize_list_drops_misses_and_duplicates_in_order():
+    items = ["Iterating", "banana", "iterate", "Plans", " evaluation "]
+    assert normalize_list(items, KNOWN_SUBSPACES) == ["iterate", "plan", "evaluate"]
+    assert normalize_list(None, KNOWN_SUBSPACES) == []
+
+
+def test_shared_normalizer_per_label_set():
+    assert get_normalizer(set(KNOWN_SPACES)) is get_normalizer(KNOWN_SPACES)
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+import core.langchain_uiucchat_wrapper as wrapper
+from core import llm_cache
+from core.langchain_uiucchat_wrapper import IllinoisChatLLM
+from core.llm_cache import SQLiteLLMCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+def reply(text):
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+
+def cached_text(cache, prompt, llm_string="llm"):
+    hit = cache.lookup(prompt, llm_string)
+    return hit[0].text if hit else None
+
+
+def test_least_recently_accessed_entry_is_evicted(tmp_path, clock):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.update("a", "llm", reply("A"))
+    clock.now += 1
+    cache.update("b", "llm", reply("B"))
+    clock.now += 1
+    # reading "a" makes "b" the least recently used
+    assert cached_text(cache, "a") == "A"
+    clock.now += 1
+
+    cache.update("c", "llm", reply("C"))
+
+    assert cached_text(cache, "b") is None
+    assert (cached_text(cache, "a"), cached_text(cache, "c")) == ("A", "C")
+
+
+def test_entry_expires_after_its_ttl(tmp_path, clock):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=60)
+    cache.update("a", "llm", reply("A"))
+
+    clock.now += 59
+    assert cached_text(cache, "a") == "A"
+    # reading an entry does not extend its lifetime
+    clock.now += 2
+    assert cached_text(cache, "a") is None
+
+
+def test_entries_persist_across_opens(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteLLMCache(path).update("a", "llm", reply("A"))
+
+    assert cached_text(SQLiteLLMCache(path), "a") == "A"
+    assert cached_text(SQLiteLLMCache(path), "a", llm_string="other llm") is None
+
+
+def test_model_settings_are_part_of_the_key(tmp_path, monkeypatch):
+    calls = []
+
+    def upstream(url, payload, *args, **kwargs):
+        calls.append((payload["model"], payload["temperature"]))
+        return {"message": f"reply {len(calls)}"}
+
+    monkeypatch.setattr(wrapper, "post_json", upstream)
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite3"))
+    llm = IllinoisChatLLM(course_name="matse", api_key="x", cache=cache)
+
+    assert llm.invoke("Classify this").content == "reply 1"
+    assert llm.invoke("Classify this").content == "reply 1"
+    warmer = llm.model_copy(update={"temperature": 0.7})
+    assert warmer.invoke("Classify this").content == "reply 2"
+    other = llm.model_copy(update={"model": "other-model"})
+    assert other.invoke("Classify this").content == "reply 3"
+    assert llm.invoke("Classify that").content == "reply 4"
+
+    assert calls[1:3] == [("Qwen/Qwen2.5-VL-72B-Instruct", 0.7), ("other-model", 0.1)]
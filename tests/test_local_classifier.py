@@ -0,0 +1,125 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from core.data_table import Compact_LLM_HCD_Label
+from core.local_classifier import LocalClassifier, coverage_report, cross_validate
+from core.processing import Processing
+
+EXAMPLES = [
+    ("Interviewed the client about hinge requirements", "Understand", "Empathize"),
+    ("Interviewed users about the hinge", "understand", "empathize"),
+    ("Brainstormed hinge concepts with the team", "ideate", "Brainstorming"),
+    ("Brainstormed bracket concepts", "ideate", "brainstorm"),
+    ("Built a CAD model of the bracket", "prototype", "create"),
+    ("Tested the bracket under load", "prototype", "evaluate"),
+    ("Ate lunch", "unknown", "unknown"),
+]
+
+
+@pytest.fixture(scope="module")
+def model():
+    return LocalClassifier(k=3).fit(EXAMPLES)
+
+
+def test_unknown_labels_are_skipped_and_labels_normalized(model):
+    assert len(model) == 6
+    assert ("ideate", "brainstorm") in model._labels
+    assert model._labels.count(("understand", "empathize")) == 2
+
+
+def test_training_vectors_are_unit_length_and_self_similar(model):
+    sims = model.similarities(EXAMPLES[4][0])
+
+    assert sims.shape == (6,)
+    assert sims[4] == pytest.approx(1.0, abs=1e-5)
+    assert np.argmax(sims) == 4 and sims.max() <= 1.0 + 1e-5
+
+
+@pytest.mark.parametrize(
+    "activity, expected",
+    [
+        ("Interviewed the client about requirements", ("understand", "empathize")),
+        ("brainstormed concepts for a hinge", ("ideate", "brainstorm")),
+        ("Load tested the bracket", ("prototype", "evaluate")),
+    ],
+)
+def test_predicts_the_nearest_neighbours_label(model, activity, expected):
+    prediction = model.predict(activity)
+
+    assert (prediction.space, prediction.subspace) == expected
+    assert 0.0 < prediction.confidence < 1.0
+
+
+def test_confidence_is_similarity_share_with_prior():
+    model = LocalClassifier(k=1, prior=0.5).fit([("Tested the bracket", "prototype", "evaluate")])
+
+    # a single identical neighbour: similarity 1 / (1 + prior)
+    assert model.predict("tested the BRACKET").confidence == pytest.approx(1 / 1.5, abs=1e-5)
+    # a weaker match earns less confidence
+    assert model.predict("tested").confidence < 1 / 1.5
+
+
+def test_no_prediction_without_training_or_shared_features(model):
+    assert LocalClassifier().predict("Tested the bracket") is None
+    assert model.predict("") is None
+    assert model.predict("zzqx") is None
+
+
+def test_save_and_load_round_trip(model, tmp_path):
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = LocalClassifier.load(path)
+
+    assert loaded._labels == model._labels
+    for activity, _, _ in EXAMPLES:
+        assert loaded.predict(activity) == model.predict(activity)
+
+
+def test_cross_validation_never_sees_the_held_out_row():
+    rows = [
+        {"Activity": "Interviewed the client", "HCD_Space": "understand", "HCD_Subspace": "empathize"},
+        {"Activity": "Interviewed the sponsor", "HCD_Space": "understand", "HCD_Subspace": "empathize"},
+        {"Activity": "Quantum flux calibration", "HCD_Space": "prototype", "HCD_Subspace": "evaluate"},
+    ]
+
+    results = cross_validate(rows, folds=3)
+
+    assert results[0][1].subspace == "empathize"
+    # the only row about calibration is held out, so nothing shares its words
+    assert results[2][1] is None
+    report = coverage_report(results, thresholds=(0.01,))
+    assert report[0]["rows"] == 3 and report[0]["covered"] == 2
+
+
+@pytest.fixture
+def cascade(table, fake_model):
+    def classify(model, threshold, *activities):
+        processor = Processing(cascade_threshold=threshold, local_classifier=model)
+        processor.memo = None
+        processor.bound_model = llm = fake_model(
+            Compact_LLM_HCD_Label(HCD_Spaces=["implement"], HCD_Subspaces=["execute"])
+        )
+        labels = asyncio.run(processor.aclassify_table(table(*activities)))
+        return [label.HCD_Subspaces for label in labels], llm.calls
+
+    return classify
+
+
+def test_cascade_answers_confident_rows_locally(model, cascade):
+    confident = "Interviewed the client about hinge requirements"
+    unsure = "zzqx planning"
+    confidence = model.predict(confident).confidence
+
+    labels, calls = cascade(model, confidence, confident, unsure)
+
+    assert labels == [["empathize"], ["execute"]] and calls == 1
+
+
+def test_cascade_threshold_above_confidence_goes_to_the_llm(model, cascade):
+    activity = "Interviewed the client about hinge requirements"
+    confidence = model.predict(activity).confidence
+
+    assert cascade(model, confidence + 1e-3, activity) == ([["execute"]], 1)
+    assert cascade(model, None, activity) == ([["execute"]], 1)
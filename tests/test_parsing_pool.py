@@ -0,0 +1,108 @@
+import asyncio
+import os
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from core import pdf_parsing
+from core.parsing_pool import ParsingPool, ParsingPoolBusy
+from core.pdf_parsing import PDFParseError
+
+
+def make_pdf(pages):
+    document = fitz.open()
+    for number in range(1, pages + 1):
+        page = document.new_page()
+        page.insert_text((72, 72), f"Weekly activity on page {number}")
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def parse_with_pool(data, page_count, pages_per_task):
+    async def run():
+        pool = ParsingPool(workers=2, pages_per_task=pages_per_task)
+        await pool.start()
+        try:
+            return await pool.aparse_markdown(data, page_count)
+        finally:
+            pool.shutdown()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize(
+    "pages, pages_per_task",
+    [
+        (5, 2),  # uneven last range
+        (4, 2),  # ranges end on the last page
+        (3, 8),  # one range covers the document
+        (1, 1),
+    ],
+)
+def test_split_ranges_merge_like_a_whole_document_parse(pages, pages_per_task):
+    data = make_pdf(pages)
+
+    merged = parse_with_pool(data, pages, pages_per_task)
+
+    assert merged == pdf_parsing.parse_markdown(data)
+    positions = [merged.index(f"page {number}") for number in range(1, pages + 1)]
+    assert positions == sorted(positions)
+
+
+def test_unknown_page_count_still_parses_first_range():
+    data = make_pdf(2)
+
+    assert parse_with_pool(data, 0, 8) == pdf_parsing.parse_markdown(data)
+
+
+def run_with_pool(test, **settings):
+    async def run():
+        pool = ParsingPool(**settings)
+        await pool.start()
+        try:
+            await test(pool)
+        finally:
+            pool.shutdown()
+
+    asyncio.run(run())
+
+
+def test_crashed_worker_is_replaced():
+    data = make_pdf(2)
+
+    async def test(pool):
+        broken = pool._executor
+        # a worker dying mid-task, as when MuPDF crashes on a malformed file
+        with pytest.raises(PDFParseError, match="worker crashed"):
+            await pool._submit(os._exit, 1)
+        assert pool._executor is not broken
+        assert pool.pending == 0
+        assert await pool.aparse_markdown(data, 2) == pdf_parsing.parse_markdown(data)
+
+    run_with_pool(test, workers=1)
+
+
+def test_saturated_pool_turns_documents_away():
+    data = make_pdf(1)
+
+    async def test(pool):
+        await pool._acquire()
+        assert pool.pending == 1
+        with pytest.raises(ParsingPoolBusy):
+            await pool.adetect_table(data)
+        with pytest.raises(ParsingPoolBusy):
+            await pool.aparse_markdown(data, 1)
+        assert pool.pending == 1
+
+        pool._release()
+        _, pages = await pool.adetect_table(data)
+        assert pages == 1 and pool.pending == 0
+
+    run_with_pool(test, workers=1, max_pending=1, acquire_timeout=0.05)
+
+
+def test_unstarted_pool_refuses_work():
+    with pytest.raises(RuntimeError, match="not been started"):
+        asyncio.run(ParsingPool(workers=1).adetect_table(b"%PDF"))
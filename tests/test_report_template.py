@@ -0,0 +1,91 @@
+import functools
+import os
+import re
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from core.pdf_parsing import document_to_markdown
+from core.report_template import crop_activity_section, detect_template
+from core.table_extraction import extract_student_table
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+REPORTS = [f"progress_report_{i}.pdf" for i in range(1, 13)] + ["new_template.pdf"]
+
+
+def words(text):
+    return re.sub(r"[\W_]+", " ", text).lower().strip()
+
+
+@functools.lru_cache(maxsize=None)
+def read(name):
+    with fitz.open(os.path.join(DATA, name)) as document:
+        return document_to_markdown(document), extract_student_table(document)
+
+
+@pytest.mark.parametrize("name", REPORTS)
+def test_crop_keeps_every_activity_row_and_stops_at_the_next_question(name):
+    text, detected = read(name)
+
+    cropped = crop_activity_section(text)
+
+    assert cropped != text and len(cropped) < len(text) / 2
+    for entry in detected.table.tables:
+        assert words(entry.activity) in words(cropped)
+    # the narrative question after the table is cut off, with everything after it
+    following = text[text.index(cropped) + len(cropped) :].lstrip(" \n")
+    assert re.match(r"\d{1,2}\.[\s\u200b]*(what|expand on)", following, re.IGNORECASE)
+    assert not re.search(r"^\s*\d{1,2}\.[\s\u200b]*what ", cropped, re.IGNORECASE | re.MULTILINE)
+
+
+@pytest.mark.parametrize("name", REPORTS)
+def test_detect_template_on_sample_reports(name):
+    text, _ = read(name)
+
+    assert detect_template(text) == ("new" if name == "new_template.pdf" else "legacy")
+
+
+LEGACY = """Weekly progress report
+1. What did you work on this week?
+Lots of things.
+3. Provide a brief list of activities you worked on this week.
+Activity
+HCD space(s)
+HCD subspace(s)
+1. Interviewed the client about the hinge
+understand
+empathize
+2. Built a CAD model of the bracket
+prototype
+create
+4. What branches/blocks were work focused on?
+Mechanical design.
+"""
+
+
+def test_numbered_activity_rows_do_not_end_the_crop():
+    cropped = crop_activity_section(LEGACY)
+
+    assert cropped.startswith("Provide a brief list of activities")
+    assert cropped.endswith("create")
+    assert "What did you work on" not in cropped and "branches/blocks" not in cropped
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "No activity section in this report at all, just prose about the week's work.",
+        "Weekly notes\nActivity\nNone this week\n",
+        "Provide a brief list of activities\nActivity\nHCD space(s)\nHCD subspace(s)\n"
+        "4. What branches/blocks were work focused on?\nMechanical design.",
+    ],
+    ids=["no-section", "too-short", "no-rows"],
+)
+def test_uncroppable_text_is_returned_whole(text):
+    assert crop_activity_section(text) == text
+
+
+def test_detect_template_needs_every_new_column():
+    assert detect_template("Activity Title | Activity Description | HCD process(es)") == "new"
+    assert detect_template("Activity Title | HCD space(s) | HCD subspace(s)") == "legacy"
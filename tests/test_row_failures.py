@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from langchain_core.exceptions import OutputParserException
+from pydantic import ValidationError
+
+from core.data_table import Compact_LLM_HCD_Label, Compact_Output_Label, LLM_HCD_Label
+from core.fused_processing import FusedProcessing
+from core.postprocessing import EVALUATION_FAILED_REASON, FinalProcessing
+
+UPSTREAM_FAILURES = [
+    httpx.ConnectError("connection refused"),
+    httpx.ReadTimeout("read timed out"),
+    asyncio.TimeoutError(),
+    json.JSONDecodeError("Expecting value", "<html>", 0),
+    OutputParserException("not json"),
+]
+
+
+def validation_error():
+    try:
+        LLM_HCD_Label.model_validate({})
+    except ValidationError as exc:
+        return exc
+
+
+# bugs in our own code, including ValueErrors such as a pydantic ValidationError
+# while rebuilding a label
+PROGRAMMING_ERRORS = [AttributeError("bad field"), ValueError("bad index"), validation_error()]
+
+
+@pytest.mark.parametrize("exc", UPSTREAM_FAILURES, ids=lambda exc: type(exc).__name__)
+def test_classification_failure_leaves_only_that_row_unlabelled(
+    processor, table, fake_model, exc, capsys
+):
+    processor.bound_model = fake_model(
+        Compact_LLM_HCD_Label(HCD_Spaces=["ideate"], HCD_Subspaces=["brainstorm"]),
+        {"Sketched": exc},
+    )
+
+    labels = asyncio.run(processor.aclassify_table(table("Brainstormed", "Sketched")))
+
+    assert labels[0].HCD_Subspaces == ["brainstorm"]
+    assert labels[1] == LLM_HCD_Label(activity="Sketched", HCD_Spaces=[], HCD_Subspaces=[])
+    assert "Warning: classification failed" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("exc", PROGRAMMING_ERRORS, ids=lambda exc: type(exc).__name__)
+def test_programming_errors_propagate(processor, table, fake_model, exc):
+    processor.bound_model = fake_model(None, {"Sketched": exc})
+
+    with pytest.raises(type(exc)):
+        asyncio.run(processor.aclassify_table(table("Sketched")))
+
+
+def test_failed_batch_falls_back_to_single_rows(processor, table, fake_model):
+    # every batch prompt numbers its first row "[0]"
+    processor.batch_model = fake_model(None, {"[0]": OutputParserException("truncated")})
+    processor.bound_model = fake_model(
+        Compact_LLM_HCD_Label(HCD_Spaces=["ideate"], HCD_Subspaces=["brainstorm"])
+    )
+
+    labels = asyncio.run(processor.aclassify_table(table("A", "B"), batch_size=2))
+
+    assert [label.HCD_Subspaces for label in labels] == [["brainstorm"], ["brainstorm"]]
+    assert (processor.batch_model.calls, processor.bound_model.calls) == (1, 2)
+
+
+@pytest.mark.parametrize("exc", UPSTREAM_FAILURES, ids=lambda exc: type(exc).__name__)
+def test_final_evaluation_failure_is_not_evaluated(table, fake_model, exc):
+    final = FinalProcessing()
+    final.bound_model = fake_model(None, {"Sketched": exc})
+    entry = table("Sketched").tables[0]
+    llm = LLM_HCD_Label(activity="Sketched", HCD_Spaces=["ideate"], HCD_Subspaces=["brainstorm"])
+
+    label = asyncio.run(final.aevaluate_entry_or_skip(entry, llm))
+
+    assert label.result == [0] and label.Reason == EVALUATION_FAILED_REASON
+
+    final.bound_model = fake_model(None, {"Sketched": ValueError("bad verdict")})
+    with pytest.raises(ValueError):
+        asyncio.run(final.aevaluate_entry_or_skip(entry, llm))
+
+
+def test_final_evaluation_success_is_untouched(table, fake_model):
+    final = FinalProcessing()
+    final.bound_model = fake_model(Compact_Output_Label(result=[1], Reason="ok"))
+    entry = table("Brainstormed").tables[0]
+    llm = LLM_HCD_Label(activity="Brainstormed", HCD_Spaces=["ideate"], HCD_Subspaces=["brainstorm"])
+
+    assert asyncio.run(final.aevaluate_entry_or_skip(entry, llm)).result == [1]
+
+
+@pytest.mark.parametrize("exc", UPSTREAM_FAILURES, ids=lambda exc: type(exc).__name__)
+def test_fused_failure_is_unlabelled_and_not_evaluated(table, fake_model, exc):
+    fused = FusedProcessing()
+    fused.bound_model = fake_model(None, {"Sketched": exc})
+    entry = table("Sketched").tables[0]
+
+    llm_label, output_label = asyncio.run(fused.aevaluate_entry_or_skip(entry))
+
+    assert llm_label.HCD_Spaces == [] and llm_label.HCD_Subspaces == []
+    assert output_label.Reason == EVALUATION_FAILED_REASON
+
+    fused.bound_model = fake_model(None, {"Sketched": TypeError("bad call")})
+    with pytest.raises(TypeError):
+        asyncio.run(fused.aevaluate_entry_or_skip(entry))
@@ -0,0 +1,154 @@
+import asyncio
+from typing import List, Optional
+
+import pytest
+from langchain_core.caches import InMemoryCache
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import BaseModel
+
+from core.langchain_uiucchat_wrapper import IllinoisChatLLM
+from core.structured_output import (
+    STRICT_JSON_NOTICE,
+    _extract_json,
+    _repair,
+    build_messages,
+    parse_structured,
+)
+
+
+class Labels(BaseModel):
+    labels: List[str]
+    confident: bool = False
+    note: Optional[str] = None
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        # plain JSON takes the direct path
+        ('{"labels": ["ideate"]}', Labels(labels=["ideate"])),
+        # code fences
+        (
+            '```json\n{"labels": ["ideate", "prototype"], "confident": true}\n```',
+            Labels(labels=["ideate", "prototype"], confident=True),
+        ),
+        # prose around the object
+        (
+            'Sure! Here is the result: {"labels": ["empathize"]} Let me know if you need more.',
+            Labels(labels=["empathize"]),
+        ),
+        # trailing commas
+        ('{"labels": ["ideate", "test",], "confident": true,}', Labels(labels=["ideate", "test"], confident=True)),
+        # Python literals
+        ('{"labels": [], "confident": True, "note": None}', Labels(labels=[], confident=True)),
+        # truncated reply: open array and object are closed
+        ('{"labels": ["ideate", "empathize"', Labels(labels=["ideate", "empathize"])),
+        # truncated inside a string literal
+        ('{"labels": [], "note": "cut of', Labels(labels=[], note="cut of")),
+    ],
+)
+def test_parse_structured_recovers_common_reply_shapes(text, expected):
+    assert parse_structured(text, Labels) == expected
+
+
+def test_repair_leaves_string_literals_alone():
+    text = '{"labels": ["True, None,]"], "confident": False,}'
+
+    assert parse_structured(text, Labels) == Labels(labels=["True, None,]"], confident=False)
+    assert _repair('["None", None,]') == '["None", null]'
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("no json here", None),
+        ('prefix [1, {"a": "}"}] suffix', '[1, {"a": "}"}]'),
+        ('{"a": [1, 2}', None),  # mismatched closer
+        ('{"a": "x\\"', '{"a": "x\\""}'),  # escaped quote inside a cut-off string
+    ],
+)
+def test_extract_json(text, expected):
+    assert _extract_json(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["I cannot classify this activity.", '{"confident": true}', '{"labels": [1, 2}'],
+)
+def test_parse_structured_raises_value_error(text):
+    with pytest.raises(OutputParserException) as info:
+        parse_structured(text, Labels)
+    assert isinstance(info.value, ValueError)
+    assert info.value.llm_output == text
+
+
+def test_build_messages_does_not_mutate_callers_messages():
+    system = SystemMessage(content="Be brief.")
+    human = HumanMessage(content="Classify this.")
+    messages = [system, human, {"role": "user", "content": "And this."}]
+    snapshot = [system.model_copy(), human.model_copy(), dict(messages[2])]
+
+    prompt = build_messages(messages, "SCHEMA")
+
+    assert messages == snapshot
+    assert prompt[0] is system and prompt[1] is human
+    assert prompt[2].content == f"And this.\n\n{STRICT_JSON_NOTICE}SCHEMA"
+
+
+def test_build_messages_without_human_message_appends_system_instructions():
+    messages = [{"role": "system", "content": "Be brief."}]
+
+    prompt = build_messages(messages, "SCHEMA")
+
+    assert messages == [{"role": "system", "content": "Be brief."}]
+    assert [type(m) for m in prompt] == [SystemMessage, SystemMessage]
+    assert prompt[-1].content == STRICT_JSON_NOTICE + "SCHEMA"
+    assert build_messages("hi", "SCHEMA")[0].content == f"hi\n\n{STRICT_JSON_NOTICE}SCHEMA"
+
+
+@pytest.fixture
+def scripted_llm(monkeypatch):
+    """An IllinoisChatLLM with an in-memory cache whose replies come from a list."""
+    replies = []
+
+    def call(self, messages, stop=None, run_manager=None, **kwargs):
+        return replies.pop(0)
+
+    async def acall(self, messages, stop=None, run_manager=None, **kwargs):
+        return replies.pop(0)
+
+    monkeypatch.setattr(IllinoisChatLLM, "_call", call)
+    monkeypatch.setattr(IllinoisChatLLM, "_acall", acall)
+    llm = IllinoisChatLLM(course_name="test", cache=InMemoryCache())
+    return llm, replies
+
+
+def test_failed_parse_is_not_cached(scripted_llm):
+    llm, replies = scripted_llm
+    structured = llm.with_structured_output(Labels)
+    replies.extend(["not json", '{"labels": ["ideate"]}'])
+
+    with pytest.raises(OutputParserException):
+        structured.invoke("Classify this.")
+    assert llm._structured_cache()._cache == {}
+
+    # the retry reaches the model again, and only the good reply is stored
+    assert structured.invoke("Classify this.") == Labels(labels=["ideate"])
+    assert len(llm._structured_cache()._cache) == 1
+    assert structured.invoke("Classify this.") == Labels(labels=["ideate"])
+    assert replies == []
+
+
+def test_failed_async_parse_is_not_cached(scripted_llm):
+    llm, replies = scripted_llm
+    structured = llm.with_structured_output(Labels)
+    replies.extend(['{"labels": ["ideate"', "still not json"])
+
+    # a truncated reply that repairs cleanly is cached like any other
+    assert asyncio.run(structured.ainvoke("First.")) == Labels(labels=["ideate"])
+    assert len(llm._structured_cache()._cache) == 1
+
+    with pytest.raises(OutputParserException):
+        asyncio.run(structured.ainvoke("Second."))
+    assert len(llm._structured_cache()._cache) == 1
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from core.preprocessing import PreProcessor
+from core.table_extraction import MIN_TABLE_CONFIDENCE, extract_student_table
+from core.utils import KNOWN_SPACES, KNOWN_SUBSPACES
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+# activity rows in each sample report's table
+REPORT_ROWS = {
+    1: 7,
+    2: 9,
+    3: 9,
+    4: 7,
+    5: 6,
+    6: 9,
+    7: 7,
+    8: 7,
+    9: 4,
+    10: 2,
+    11: 2,
+    12: 2,
+}
+
+
+def extract(name):
+    with fitz.open(os.path.join(DATA, name)) as document:
+        return extract_student_table(document)
+
+
+@pytest.mark.parametrize("report, rows", sorted(REPORT_ROWS.items()))
+def test_legacy_reports_are_read_from_the_table(report, rows):
+    detected = extract(f"progress_report_{report}.pdf")
+
+    assert detected.template == "legacy"
+    assert len(detected.table.tables) == rows
+    assert detected.confidence >= MIN_TABLE_CONFIDENCE
+    for entry in detected.table.tables:
+        assert entry.activity and not entry.activity.lower().startswith("example")
+        assert set(entry.HCD_Spaces) <= set(KNOWN_SPACES)
+        assert set(entry.HCD_Subspaces) <= set(KNOWN_SUBSPACES)
+
+
+def test_blank_new_template_falls_back_to_the_llm():
+    detected = extract("new_template.pdf")
+
+    # the header is found, but only the instructional example row follows it
+    assert detected.template == "new"
+    assert detected.table.tables == [] and detected.confidence == 0.0
+    assert PreProcessor()._accept_detection(detected) is None
+
+
+def test_document_without_an_activity_table_is_not_detected():
+    with fitz.open() as document:
+        document.new_page().insert_text((72, 72), "Weekly notes without any table")
+
+        assert extract_student_table(document) is None